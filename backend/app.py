@@ -1,14 +1,54 @@
+import asyncio
+import json
 import os
 import sys
+import threading
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Form, Request
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, FastAPI, HTTPException, Form, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.concurrency import run_in_threadpool
 from loguru import logger
-from src.generate_image import create_colouring_page
-from src.gallery import get_image_filenames
-from src.helpers import save_metadata, load_metadata
+from src.generate_image import (
+    create_colouring_page,
+    create_colouring_page_async,
+    close_async_resources,
+)
+from src.batch import batch_items, generate_batch
+from src.blob_storage import ensure_local, get_blob_store
+from src.bulk import delete_images, select_images, stream_zip
+from src.jobs import JobQueue, JobQueueFullError, JobStore, format_sse
+from src.gallery import list_images, similar_images, sync_index
+from src.gallery_cache import DirectoryWatcher, gallery_cache
+from src.logging_config import configure_logging, sampled_logger
+from src.http_cache import etag_matches, immutable_file_response
+from src.static_assets import static_manifest
+from src.metadata_store import METADATA_BACKEND, get_metadata_store
+from src.metrics import REGISTRY, Gauge, RequestMetricsMiddleware, render_metrics
+from src.pdf_export import (
+    ImagesNotFoundError,
+    cached_export,
+    export_key,
+    missing_images,
+    render_pdf,
+    stream_and_cache,
+    validate_export,
+)
+from src.profiler import PROFILER_ENABLED, profiler
+from src.renditions import RENDITION_MEDIA_TYPE, RENDITIONS_DIR, get_rendition
+from src.providers import current_provider, get_provider, provider_name
+from src.resilience import CircuitOpenError, OPEN, provider_breaker
+from src.result_cache import result_cache
+from src.retention import RetentionJob, access_tracker, migrate_layout
+from src.similarity import HASH_BACKFILL, SIMILAR_MAX_DISTANCE, backfill_hashes
 from src.version import __version__
 from datetime import datetime
 from urllib.parse import unquote
@@ -17,43 +57,85 @@ from urllib.parse import unquote
 PROJECT_ROOT = Path(__file__).parent
 LOG_DIR = PROJECT_ROOT / "logs"
 IMAGES_DIR = PROJECT_ROOT / "images"
-METADATA_FILE = PROJECT_ROOT / "image_metadata.json"
 STATIC_DIR = PROJECT_ROOT / "static"
+JOBS_DB_FILE = PROJECT_ROOT / "jobs.db"
 
-# Configure logging
-logger.remove()  # Remove default handler
-logger.add(
-    sys.stderr,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    level="DEBUG",
-    colorize=True,
-    backtrace=True,
-    diagnose=True,
-)
-logger.add(
-    LOG_DIR / "debug.log",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-    level="DEBUG",
-    rotation="1 day",
-    retention="7 days",
-    backtrace=True,
-    diagnose=True,
-)
+MAX_PAGE_SIZE = 200
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "20"))
+
+# Routes are collected here and mounted by create_app, so importing this
+# module has no side effects
+router = APIRouter()
+# Registered only when PROFILER_ENABLED is set
+profiler_router = APIRouter()
+
+
+def _cache_new_image(filename: str) -> None:
+    """Add a freshly generated image to the gallery cache"""
+    entry = get_metadata_store().get(filename)
+    if entry is not None:
+        gallery_cache.add(filename, entry)
+
+
+def _cache_new_images(entries: Dict[str, Dict[str, Any]]) -> None:
+    """Add a committed batch of images to the gallery cache"""
+    for filename, entry in entries.items():
+        gallery_cache.add(filename, entry)
+
+
+def _generate_for_job(**params) -> Optional[str]:
+    """Job unit of work: create the page, then make it visible in the gallery"""
+    filename = create_colouring_page(**params)
+    if filename:
+        _cache_new_image(filename)
+    return filename
 
-# Ensure directories exist
-LOG_DIR.mkdir(exist_ok=True)
-IMAGES_DIR.mkdir(exist_ok=True)
-STATIC_DIR.mkdir(exist_ok=True)
 
-# Log startup information
-logger.info(f"🚀 Starting application version {__version__}")
-logger.info(f"🐍 Python version: {sys.version}")
-logger.info(f"📂 Working directory: {PROJECT_ROOT.absolute()}")
-logger.info(f"📁 Images directory: {IMAGES_DIR.absolute()}")
-logger.info(f"📄 Metadata file: {METADATA_FILE.absolute()}")
-logger.info(f"🌐 Static files directory: {STATIC_DIR.absolute()}")
+gallery_watcher: Optional[DirectoryWatcher] = None
+retention_job: Optional[RetentionJob] = None
+# Stops the perceptual-hash backfill on shutdown, also while it waits for
+# another worker's batch
+backfill_stop = threading.Event()
 
-app = FastAPI()
+
+job_queue = JobQueue(
+    JobStore(str(JOBS_DB_FILE)),
+    worker=_generate_for_job,
+    max_workers=JOB_WORKERS,
+    max_queued=JOB_QUEUE_SIZE,
+)
+
+# Gauges read from state the app already keeps, at scrape time
+REGISTRY.register(
+    Gauge(
+        "colouring_gallery_images",
+        "Images in the gallery cache",
+        function=lambda: len(gallery_cache),
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "colouring_jobs_queued",
+        "Generation jobs waiting for a worker",
+        function=lambda: job_queue.pending,
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "colouring_provider_circuit_open",
+        "1 while the image provider circuit breaker is open",
+        function=lambda: provider_breaker.status()["state"] == OPEN,
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "colouring_result_cache_keys",
+        "Requests with reusable results in the result cache",
+        function=lambda: result_cache.stats()["keys"],
+    )
+)
 
 # Configure CORS based on environment
 is_production = os.getenv("ENVIRONMENT", "development") == "production"
@@ -63,129 +145,442 @@ allowed_origins = [
     "https://*.onrender.com",  # Render domains
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins if not is_production else ["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
+@router.get("/metrics")
+async def metrics():
+    """Prometheus-style metrics"""
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@profiler_router.get("/api/profiler")
+async def profiler_status():
+    """Report the sampling profiler settings and how much it has collected"""
+    return profiler.status()
+
+
+@profiler_router.post("/api/profiler")
+async def configure_profiler(
+    sample_rate: float = Form(...),
+    reset: bool = Form(False),
+):
+    """Set the fraction of requests to profile (0 turns profiling off)"""
+    if reset:
+        profiler.reset()
+    profiler.configure(sample_rate)
+    return profiler.status()
+
+
+@profiler_router.get("/api/profiler/profile")
+async def download_profile():
+    """
+    The collected profile as folded stacks, ready for flamegraph.pl or
+    speedscope.
+    """
+    return PlainTextResponse(profiler.folded())
 
-@app.get("/health")
+
+@profiler_router.post("/api/profiler/dump")
+async def dump_profile():
+    """Write the collected profile under logs/profiles"""
+    path = await run_in_threadpool(profiler.dump)
+    return {"path": str(path)}
+
+
+@router.get("/health")
 async def health_check():
     """Health check endpoint for monitoring"""
-    logger.info("💓 Health check accessed")
+    sampled_logger.info("💓 Health check accessed")
+    breaker = provider_breaker.status()
     return {
-        "status": "healthy",
+        # Still 200 when degraded: the API itself is up, generation fails fast
+        "status": "degraded" if breaker["state"] == OPEN else "healthy",
         "version": __version__,
         "timestamp": datetime.now().isoformat(),
+        # Never builds the provider: that imports its client libraries
+        "provider": provider_name(),
+        "blob_store": get_blob_store().status(),
+        "circuit_breaker": breaker,
     }
 
 
-@app.get("/api/version")
+@router.get("/api/version")
 async def read_root():
     """Root endpoint returning API version"""
     logger.info("🌐 API root endpoint accessed")
     return {"version": __version__}
 
 
-@app.get("/api/images")
-async def get_images():
-    """Get list of available images"""
-    logger.info("📸 Fetching available images")
+@router.get("/api/cache/stats")
+async def get_cache_stats():
+    """Result cache hit/miss counters"""
+    return result_cache.stats()
+
+
+@router.get("/api/images")
+async def get_images(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    theme: Optional[str] = None,
+    complexity: Optional[str] = None,
+    language: Optional[str] = None,
+    q: Optional[str] = None,
+    collapse: bool = False,
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Get a page of available images, newest first by default.
+
+    With collapse=true each group of near-duplicate pages is shown once.
+    """
+    sampled_logger.info("📸 Fetching available images")
     try:
-        images = get_image_filenames(str(IMAGES_DIR))
-        logger.info(f"✅ Found {len(images)} images")
-        return {"images": images}
+        query = dict(
+            limit=limit,
+            cursor=cursor,
+            sort=sort,
+            theme=theme,
+            complexity=complexity,
+            language=language,
+            search=q,
+            collapse=collapse,
+        )
+        if not gallery_cache.ready:
+            page = await run_in_threadpool(list_images, **query)
+            sampled_logger.info(f"✅ Found {len(page['images'])} images")
+            return page
+
+        # Served from memory: no disk I/O, and an unchanged gallery is a 304
+        etag = gallery_cache.etag(repr(sorted(query.items())))
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        page = list_images(**query)
+        sampled_logger.info(f"✅ Found {len(page['images'])} images")
+        return JSONResponse(page, headers=headers)
+    except ValueError as e:
+        logger.warning(f"⚠️ Invalid gallery query: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Error fetching images: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/generate")
+@router.post("/api/generate")
 async def generate_image(
     prompt: str = Form(...),
     language: str = Form("en"),
     complexity: str = Form("medium"),
     theme: str = Form("none"),
+    force_fresh: bool = Form(False),
 ):
     """Generate a new coloring page"""
     logger.info(
         f"🎨 Generating new image with prompt: {prompt} in language: {language}, complexity: {complexity}, theme: {theme}"
     )
     try:
-        image_path = create_colouring_page(prompt, language, complexity, theme)
+        image_path = await create_colouring_page_async(
+            prompt, language, complexity, theme, force_fresh=force_fresh
+        )
         if not image_path:
             raise HTTPException(status_code=500, detail="Failed to generate image")
 
         logger.info(f"✅ Image generated successfully: {image_path}")
-
-        # Update metadata
-        metadata = load_metadata(str(METADATA_FILE))
-        metadata[image_path] = {
-            "prompt": prompt,
-            "language": language,
-            "complexity": complexity,
-            "theme": theme,
-            "created_at": str(datetime.now().isoformat()),
-        }
-        save_metadata(metadata, str(METADATA_FILE))
-        logger.info("💾 Metadata updated")
+        await run_in_threadpool(_cache_new_image, image_path)
 
         return {"image_path": image_path}
+    except CircuitOpenError as e:
+        logger.warning(f"⚠️ {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        )
     except Exception as e:
         logger.error(f"❌ Error generating image: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/images/{image_name}")
-async def get_image(image_name: str):
-    """Serve an image file"""
-    logger.info(f"🖼️ Serving image: {image_name}")
-    image_path = IMAGES_DIR / image_name
-    if not image_path.exists():
-        logger.error(f"❌ Image not found: {image_path}")
+@router.post("/api/generate/batch")
+async def generate_image_batch(
+    prompts: Optional[List[str]] = Form(None),
+    prompt: Optional[str] = Form(None),
+    variants: int = Form(1),
+    language: str = Form("en"),
+    complexity: str = Form("medium"),
+    theme: str = Form("none"),
+    force_fresh: bool = Form(False),
+):
+    """
+    Generate a pack of coloring pages, either one per entry of `prompts` or
+    `variants` pages of one `prompt`. Results are streamed as NDJSON, one
+    line per page as it finishes, followed by a summary line.
+    """
+    try:
+        items = batch_items(
+            prompts, prompt, variants, language, complexity, theme, force_fresh
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"📦 Generating batch of {len(items)} pages")
+
+    async def stream_results():
+        async for result in generate_batch(items, on_commit=_cache_new_images):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@router.post("/api/export/pdf")
+async def export_pdf(
+    images: List[str] = Form(...),
+    paper: str = Form("a4"),
+    per_page: int = Form(1),
+    margin: float = Form(10),
+):
+    """
+    Export coloring pages as one print-ready PDF, `per_page` pages to a
+    sheet, in the order given. The PDF is streamed while it is built and
+    cached, so the same selection and layout is served from disk next time.
+    """
+    try:
+        validate_export(images, paper, per_page, margin)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    missing = await run_in_threadpool(missing_images, images)
+    if missing:
+        raise HTTPException(status_code=404, detail=str(ImagesNotFoundError(missing)))
+
+    try:
+        key = await run_in_threadpool(export_key, images, paper, per_page, margin)
+    except ImagesNotFoundError as e:
+        # Deleted between the check above and now
+        raise HTTPException(status_code=404, detail=str(e))
+    headers = {
+        "Content-Disposition": 'attachment; filename="colouring-pages.pdf"',
+        "ETag": f'"{key}"',
+    }
+    cached = await run_in_threadpool(cached_export, key)
+    if cached is not None:
+        logger.info(f"📄 Serving cached export of {len(images)} pages")
+        return FileResponse(cached, media_type="application/pdf", headers=headers)
+
+    logger.info(f"📄 Exporting {len(images)} pages, {per_page} per {paper} sheet")
+    chunks = render_pdf(images, paper, per_page, margin)
+    return StreamingResponse(
+        stream_and_cache(key, chunks), media_type="application/pdf", headers=headers
+    )
+
+
+@router.post("/api/export/zip")
+async def export_zip(
+    images: Optional[List[str]] = Form(None),
+    theme: Optional[str] = Form(None),
+    complexity: Optional[str] = Form(None),
+    language: Optional[str] = Form(None),
+    q: Optional[str] = Form(None),
+):
+    """
+    Download gallery images as one ZIP archive: the `images` listed, the
+    images matching the gallery filters, or both combined. The archive is
+    streamed as it is written and never staged in memory or on disk.
+    """
+    try:
+        selection = await run_in_threadpool(
+            select_images, str(IMAGES_DIR), images, theme, complexity, language, q
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not selection:
+        raise HTTPException(status_code=404, detail="No images match the selection")
+
+    logger.info(f"🗜️ Archiving {len(selection)} images")
+    names = [image["filename"] for image in selection]
+    return StreamingResponse(
+        stream_zip(str(IMAGES_DIR), names),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="colouring-pages.zip"'},
+    )
+
+
+@router.post("/api/jobs", status_code=202)
+async def submit_job(
+    prompt: str = Form(...),
+    language: str = Form("en"),
+    complexity: str = Form("medium"),
+    theme: str = Form("none"),
+    force_fresh: bool = Form(False),
+):
+    """Queue a coloring page generation and return its job id immediately"""
+    logger.info(f"📥 Submitting generation job for prompt: {prompt}")
+    try:
+        job = await job_queue.submit(
+            {
+                "prompt": prompt,
+                "language": language,
+                "complexity": complexity,
+                "theme": theme,
+                "force_fresh": force_fresh,
+            }
+        )
+    except JobQueueFullError as e:
+        logger.warning(f"⚠️ Job queue full: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many queued jobs, try again later",
+            headers={"Retry-After": "10"},
+        )
+    return job
+
+
+@router.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Report the state of a generation job"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream job state changes as server-sent events until the job finishes"""
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for job in job_queue.events(job_id):
+            yield format_sse(job)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/images/{image_name}")
+async def get_image(
+    image_name: str,
+    size: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Serve an image file, or one of its thumbnails when size is given.
+
+    Pages never change once written, so responses carry a content-hash ETag
+    and immutable caching; revalidations are answered with 304.
+    """
+    sampled_logger.info(f"🖼️ Serving image: {image_name} (size: {size or 'full'})")
+    # Images created on another node are fetched from the blob store first
+    path = await run_in_threadpool(ensure_local, image_name, IMAGES_DIR)
+    if size is not None:
+        try:
+            rendition = await run_in_threadpool(get_rendition, image_name, size)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if rendition is None:
+            logger.error(f"❌ Image not found: {image_name}")
+            raise HTTPException(status_code=404, detail="Image not found")
+        response = await run_in_threadpool(
+            immutable_file_response,
+            rendition,
+            if_none_match,
+            RENDITION_MEDIA_TYPE,
+            f"renditions/{rendition.relative_to(RENDITIONS_DIR).as_posix()}",
+        )
+    else:
+        if path is None:
+            logger.error(f"❌ Image not found: {image_name}")
+            raise HTTPException(status_code=404, detail="Image not found")
+        response = await run_in_threadpool(
+            immutable_file_response,
+            path,
+            if_none_match,
+            None,
+            f"images/{path.relative_to(IMAGES_DIR).as_posix()}",
+        )
+    if response is None:
+        logger.error(f"❌ Image not found: {image_name}")
         raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(str(image_path))
+    # Only once the image is known to exist, so requests for missing names
+    # don't pile up in the tracker
+    access_tracker.touch(image_name)
+    return response
 
 
-@app.delete("/api/images/{image_name}")
+@router.get("/api/images/{image_name}/similar")
+async def get_similar_images(
+    image_name: str,
+    max_distance: int = SIMILAR_MAX_DISTANCE,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Get the pages that look most like an image, closest first"""
+    try:
+        if gallery_cache.ready and gallery_cache.hashes.get(image_name) is not None:
+            # Answered from the in-memory hash index
+            result = similar_images(image_name, str(IMAGES_DIR), max_distance, limit)
+        else:
+            await run_in_threadpool(ensure_local, image_name, IMAGES_DIR)
+            result = await run_in_threadpool(
+                similar_images, image_name, str(IMAGES_DIR), max_distance, limit
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    sampled_logger.info(f"🔍 Found {len(result['images'])} pages similar to {image_name}")
+    return result
+
+
+@router.delete("/api/images/{image_name}")
 async def delete_image(image_name: str):
     """Delete an image"""
     # Decode the URL-encoded filename
     decoded_name = unquote(image_name)
     logger.info(f"🗑️ Deleting image: {decoded_name}")
     try:
-        image_path = IMAGES_DIR / decoded_name
-        if not image_path.exists():
-            logger.error(f"❌ Image not found: {image_path}")
-            raise HTTPException(status_code=404, detail="Image not found")
-
-        image_path.unlink()
-        logger.info(f"✅ Image deleted: {image_path}")
-
-        # Update metadata
-        metadata = load_metadata(str(METADATA_FILE))
-        if decoded_name in metadata:
-            del metadata[decoded_name]
-            save_metadata(metadata, str(METADATA_FILE))
-            logger.info("💾 Metadata updated")
-
-        return {"message": "Image deleted successfully"}
+        result = await run_in_threadpool(delete_images, [decoded_name], str(IMAGES_DIR))
+    except ValueError:
+        result = {"deleted": []}
     except Exception as e:
         logger.error(f"❌ Error deleting image: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    if not result["deleted"]:
+        logger.error(f"❌ Image not found: {decoded_name}")
+        raise HTTPException(status_code=404, detail="Image not found")
+    logger.info(f"✅ Image deleted: {decoded_name}")
+    return {"message": "Image deleted successfully"}
 
 
-@app.get("/{full_path:path}")
-async def serve_spa(full_path: str, request: Request):
-    """Serve the SPA for any unmatched routes"""
-    logger.debug(f"🔍 Full request path: {full_path}")
-    logger.debug(
-        f"🔍 Request headers: {request.headers}"
-    )  # Now request is properly defined
+@router.post("/api/images/bulk-delete")
+async def bulk_delete_images(images: List[str] = Form(...)):
+    """Delete several images at once; their metadata goes in one transaction"""
+    logger.info(f"🗑️ Deleting {len(images)} images")
+    try:
+        result = await run_in_threadpool(delete_images, images, str(IMAGES_DIR))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Error deleting images: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "deleted": len(result["deleted"]),
+        "missing": result["missing"],
+    }
+
 
+@router.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+async def serve_spa(
+    full_path: str,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    range: Optional[str] = Header(None),
+):
+    """Serve the frontend build from the static manifest, falling back to the SPA"""
     # If it starts with 'undefined', strip it off
     if full_path.startswith("undefined/"):
         full_path = full_path[10:]  # Remove 'undefined/'
@@ -196,55 +591,129 @@ async def serve_spa(full_path: str, request: Request):
         logger.error(f"❌ API route reached SPA handler: {full_path}")
         raise HTTPException(status_code=404, detail="API route not found")
 
-    # Check if static file exists first
-    static_path = Path("static") / full_path
-    if static_path.is_file():
-        logger.info(f"📄 Serving static file: {static_path}")
-        return FileResponse(str(static_path))
-
-    # If not a static file, serve index.html
-    logger.info(f"🔄 Route {full_path} not found, serving SPA index.html")
-
-    if not Path("static/index.html").exists():
+    # Normally indexed in the background at startup; a request that arrives
+    # first indexes it here
+    if not static_manifest.built:
+        await run_in_threadpool(static_manifest.ensure_built, str(STATIC_DIR))
+
+    asset = static_manifest.get(full_path)
+    if asset is not None:
+        sampled_logger.info(f"📄 Serving static file: {full_path}")
+        return static_manifest.response(
+            asset, accept_encoding, if_none_match, has_range=range is not None
+        )
+
+    # A missing build asset is a stale reference, not a client-side route
+    if full_path.startswith("assets/"):
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    sampled_logger.info(f"🔄 Route {full_path} not found, serving SPA index.html")
+    index = static_manifest.index
+    if index is None:
         logger.error("❌ Frontend build missing! No static/index.html found")
         raise HTTPException(status_code=500, detail="Frontend build not found")
-
-    return FileResponse("static/index.html")
+    return static_manifest.response(index, accept_encoding, if_none_match)
+
+
+async def _warm_up() -> None:
+    """
+    Build the in-memory indexes after the server is already answering.
+
+    Until each step finishes, requests fall back to slower paths: the
+    gallery is queried from the metadata store and the static manifest is
+    built by the first frontend request.
+    """
+    global gallery_watcher, retention_job
+    await run_in_threadpool(static_manifest.ensure_built, str(STATIC_DIR))
+    # Images stay reachable at their flat paths while they are moved
+    await run_in_threadpool(migrate_layout, IMAGES_DIR)
+    await run_in_threadpool(sync_index, str(IMAGES_DIR))
+    await run_in_threadpool(gallery_cache.build, str(IMAGES_DIR), get_metadata_store())
+    await run_in_threadpool(lambda: result_cache.warm(get_metadata_store().all()))
+    gallery_watcher = DirectoryWatcher(
+        str(IMAGES_DIR), gallery_cache, get_metadata_store()
+    )
+    gallery_watcher.start()
+    retention_job = RetentionJob(str(IMAGES_DIR))
+    retention_job.start()
+    # Creating the provider imports its client libraries
+    await run_in_threadpool(lambda: get_provider().start())
+    logger.info("🔥 Warm-up finished")
+    if HASH_BACKFILL:
+        await run_in_threadpool(
+            backfill_hashes,
+            str(IMAGES_DIR),
+            get_metadata_store(),
+            gallery_cache.refresh,
+            stop=backfill_stop,
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Configure logging and start the background services.
+
+    Startup only does constant work so the first request, usually a health
+    check, is answered at once; indexing the gallery and the frontend build
+    runs in the background.
+    """
+    configure_logging()
+    for directory in (LOG_DIR, IMAGES_DIR, STATIC_DIR):
+        directory.mkdir(exist_ok=True)
+
+    logger.info(f"🚀 Starting application version {__version__}")
+    logger.info(f"🐍 Python version: {sys.version}")
+    logger.info(f"📂 Working directory: {PROJECT_ROOT.absolute()}")
+    logger.info(f"📁 Images directory: {IMAGES_DIR.absolute()}")
+    logger.info(f"📄 Metadata backend: {METADATA_BACKEND}")
+    logger.info(f"🌐 Static files directory: {STATIC_DIR.absolute()}")
+
+    await job_queue.start()
+    backfill_stop.clear()
+    warm_up = asyncio.create_task(_warm_up())
+    try:
+        yield
+    finally:
+        backfill_stop.set()
+        warm_up.cancel()
+        await asyncio.gather(warm_up, return_exceptions=True)
+        await job_queue.stop()
+        if gallery_watcher is not None:
+            gallery_watcher.stop()
+        if retention_job is not None:
+            retention_job.stop()
+        provider = current_provider()
+        if provider is not None:
+            provider.close()
+        await close_async_resources()
+        await logger.complete()
+
+
+def create_app() -> FastAPI:
+    """
+    Build the application.
+
+    Returns:
+        The FastAPI app with its middleware, routes and lifespan
+    """
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allowed_origins if not is_production else ["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(RequestMetricsMiddleware, profiler=profiler)
+    # Before the main routes, whose SPA fallback would catch its GETs
+    if PROFILER_ENABLED:
+        app.include_router(profiler_router)
+    app.include_router(router)
+    return app
 
 
-# Add logging to the static files mount
-class LoggingStaticFiles(StaticFiles):
-    async def get_response(self, path: str, scope):
-        logger.info(f"📁 Static file requested: {path}")
-        try:
-            response = await super().get_response(path, scope)
-            logger.info(f"✅ Static file served successfully: {path}")
-            return response
-        except Exception as e:
-            logger.error(f"❌ Error serving static file {path}: {str(e)}")
-            raise
-
-
-# Finally, mount static files LAST with logging
-app.mount("/", LoggingStaticFiles(directory=str(STATIC_DIR), html=True), name="static")
-
-
-# Add startup event handler
-@app.on_event("startup")
-async def startup_event():
-    """Log information about the static files directory on startup"""
-    static_dir = Path("static")
-    if not static_dir.exists():
-        logger.error("❌ Static directory not found!")
-        return
-
-    files = list(static_dir.rglob("*"))
-    logger.info(f"📂 Static directory contents ({len(files)} files):")
-    for file in files:
-        if file.is_file():
-            logger.info(f"  └─ 📄 {file.relative_to(static_dir)}")
-        else:
-            logger.info(f"  └─ 📁 {file.relative_to(static_dir)}/")
+app = create_app()
 
 
 if __name__ == "__main__":
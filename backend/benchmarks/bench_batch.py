@@ -0,0 +1,98 @@
+"""
+Benchmark: batch generation throughput against the local provider.
+
+Generates the same pack of pages as sequential POST /api/generate calls and
+as one POST /api/generate/batch at each concurrency, all through the ASGI
+app with the offline local provider, and reports pages per second.
+
+Usage:
+    python benchmarks/bench_batch.py --pages 32 --concurrency 1 4 16 --model-seconds 0.5
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+from loguru import logger  # noqa: E402
+
+import app as app_module  # noqa: E402
+from src import batch, generate_image, renditions  # noqa: E402
+from src.metadata_store import SqliteMetadataStore, set_metadata_store  # noqa: E402
+from src.providers import LocalProvider, set_provider  # noqa: E402
+
+
+def _setup(tmp_dir: Path, model_seconds: float, size: int, max_concurrency: int) -> None:
+    set_provider(LocalProvider(latency=model_seconds, size=size))
+    images_dir = tmp_dir / "images"
+    images_dir.mkdir()
+    for module in (app_module, generate_image, renditions):
+        module.IMAGES_DIR = images_dir
+    renditions.RENDITIONS_DIR = tmp_dir / "renditions"
+    set_metadata_store(SqliteMetadataStore(str(tmp_dir / "image_metadata.db")))
+    # Let the batch concurrency, not the global limit, be the bottleneck
+    generate_image.MAX_CONCURRENT_GENERATIONS = max_concurrency
+    generate_image._generation_semaphore = None
+
+
+async def _sequential(client: httpx.AsyncClient, prompts: list) -> int:
+    ok = 0
+    for prompt in prompts:
+        response = await client.post(
+            "/api/generate", data={"prompt": prompt, "force_fresh": "true"}
+        )
+        ok += response.status_code == 200
+    return ok
+
+
+async def _batch(client: httpx.AsyncClient, prompts: list, concurrency: int) -> int:
+    batch.BATCH_CONCURRENCY = concurrency
+    ok = 0
+    data = {"prompts": prompts, "force_fresh": "true"}
+    async with client.stream("POST", "/api/generate/batch", data=data) as response:
+        async for line in response.aiter_lines():
+            result = json.loads(line)
+            ok += result.get("status") == "done"
+    return ok
+
+
+async def main(pages: int, concurrencies: list, round_id: str) -> None:
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        print(f"{'mode':>16} {'pages':>6} {'ok':>4} {'seconds':>8} {'pages/s':>8}")
+        runs = [("sequential", None)] + [(f"batch c={c}", c) for c in concurrencies]
+        for label, concurrency in runs:
+            prompts = [f"{label} {round_id} page {i}" for i in range(pages)]
+            started = time.perf_counter()
+            if concurrency is None:
+                ok = await _sequential(client, prompts)
+            else:
+                ok = await _batch(client, prompts, concurrency)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{label:>16} {pages:>6} {ok:>4} {elapsed:>8.2f} {pages / elapsed:>8.2f}"
+            )
+    await generate_image.close_async_resources()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--model-seconds", type=float, default=0.5)
+    parser.add_argument("--image-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    logger.remove()
+    batch.MAX_BATCH_SIZE = max(batch.MAX_BATCH_SIZE, args.pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(Path(tmp), args.model_seconds, args.image_size, max(args.concurrency))
+        asyncio.run(main(args.pages, args.concurrency, str(int(time.time()))))
@@ -0,0 +1,153 @@
+"""
+Benchmark: cold start, from a fresh interpreter to the first /health.
+
+Copies the backend (the working tree, or any git ref with --ref) into a
+temporary directory with a synthetic gallery of --images files, then, in
+fresh processes, measures:
+
+  import  - seconds to `import app`, and which heavy libraries it loaded
+  health  - seconds from spawning `uvicorn app:app` to a 200 from /health
+
+Each is repeated --runs times and the median is reported, so the numbers
+can be tracked across releases.
+
+Usage:
+    python benchmarks/bench_cold_start.py --images 0 5000 --runs 5
+    python benchmarks/bench_cold_start.py --ref v1.5.0 --images 5000
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from benchmarks.bench_metadata import synthetic_entries  # noqa: E402
+from src.metadata_store import SqliteMetadataStore  # noqa: E402
+
+# Libraries that should only load when first needed
+HEAVY_MODULES = ("PIL", "numpy", "replicate", "requests", "httpx")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def _copy_backend(target: Path, ref: str) -> Path:
+    """Put app.py and src/ of the working tree or a git ref under target"""
+    if not ref:
+        shutil.copy(BACKEND_DIR / "app.py", target / "app.py")
+        shutil.copytree(
+            BACKEND_DIR / "src", target / "src", ignore=shutil.ignore_patterns("__pycache__")
+        )
+        return target
+    archive = subprocess.run(
+        # Run from backend/, so paths in the archive are relative to it
+        ["git", "archive", "--format=tar", ref, "app.py", "src"],
+        cwd=BACKEND_DIR,
+        check=True,
+        capture_output=True,
+    ).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(target)
+    return target
+
+
+def _fill_gallery(app_dir: Path, count: int) -> None:
+    images_dir = app_dir / "images"
+    images_dir.mkdir(exist_ok=True)
+    entries = synthetic_entries(count)
+    for name in entries:
+        (images_dir / name).touch()
+    SqliteMetadataStore(str(app_dir / "image_metadata.db")).upsert_many(entries)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _time_import(app_dir: Path, env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=app_dir,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _time_to_health(app_dir: Path, env: dict, timeout: float = 60) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=app_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get("/health").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    time.sleep(0.005)
+        raise RuntimeError("Server did not answer /health")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main(gallery_sizes: list, runs: int, ref: str, provider: str) -> None:
+    env = dict(os.environ, IMAGE_PROVIDER=provider, LOG_LEVEL="WARNING")
+    print(f"{'images':>7} {'import s':>9} {'/health s':>10}  heavy modules at import")
+    for count in gallery_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            app_dir = _copy_backend(Path(tmp), ref)
+            _fill_gallery(app_dir, count)
+            imports = [_time_import(app_dir, env) for _ in range(runs)]
+            health = [_time_to_health(app_dir, env) for _ in range(runs)]
+        import_s = statistics.median(run["seconds"] for run in imports)
+        print(
+            f"{count:>7} {import_s:>9.3f} {statistics.median(health):>10.3f}  "
+            f"{', '.join(imports[-1]['heavy']) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, nargs="+", default=[0, 5000])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ref", default="", help="git ref to measure instead of the working tree")
+    parser.add_argument("--provider", default="local")
+    args = parser.parse_args()
+
+    logger.remove()
+    main(args.images, args.runs, args.ref, args.provider)
@@ -0,0 +1,117 @@
+"""
+Benchmark: PDF export throughput and peak memory.
+
+Exports packs of synthetic 1024px colouring pages with render_pdf at each
+layout, and with Pillow's save_all (every page held in memory) for
+comparison. Each run happens in a fresh process so its peak RSS is its own.
+
+Exits with status 1 if a streamed export grows the RSS by more than
+--max-growth-mb, so it can gate a change to the PDF writer. The Pillow run
+holding every page is expected to go over and is not checked.
+
+Usage:
+    python benchmarks/bench_export.py --pages 1 50 200 --per-page 1 4 --max-growth-mb 32
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from loguru import logger  # noqa: E402
+
+
+def _make_pages(images_dir: Path, count: int, size: int) -> list:
+    from src.providers import LocalProvider
+
+    provider = LocalProvider(size=size)
+    names = []
+    for i in range(count):
+        name = f"page {i}_{1700000000 + i}.png"
+        provider.draw(f"page {i}").save(images_dir / name)
+        names.append(name)
+    return names
+
+
+def _run(mode: str, images_dir: str, names: list, per_page: int, queue) -> None:
+    """Export in this process and report seconds, bytes and peak RSS"""
+    logger.remove()
+    from PIL import Image
+    from src import pdf_export
+    from src.metadata_store import SqliteMetadataStore, set_metadata_store
+
+    pdf_export.IMAGES_DIR = Path(images_dir)
+    set_metadata_store(SqliteMetadataStore(str(Path(images_dir) / "meta.db")))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    size = 0
+    if mode == "stream":
+        with open(Path(images_dir) / "out.pdf", "wb") as f:
+            for chunk in pdf_export.render_pdf(names, per_page=per_page):
+                f.write(chunk)
+                size += len(chunk)
+    else:
+        pages = [Image.open(Path(images_dir) / name).convert("L") for name in names]
+        out = Path(images_dir) / "out.pdf"
+        pages[0].save(out, "PDF", save_all=True, append_images=pages[1:], resolution=150)
+        size = out.stat().st_size
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, size, baseline, peak))
+
+
+def main(page_counts: list, layouts: list, size: int, max_growth_mb: float) -> list:
+    context = multiprocessing.get_context("spawn")
+    print(
+        f"{'exporter':>10} {'pages':>6} {'per sheet':>9} {'pages/s':>8} "
+        f"{'MB out':>7} {'peak RSS MB':>12} {'growth MB':>10}"
+    )
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        images_dir = Path(tmp)
+        all_names = _make_pages(images_dir, max(page_counts), size)
+        runs = [("stream", per_page) for per_page in layouts] + [("pillow", 1)]
+        for mode, per_page in runs:
+            for count in page_counts:
+                queue = context.Queue()
+                process = context.Process(
+                    target=_run,
+                    args=(mode, str(images_dir), all_names[:count], per_page, queue),
+                )
+                process.start()
+                elapsed, out_bytes, baseline, peak = queue.get()
+                process.join()
+                # ru_maxrss is in KiB on Linux
+                growth_mb = (peak - baseline) / 1024
+                print(
+                    f"{mode:>10} {count:>6} {per_page:>9} {count / elapsed:>8.1f} "
+                    f"{out_bytes / 1e6:>7.1f} {peak / 1024:>12.0f} {growth_mb:>10.0f}"
+                )
+                if mode == "stream" and growth_mb > max_growth_mb:
+                    failures.append(
+                        f"{count} pages, {per_page} per sheet: RSS grew {growth_mb:.0f} MB, "
+                        f"over {max_growth_mb} MB"
+                    )
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 50, 200])
+    parser.add_argument("--per-page", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--max-growth-mb", type=float, default=32)
+    args = parser.parse_args()
+
+    logger.remove()
+    failures = main(args.pages, args.per_page, args.image_size, args.max_growth_mb)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,89 @@
+"""
+Benchmark: gallery listing latency, directory scan vs. indexed pages.
+
+Compares the full get_image_filenames() scan with list_images() serving the
+first page, a deep page reached through the cursor, and a filtered page from
+the SQLite index, plus the first page from the in-memory gallery cache.
+
+Usage:
+    python benchmarks/bench_gallery.py --sizes 1000 10000 100000
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from loguru import logger  # noqa: E402
+
+from benchmarks.bench_metadata import synthetic_entries  # noqa: E402
+from src.gallery import get_image_filenames, list_images  # noqa: E402
+from src.gallery_cache import GalleryCache  # noqa: E402
+from src.metadata_store import SqliteMetadataStore  # noqa: E402
+
+
+def median_ms(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main(sizes: list, page_size: int, repeat: int) -> None:
+    print(
+        f"{'images':>8} {'full scan ms':>13} {'first page ms':>14} "
+        f"{'page 10 ms':>11} {'filtered ms':>12} {'cached ms':>10}"
+    )
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            images_dir = Path(tmp) / "images"
+            images_dir.mkdir()
+            entries = synthetic_entries(size)
+            for name in entries:
+                (images_dir / name).touch()
+            store = SqliteMetadataStore(str(Path(tmp) / "meta.db"))
+            store.upsert_many(entries)
+
+            cursor = None
+            for _ in range(9):
+                cursor = list_images(limit=page_size, cursor=cursor, store=store)[
+                    "next_cursor"
+                ]
+
+            scan = median_ms(lambda: get_image_filenames(str(images_dir), store), repeat)
+            first = median_ms(lambda: list_images(limit=page_size, store=store), repeat)
+            deep = median_ms(
+                lambda: list_images(limit=page_size, cursor=cursor, store=store), repeat
+            )
+            filtered = median_ms(
+                lambda: list_images(
+                    limit=page_size, theme="cute", language="fi", store=store
+                ),
+                repeat,
+            )
+
+            cache = GalleryCache()
+            cache.build(str(images_dir), store)
+            cached = median_ms(lambda: cache.query(limit=page_size), repeat)
+
+        print(
+            f"{size:>8} {scan:>13.2f} {first:>14.2f} {deep:>11.2f} "
+            f"{filtered:>12.2f} {cached:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.remove()
+    main(args.sizes, args.page_size, args.repeat)
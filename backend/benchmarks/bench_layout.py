@@ -0,0 +1,141 @@
+"""
+Benchmark: flat vs. sharded image layout, migration and retention passes.
+
+For each gallery size, fills one folder in the old flat layout and one in
+the sharded layout with empty page files, then measures:
+
+  lookup    - microseconds to find a random page: a stat of the flat
+              path as before, locate_image in the sharded layout
+  create    - microseconds to write and rename a new page into place
+  scan      - milliseconds to list every page name
+  migrate   - seconds to move the flat gallery into shards
+  retention - seconds for a full RetentionJob pass over the sharded
+              gallery that evicts 10% of it by last access
+
+Usage:
+    python benchmarks/bench_layout.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from loguru import logger  # noqa: E402
+
+from benchmarks.bench_metadata import synthetic_entries  # noqa: E402
+from src import renditions  # noqa: E402
+from src.blob_storage import scan_image_files  # noqa: E402
+from src.image_layout import image_path, locate_image, migrate_flat_layout  # noqa: E402
+from src.metadata_store import SqliteMetadataStore  # noqa: E402
+from src.retention import AccessTracker, RetentionJob, RetentionPolicy  # noqa: E402
+
+
+def _fill(folder: Path, names: list, sharded: bool) -> None:
+    folder.mkdir()
+    for name in names:
+        path = image_path(folder, name) if sharded else folder / name
+        path.parent.mkdir(exist_ok=True)
+        path.touch()
+
+
+def _flat_lookup(folder: Path, name: str) -> bool:
+    return (folder / name).is_file()
+
+
+def _per_call_us(func, names: list) -> float:
+    started = time.perf_counter()
+    for name in names:
+        func(name)
+    return (time.perf_counter() - started) / len(names) * 1e6
+
+
+def _create(folder: Path, sharded: bool):
+    def create(name: str) -> None:
+        target = image_path(folder, name) if sharded else folder / name
+        target.parent.mkdir(exist_ok=True)
+        partial = target.with_name(f".{name}.part")
+        partial.write_bytes(b"page")
+        os.replace(partial, target)
+
+    return create
+
+
+def _scan_ms(folder: Path, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        scan_image_files(folder)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main(sizes: list, lookups: int, repeat: int) -> None:
+    print(
+        f"{'images':>8} {'layout':>8} {'lookup us':>10} {'create us':>10} "
+        f"{'scan ms':>9} {'migrate s':>10} {'retention s':>12}"
+    )
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            renditions.RENDITIONS_DIR = tmp / "renditions"
+            entries = synthetic_entries(size)
+            names = list(entries)
+            sample = random.sample(names, min(lookups, size))
+            new_names = [f"new_page_{i}.png" for i in range(lookups)]
+
+            results = {}
+            for layout, sharded, lookup in (
+                ("flat", False, _flat_lookup),
+                ("sharded", True, locate_image),
+            ):
+                folder = tmp / layout
+                _fill(folder, names, sharded)
+                results[layout] = [
+                    _per_call_us(lambda name: lookup(folder, name), sample),
+                    _per_call_us(_create(folder, sharded), new_names),
+                    _scan_ms(folder, repeat),
+                ]
+
+            started = time.perf_counter()
+            migrate_flat_layout(tmp / "flat")
+            migrate_s = time.perf_counter() - started
+
+            store = SqliteMetadataStore(str(tmp / "meta.db"))
+            store.upsert_many(entries)
+            tracker = AccessTracker()
+            for name in names[: size // 2]:
+                tracker.touch(name)
+            policy = RetentionPolicy(max_images=int((size + lookups) * 0.9))
+            job = RetentionJob(str(tmp / "sharded"), store, policy, tracker)
+            started = time.perf_counter()
+            job.run_once()
+            retention_s = time.perf_counter() - started
+
+        for layout in ("flat", "sharded"):
+            lookup, create, scan = results[layout]
+            extra = (
+                f"{migrate_s:>10.2f} {'':>12}"
+                if layout == "flat"
+                else f"{'':>10} {retention_s:>12.2f}"
+            )
+            print(
+                f"{size:>8} {layout:>8} {lookup:>10.1f} {create:>10.1f} {scan:>9.1f} {extra}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    main(args.sizes, args.lookups, args.repeat)
@@ -0,0 +1,74 @@
+"""
+Benchmark: line-art post-processing throughput and working memory.
+
+Runs every complexity profile over synthetic noisy line-art pages at screen
+and print resolutions, reporting images/sec, peak NumPy working memory
+(tracemalloc) and output size against the RGB PNG the page started as.
+
+Usage:
+    python benchmarks/bench_lineart.py --sizes 1024 4096 --images 5
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import numpy as np  # noqa: E402
+from loguru import logger  # noqa: E402
+from PIL import Image, ImageFilter  # noqa: E402
+
+from benchmarks.bench_renditions import synthetic_page  # noqa: E402
+from src import lineart  # noqa: E402
+
+
+def noisy_page(seed: int, size: int) -> Image.Image:
+    """Soft, noisy outlines like a model's anti-aliased output"""
+    img = synthetic_page(seed, size).convert("L").filter(ImageFilter.GaussianBlur(1))
+    noise = np.random.default_rng(seed).integers(-20, 20, (size, size))
+    return Image.fromarray(np.clip(np.asarray(img) + noise, 0, 255).astype(np.uint8))
+
+
+def encoded_size(img: Image.Image, **params) -> int:
+    buf = BytesIO()
+    img.save(buf, "PNG", **params)
+    return buf.tell()
+
+
+def main(sizes: list, images: int) -> None:
+    print(
+        f"{'size':>6} {'profile':>9} {'img/s':>7} {'peak MB':>8} "
+        f"{'RGB PNG KB':>11} {'out KB':>8}"
+    )
+    for size in sizes:
+        pages = [noisy_page(seed, size) for seed in range(images)]
+        rgb_kb = encoded_size(pages[0].convert("RGB")) / 1024
+        for complexity in lineart.PROFILES:
+            tracemalloc.start()
+            start = time.perf_counter()
+            for page in pages:
+                result = lineart.process_image(page, complexity)
+            elapsed = time.perf_counter() - start
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+            bits = 1 if result.mode == "1" else 2
+            out_kb = encoded_size(result, optimize=True, bits=bits) / 1024
+            print(
+                f"{size:>6} {complexity:>9} {images / elapsed:>7.2f} {peak_mb:>8.1f} "
+                f"{rgb_kb:>11.0f} {out_kb:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 4096])
+    parser.add_argument("--images", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.remove()
+    main(args.sizes, args.images)
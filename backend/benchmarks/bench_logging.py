@@ -0,0 +1,133 @@
+"""
+Benchmark: request throughput under the old and new logging setups.
+
+Serves GET /api/images from the in-memory gallery and a static asset through
+the ASGI app and reports requests per second with:
+
+  legacy - the previous setup: synchronous DEBUG console and file sinks with
+           backtrace/diagnose on and every hit logged
+  text   - configure_logging() defaults: enqueued INFO sinks, sampled hits
+  json   - the same with LOG_FORMAT=json
+
+Console output goes to a temporary file so the terminal speed doesn't skew
+the numbers.
+
+Usage:
+    python benchmarks/bench_logging.py --requests 2000 --concurrency 8
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+from loguru import logger  # noqa: E402
+
+import app as app_module  # noqa: E402
+from benchmarks.bench_metadata import synthetic_entries  # noqa: E402
+from src.gallery_cache import gallery_cache  # noqa: E402
+from src.logging_config import (  # noqa: E402
+    CONSOLE_FORMAT,
+    FILE_FORMAT,
+    configure_logging,
+)
+from src.metadata_store import SqliteMetadataStore, set_metadata_store  # noqa: E402
+
+ENDPOINTS = {"gallery": "/api/images?limit=50", "static": "/assets/app.js"}
+
+
+def _legacy_logging(console, log_file: Path) -> None:
+    """The sinks app.py used to install"""
+    logger.remove()
+    logger.add(
+        console,
+        format=CONSOLE_FORMAT,
+        level="DEBUG",
+        colorize=True,
+        backtrace=True,
+        diagnose=True,
+    )
+    logger.add(
+        log_file,
+        format=FILE_FORMAT,
+        level="DEBUG",
+        rotation="1 day",
+        retention="7 days",
+        backtrace=True,
+        diagnose=True,
+    )
+
+
+def _setup(tmp_dir: Path, images: int) -> None:
+    images_dir = tmp_dir / "images"
+    images_dir.mkdir()
+    entries = synthetic_entries(images)
+    for name in entries:
+        (images_dir / name).touch()
+    store = SqliteMetadataStore(str(tmp_dir / "meta.db"))
+    store.upsert_many(entries)
+    set_metadata_store(store)
+    gallery_cache.build(str(images_dir), store)
+
+    # The static manifest is built from STATIC_DIR by the first request
+    assets = tmp_dir / "static" / "assets"
+    assets.mkdir(parents=True)
+    (assets / "app.js").write_text("console.log('colouring');\n" * 2000)
+    (tmp_dir / "static" / "index.html").write_text("<html></html>")
+    app_module.STATIC_DIR = tmp_dir / "static"
+
+
+async def _requests_per_second(
+    client: httpx.AsyncClient, path: str, requests: int, concurrency: int
+) -> float:
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in remaining:
+            response = await client.get(path)
+            assert response.status_code == 200, response.status_code
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+
+async def main(tmp_dir: Path, requests: int, concurrency: int) -> None:
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'logging':>8} " + " ".join(f"{name + ' rps':>12}" for name in ENDPOINTS))
+        for mode in ("legacy", "text", "json"):
+            log_file = tmp_dir / f"{mode}.log"
+            with open(tmp_dir / f"{mode}.console", "w") as console:
+                if mode == "legacy":
+                    _legacy_logging(console, log_file)
+                else:
+                    configure_logging(console=console, log_file=log_file, log_format=mode)
+                # Warm up routing and the file system cache
+                for path in ENDPOINTS.values():
+                    await client.get(path)
+                rates = [
+                    await _requests_per_second(client, path, requests, concurrency)
+                    for path in ENDPOINTS.values()
+                ]
+                await logger.complete()
+                logger.remove()
+            print(f"{mode:>8} " + " ".join(f"{rate:>12.0f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--images", type=int, default=1000)
+    args = parser.parse_args()
+
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(Path(tmp), args.images)
+        asyncio.run(main(Path(tmp), args.requests, args.concurrency))
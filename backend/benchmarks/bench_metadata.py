@@ -0,0 +1,84 @@
+"""
+Benchmark: cost of a single metadata insert as the gallery grows.
+
+For each gallery size the store is pre-filled with synthetic entries, then a
+handful of single-image inserts are timed. The JSON backend rewrites the
+whole file on each insert, so its cost grows with the gallery; the SQLite
+backend touches one row, so its cost should stay flat.
+
+Usage:
+    python benchmarks/bench_metadata.py --sizes 1000 10000 100000
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from loguru import logger  # noqa: E402
+
+from src.metadata_store import JsonMetadataStore, SqliteMetadataStore  # noqa: E402
+
+THEMES = ["none", "cartoon", "cute", "doodle", "comic"]
+
+
+def synthetic_entries(count: int, offset: int = 0) -> dict:
+    return {
+        f"image {i}_{1700000000 + i}.png": {
+            "prompt": f"image {i}",
+            "language": "en" if i % 2 else "fi",
+            "complexity": "medium",
+            "theme": THEMES[i % len(THEMES)],
+            "created_at": f"2024-01-01T00:00:{i % 60:02d}.{i:06d}",
+        }
+        for i in range(offset, offset + count)
+    }
+
+
+def time_inserts(store, size: int, inserts: int) -> float:
+    """Return the median insert time in milliseconds"""
+    timings = []
+    for name, entry in synthetic_entries(inserts, offset=size).items():
+        start = time.perf_counter()
+        store.upsert(name, entry)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main(sizes: list, inserts: int, skip_json_above: int) -> None:
+    print(f"{'images':>8} {'json ms/insert':>16} {'sqlite ms/insert':>18}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            entries = synthetic_entries(size)
+
+            json_ms = float("nan")
+            if size <= skip_json_above:
+                json_store = JsonMetadataStore(str(Path(tmp) / "meta.json"))
+                json_store.upsert_many(entries)
+                json_ms = time_inserts(json_store, size, inserts)
+
+            sqlite_store = SqliteMetadataStore(str(Path(tmp) / "meta.db"))
+            sqlite_store.upsert_many(entries)
+            sqlite_ms = time_inserts(sqlite_store, size, inserts)
+
+        print(f"{size:>8} {json_ms:>16.3f} {sqlite_ms:>18.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--inserts", type=int, default=20)
+    parser.add_argument(
+        "--skip-json-above",
+        type=int,
+        default=100000,
+        help="Skip the JSON backend for larger galleries",
+    )
+    args = parser.parse_args()
+
+    logger.remove()
+    main(args.sizes, args.inserts, args.skip_json_above)
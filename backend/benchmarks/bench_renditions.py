@@ -0,0 +1,84 @@
+"""
+Benchmark: bytes transferred for one gallery page, full images vs. thumbnails.
+
+Synthesizes line-art pages like the ones the generator stores (1024px PNG),
+renders their thumbnails, and totals the bytes a page of tiles would
+download in each case.
+
+Usage:
+    python benchmarks/bench_renditions.py --tiles 50
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from loguru import logger  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from src import renditions  # noqa: E402
+
+
+def synthetic_page(seed: int, size: int = 1024) -> Image.Image:
+    """Black outlines on white, roughly like a generated colouring page"""
+    rng = random.Random(seed)
+    img = Image.new("RGB", (size, size), "white")
+    draw = ImageDraw.Draw(img)
+    for _ in range(120):
+        x, y = rng.randrange(size), rng.randrange(size)
+        r = rng.randrange(10, size // 5)
+        if rng.random() < 0.5:
+            draw.ellipse((x - r, y - r, x + r, y + r), outline="black", width=rng.randrange(2, 8))
+        else:
+            draw.line(
+                (x, y, rng.randrange(size), rng.randrange(size)),
+                fill="black",
+                width=rng.randrange(2, 8),
+            )
+    return img
+
+
+def main(tiles: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        renditions.IMAGES_DIR = Path(tmp) / "images"
+        renditions.RENDITIONS_DIR = Path(tmp) / "renditions"
+        renditions.IMAGES_DIR.mkdir()
+
+        sources = []
+        for i in range(tiles):
+            path = renditions.IMAGES_DIR / f"page_{i}.png"
+            synthetic_page(i).save(path, "PNG")
+            sources.append(path)
+
+        start = time.perf_counter()
+        for path in sources:
+            renditions.create_renditions(path)
+        elapsed = time.perf_counter() - start
+
+        full = sum(path.stat().st_size for path in sources)
+        print(f"tiles: {tiles}, rendition time: {elapsed / tiles * 1000:.1f} ms/image")
+        print(f"{'variant':>10} {'total KB':>10} {'KB/tile':>9} {'saving':>8}")
+        print(f"{'full':>10} {full / 1024:>10.0f} {full / tiles / 1024:>9.1f} {'':>8}")
+        for size in renditions.RENDITION_SIZES:
+            total = sum(
+                renditions.rendition_path(path.name, size).stat().st_size
+                for path in sources
+            )
+            print(
+                f"{size:>8}px {total / 1024:>10.0f} {total / tiles / 1024:>9.1f} "
+                f"{(1 - total / full) * 100:>7.1f}%"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tiles", type=int, default=50)
+    args = parser.parse_args()
+
+    logger.remove()
+    main(args.tiles)
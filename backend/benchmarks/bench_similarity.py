@@ -0,0 +1,136 @@
+"""
+Benchmark: perceptual hashing throughput and similar-page lookup latency.
+
+Hashing: synthesizes --pages 1024px line-art PNGs and reports pages per
+second hashed one at a time, in vectorized batches, and in batches spread
+over --workers processes.
+
+Lookup: fills a HashIndex and a GalleryCache with --sizes synthetic hashes,
+in groups of near-duplicates, and reports the index build time, the
+p50/p99 latency of a similar-page search at several distances, and the
+time to serve a 50-image gallery page with near-duplicates collapsed.
+
+Usage:
+    python benchmarks/bench_similarity.py --pages 200 --workers 1 4 --sizes 10000 100000
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from loguru import logger  # noqa: E402
+
+from benchmarks.bench_metadata import synthetic_entries  # noqa: E402
+from benchmarks.bench_renditions import synthetic_page  # noqa: E402
+from src.gallery_cache import GalleryCache  # noqa: E402
+from src.similarity import (  # noqa: E402
+    DUPLICATE_DISTANCE,
+    HASH_FIELD,
+    HashIndex,
+    format_hash,
+    hash_images,
+    image_hash,
+)
+
+
+def bench_hashing(pages: int, worker_counts: list) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(pages):
+            path = Path(tmp) / f"page_{i}.png"
+            synthetic_page(i).save(path, "PNG")
+            paths.append(path)
+
+        print(f"{'hashing':>22} {'pages/s':>9}")
+        started = time.perf_counter()
+        single = [image_hash(path) for path in paths]
+        print(f"{'one at a time':>22} {pages / (time.perf_counter() - started):>9.1f}")
+        for workers in worker_counts:
+            started = time.perf_counter()
+            batched = hash_images(paths, workers)
+            rate = pages / (time.perf_counter() - started)
+            label = "batched" if workers == 1 else f"batched, {workers} procs"
+            check = "" if batched == single else "  MISMATCH"
+            print(f"{label:>22} {rate:>9.1f}{check}")
+
+
+def synthetic_hashes(count: int, group: int = 4, seed: int = 0) -> list:
+    """Random hashes in groups of `group` pages a few bits apart"""
+    rng = random.Random(seed)
+    hashes = []
+    while len(hashes) < count:
+        base = rng.getrandbits(64)
+        hashes.append(base)
+        for _ in range(group - 1):
+            flips = rng.sample(range(64), rng.randrange(1, 4))
+            hashes.append(base ^ sum(1 << bit for bit in flips))
+    return hashes[:count]
+
+
+def bench_lookup(sizes: list, distances: list, queries: int) -> None:
+    print(
+        f"\n{'images':>8} {'build s':>8} {'distance':>8} {'p50 us':>8} "
+        f"{'p99 us':>8} {'matches':>8}"
+    )
+    for size in sizes:
+        names = list(synthetic_entries(size))
+        hashes = synthetic_hashes(size)
+        started = time.perf_counter()
+        index = HashIndex()
+        index.add_many(dict(zip(names, hashes)))
+        build_s = time.perf_counter() - started
+
+        sample = random.Random(1).sample(hashes, min(queries, size))
+        for distance in distances:
+            timings = []
+            found = 0
+            for value in sample:
+                started = time.perf_counter()
+                found += len(index.within(value, distance))
+                timings.append((time.perf_counter() - started) * 1e6)
+            timings.sort()
+            print(
+                f"{size:>8} {build_s:>8.2f} {distance:>8} "
+                f"{statistics.median(timings):>8.1f} "
+                f"{timings[int(len(timings) * 0.99)]:>8.1f} {found / len(sample):>8.1f}"
+            )
+
+        entries = synthetic_entries(size)
+        for name, value in zip(names, hashes):
+            entries[name][HASH_FIELD] = format_hash(value)
+        cache = GalleryCache()
+        for name, entry in entries.items():
+            cache.add(name, entry)
+        for collapse in (0, DUPLICATE_DISTANCE):
+            timings = []
+            for _ in range(20):
+                started = time.perf_counter()
+                cache.query(limit=50, collapse=collapse)
+                timings.append((time.perf_counter() - started) * 1000)
+            label = "collapsed" if collapse else "plain"
+            print(f"{'':>8} {'':>8} {label + ' page':>17} {statistics.median(timings):>8.2f} ms")
+
+
+def main(pages: int, worker_counts: list, sizes: list, distances: list, queries: int) -> None:
+    if pages:
+        bench_hashing(pages, worker_counts)
+    bench_lookup(sizes, distances, queries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--distances", type=int, nargs="+", default=[3, 8, 12])
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    logger.remove()
+    main(args.pages, args.workers, args.sizes, args.distances, args.queries)
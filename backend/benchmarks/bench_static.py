@@ -0,0 +1,155 @@
+"""
+Benchmark: static asset and SPA fallback serving over real HTTP.
+
+Runs uvicorn on localhost and drives it with an async httpx load generator,
+comparing the previous handler (an is_file() probe and a plain FileResponse
+per request) with the in-memory static manifest. A synthetic Vite build is
+generated in a temporary directory. Reports requests per second and bytes on
+the wire per response for a hashed bundle, a client-side route and a
+conditional revalidation.
+
+Usage:
+    python benchmarks/bench_static.py --requests 3000 --concurrency 32
+"""
+import argparse
+import asyncio
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, Header  # noqa: E402
+from fastapi.responses import FileResponse  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from src.static_assets import StaticManifest  # noqa: E402
+
+BUNDLE = "assets/index-B4x9kQ2a.js"
+
+
+def _build_frontend(static_dir: Path, bundle_kib: int) -> None:
+    """A Vite-like build: index.html plus a hashed JS bundle"""
+    (static_dir / "assets").mkdir(parents=True)
+    line = "export const colour=(a,b)=>a.map(x=>x*b).filter(Boolean);\n"
+    (static_dir / BUNDLE).write_text(line * (bundle_kib * 1024 // len(line)))
+    (static_dir / "index.html").write_text(
+        f'<!doctype html><html><head><script src="/{BUNDLE}"></script></head>'
+        f'<body><div id="root"></div></body></html>\n' + "<!-- -->\n" * 200
+    )
+
+
+def legacy_app(static_dir: Path) -> FastAPI:
+    """The catch-all the app used before the manifest"""
+    app = FastAPI()
+
+    @app.get("/{full_path:path}")
+    async def serve_spa(full_path: str):
+        static_path = static_dir / full_path
+        if static_path.is_file():
+            return FileResponse(str(static_path))
+        return FileResponse(str(static_dir / "index.html"))
+
+    return app
+
+
+def manifest_app(static_dir: Path) -> FastAPI:
+    """The same catch-all answered from a StaticManifest, as app.serve_spa does"""
+    app = FastAPI()
+    manifest = StaticManifest()
+    manifest.build(str(static_dir))
+
+    @app.get("/{full_path:path}")
+    async def serve_spa(
+        full_path: str,
+        accept_encoding: Optional[str] = Header(None),
+        if_none_match: Optional[str] = Header(None),
+        range: Optional[str] = Header(None),
+    ):
+        asset = manifest.get(full_path) or manifest.index
+        return manifest.response(
+            asset, accept_encoding, if_none_match, has_range=range is not None
+        )
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(app: FastAPI) -> tuple:
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def _load(base_url: str, path: str, headers: dict, requests: int, concurrency: int):
+    remaining = iter(range(requests))
+    wire_bytes = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal wire_bytes
+        for _ in remaining:
+            async with client.stream("GET", path, headers=headers) as response:
+                assert response.status_code in (200, 304), response.status_code
+                async for chunk in response.aiter_raw():
+                    wire_bytes += len(chunk)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        await client.get(path, headers=headers)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return requests / elapsed, wire_bytes / requests
+
+
+def main(requests: int, concurrency: int, bundle_kib: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        static_dir = Path(tmp)
+        _build_frontend(static_dir, bundle_kib)
+        etag = StaticManifest._load(BUNDLE, static_dir / BUNDLE).variants["gzip"].etag
+        scenarios = {
+            "bundle": (f"/{BUNDLE}", {"Accept-Encoding": "gzip, deflate"}),
+            "spa route": ("/gallery/42", {"Accept-Encoding": "gzip, deflate"}),
+            "revalidate": (f"/{BUNDLE}", {"Accept-Encoding": "gzip", "If-None-Match": etag}),
+        }
+        print(f"{'server':>9} {'scenario':>11} {'req/s':>8} {'bytes/resp':>11}")
+        for label, factory in (("legacy", legacy_app), ("manifest", manifest_app)):
+            server, thread, base_url = _serve(factory(static_dir))
+            try:
+                for scenario, (path, headers) in scenarios.items():
+                    rate, size = asyncio.run(
+                        _load(base_url, path, headers, requests, concurrency)
+                    )
+                    print(f"{label:>9} {scenario:>11} {rate:>8.0f} {size:>11.0f}")
+            finally:
+                server.should_exit = True
+                thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--bundle-kib", type=int, default=200)
+    args = parser.parse_args()
+
+    logger.remove()
+    main(args.requests, args.concurrency, args.bundle_kib)
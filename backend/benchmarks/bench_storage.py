@@ -0,0 +1,114 @@
+"""
+Benchmark: CPU time, peak RSS and file size per image for each storage mode.
+
+A synthetic 1024px line-art page is encoded the way the model returns it
+(WebP, quality 100) and served from a local HTTP server. Each mode then
+downloads and stores it in a fresh subprocess, so peak RSS is not shared
+between modes. "legacy" is the old path: buffer the whole response, decode
+with PIL and re-encode as PNG.
+
+Usage:
+    python benchmarks/bench_storage.py --repeat 5
+"""
+import argparse
+import http.server
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from loguru import logger  # noqa: E402
+
+MODES = ("legacy", "original", "png", "lossless", "lineart")
+
+
+def run_child(mode: str, url: str, out_dir: Path, repeat: int) -> dict:
+    """Download and store the image `repeat` times and report the cost"""
+    import requests
+    from PIL import Image
+
+    from src.generate_image import download_image
+    from src.image_storage import output_extension, partial_path, store_downloaded_image
+
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    for i in range(repeat):
+        if mode == "legacy":
+            output_path = out_dir / f"page_{i}.png"
+            response = requests.get(url)
+            img = Image.open(BytesIO(response.content))
+            img.save(output_path, "PNG", quality=95)
+        else:
+            output_path = out_dir / f"page_{i}{output_extension(url, mode)}"
+            download_image(url, partial_path(output_path))
+            store_downloaded_image(partial_path(output_path), output_path, mode)
+
+    return {
+        "mode": mode,
+        "cpu_ms": (time.process_time() - start_cpu) / repeat * 1000,
+        "wall_ms": (time.perf_counter() - start_wall) / repeat * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "file_kb": output_path.stat().st_size / 1024,
+    }
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def make_model_output(path: Path) -> None:
+    from benchmarks.bench_renditions import synthetic_page
+
+    synthetic_page(0).save(path, "WEBP", quality=100)
+
+
+def main(repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        serve_dir = Path(tmp) / "serve"
+        serve_dir.mkdir()
+        make_model_output(serve_dir / "output.webp")
+
+        handler = partial(QuietHandler, directory=str(serve_dir))
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/output.webp"
+
+        print(f"{'mode':>10} {'cpu ms':>8} {'wall ms':>8} {'peak RSS MB':>12} {'file KB':>8}")
+        for mode in MODES:
+            out_dir = Path(tmp) / mode
+            out_dir.mkdir()
+            result = subprocess.run(
+                [sys.executable, __file__, "--child", mode, url, str(out_dir), str(repeat)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            r = json.loads(result.stdout.strip().splitlines()[-1])
+            print(
+                f"{r['mode']:>10} {r['cpu_ms']:>8.1f} {r['wall_ms']:>8.1f} "
+                f"{r['peak_rss_mb']:>12.1f} {r['file_kb']:>8.1f}"
+            )
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    logger.remove()
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _, _, mode, url, out_dir, repeat = sys.argv
+        print(json.dumps(run_child(mode, url, Path(out_dir), int(repeat))))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.repeat)
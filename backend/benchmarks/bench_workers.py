@@ -0,0 +1,168 @@
+"""
+Benchmark: generation throughput as uvicorn worker processes are added.
+
+Copies the backend into a temporary directory, so its images, metadata and
+job databases start empty, and runs `uvicorn app:app --workers N` for each
+worker count with the offline `local` provider. An async httpx load
+generator posts uncached /api/generate requests with distinct prompts and
+reports pages per second and the speedup over one worker.
+
+After each run the created files are checked against the responses: every
+page must have its own file and its own metadata row, so name collisions or
+lost metadata updates between workers fail the benchmark.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1 2 4 --requests 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from src.blob_storage import scan_image_files  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _copy_backend(target: Path) -> None:
+    shutil.copy(BACKEND_DIR / "app.py", target / "app.py")
+    shutil.copytree(
+        BACKEND_DIR / "src", target / "src", ignore=shutil.ignore_patterns("__pycache__")
+    )
+
+
+def _start(app_dir: Path, workers: int, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=app_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def _wait_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def _load(base_url: str, requests: int, concurrency: int, run: int) -> tuple:
+    remaining = iter(range(requests))
+    created = []
+    failures = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal failures
+        for i in remaining:
+            response = await client.post(
+                "/api/generate",
+                data={"prompt": f"bench page {run}-{i}", "force_fresh": "true"},
+            )
+            if response.status_code == 200:
+                created.append(Path(response.json()["image_path"]).name)
+            else:
+                failures += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return created, failures, elapsed
+
+
+def _check(app_dir: Path, created: list) -> list:
+    """Problems with the files and metadata the run left behind"""
+    problems = []
+    if len(set(created)) != len(created):
+        problems.append(f"{len(created) - len(set(created))} duplicate names")
+    on_disk = scan_image_files(app_dir / "images")
+    if missing := set(created) - on_disk:
+        problems.append(f"{len(missing)} files missing")
+    with sqlite3.connect(app_dir / "image_metadata.db") as conn:
+        rows = {row[0] for row in conn.execute("SELECT filename FROM images")}
+    if missing := set(created) - rows:
+        problems.append(f"{len(missing)} metadata rows missing")
+    return problems
+
+
+def main(worker_counts: list, requests: int, concurrency: int, latency: float, size: int) -> bool:
+    env = dict(
+        os.environ,
+        IMAGE_PROVIDER="local",
+        LOCAL_PROVIDER_LATENCY=str(latency),
+        LOCAL_PROVIDER_SIZE=str(size),
+        LOG_LEVEL="WARNING",
+        RESULT_CACHE_POLICY="off",
+    )
+    print(f"{'workers':>7} {'pages':>6} {'failed':>6} {'pages/s':>8} {'speedup':>8}  check")
+    baseline = None
+    consistent = True
+    for run, workers in enumerate(worker_counts):
+        with tempfile.TemporaryDirectory() as tmp:
+            app_dir = Path(tmp)
+            _copy_backend(app_dir)
+            port = _free_port()
+            server = _start(app_dir, workers, port, env)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                asyncio.run(_wait_ready(base_url))
+                created, failures, elapsed = asyncio.run(
+                    _load(base_url, requests, concurrency, run)
+                )
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            problems = _check(app_dir, created)
+            consistent &= not problems and not failures
+
+        rate = len(created) / elapsed
+        baseline = baseline or rate
+        print(
+            f"{workers:>7} {len(created):>6} {failures:>6} {rate:>8.1f} "
+            f"{rate / baseline:>7.2f}x  {', '.join(problems) or 'ok'}"
+        )
+    return consistent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0, help="Simulated model seconds")
+    parser.add_argument("--image-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    logger.remove()
+    if not main(args.workers, args.requests, args.concurrency, args.latency, args.image_size):
+        sys.exit(1)
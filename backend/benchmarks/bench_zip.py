@@ -0,0 +1,106 @@
+"""
+Benchmark: streaming ZIP export of a large gallery with bounded memory.
+
+Fills a temporary gallery with synthetic image files, streams the whole
+selection through select_images() and stream_zip() to a file, and reports
+throughput and the peak of Python allocations (tracemalloc) while the
+archive is written. The archive is then checked with zipfile.testzip().
+
+Exits with status 1 if an archive is corrupt or a streaming peak exceeds
+--max-mb, so it can gate a change to the export path. The largest archive
+has to be bigger than the budget, or buffering it whole would pass too.
+
+Usage:
+    python benchmarks/bench_zip.py --images 1000 5000 --image-kib 32 --max-mb 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from loguru import logger  # noqa: E402
+
+from benchmarks.bench_metadata import synthetic_entries  # noqa: E402
+from src.bulk import select_images, stream_zip  # noqa: E402
+from src.metadata_store import SqliteMetadataStore  # noqa: E402
+
+
+def _fill(images_dir: Path, count: int, image_kib: int) -> SqliteMetadataStore:
+    entries = synthetic_entries(count)
+    for name in entries:
+        (images_dir / name).write_bytes(os.urandom(image_kib * 1024))
+    store = SqliteMetadataStore(str(images_dir.parent / "meta.db"))
+    store.upsert_many(entries)
+    return store
+
+
+def main(sizes: list, image_kib: int, max_mb: float) -> list:
+    print(
+        f"{'images':>7} {'archive MB':>11} {'seconds':>8} {'MB/s':>7} "
+        f"{'selection MB':>13} {'stream peak MB':>15}"
+    )
+    failures = []
+    largest_mb = 0.0
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            images_dir = Path(tmp) / "images"
+            images_dir.mkdir()
+            store = _fill(images_dir, count, image_kib)
+            out = Path(tmp) / "export.zip"
+
+            tracemalloc.start()
+            selection = select_images(str(images_dir), store=store)
+            names = [image["filename"] for image in selection]
+            del selection
+            selection_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.reset_peak()
+
+            started = time.perf_counter()
+            with open(out, "wb") as f:
+                for chunk in stream_zip(str(images_dir), names):
+                    f.write(chunk)
+            elapsed = time.perf_counter() - started
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+
+            with zipfile.ZipFile(out) as archive:
+                if archive.testzip() is not None or len(archive.namelist()) != count:
+                    failures.append(f"{count} images: corrupt or incomplete archive")
+            size_mb = out.stat().st_size / 1e6
+            largest_mb = max(largest_mb, size_mb)
+            print(
+                f"{count:>7} {size_mb:>11.1f} {elapsed:>8.2f} {size_mb / elapsed:>7.0f} "
+                f"{selection_mb:>13.1f} {peak_mb:>15.1f}"
+            )
+            if peak_mb > max_mb:
+                failures.append(
+                    f"{count} images: streaming peak {peak_mb:.1f} MB is over {max_mb} MB"
+                )
+    if largest_mb <= max_mb:
+        failures.append(
+            f"largest archive ({largest_mb:.1f} MB) is within the {max_mb} MB budget, "
+            "so the check proves nothing; use more or larger images"
+        )
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--image-kib", type=int, default=32)
+    parser.add_argument("--max-mb", type=float, default=16)
+    args = parser.parse_args()
+
+    logger.remove()
+    failures = main(args.images, args.image_kib, args.max_mb)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,100 @@
+"""
+Load test: /health latency while generations are in flight.
+
+Generation uses the local provider, which sleeps for the configured model
+time and then draws a synthetic image, so the whole async generation path
+(provider, image worker pool, metadata write) runs offline.
+
+Usage:
+    python benchmarks/health_latency.py --generations 8 --model-seconds 2
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+from loguru import logger  # noqa: E402
+
+import app as app_module  # noqa: E402
+from src import generate_image, renditions  # noqa: E402
+from src.metadata_store import SqliteMetadataStore, set_metadata_store  # noqa: E402
+from src.providers import LocalProvider, set_provider  # noqa: E402
+
+
+def _install_fakes(tmp_dir: Path, model_seconds: float, failure_rate: float) -> None:
+    set_provider(LocalProvider(latency=model_seconds, failure_rate=failure_rate))
+
+    images_dir = tmp_dir / "images"
+    images_dir.mkdir()
+    for module in (app_module, generate_image, renditions):
+        module.IMAGES_DIR = images_dir
+    renditions.RENDITIONS_DIR = tmp_dir / "renditions"
+    set_metadata_store(SqliteMetadataStore(str(tmp_dir / "image_metadata.db")))
+
+
+async def _probe_health(client: httpx.AsyncClient, duration: float) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/health")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+def _summary(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return (
+        f"n={len(ordered)} p50={statistics.median(ordered):.2f}ms "
+        f"p95={p95:.2f}ms max={ordered[-1]:.2f}ms"
+    )
+
+
+async def main(generations: int, model_seconds: float) -> None:
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = await _probe_health(client, duration=1.0)
+        print(f"idle        {_summary(idle)}")
+
+        started = time.perf_counter()
+        jobs = [
+            client.post("/api/generate", data={"prompt": f"dinosaur {i}"}, timeout=None)
+            for i in range(generations)
+        ]
+        results = await asyncio.gather(
+            _probe_health(client, duration=model_seconds),
+            *jobs,
+        )
+        loaded, responses = results[0], results[1:]
+        elapsed = time.perf_counter() - started
+        print(f"loaded      {_summary(loaded)}")
+        ok = sum(1 for r in responses if r.status_code == 200)
+        for r in responses:
+            if r.status_code != 200:
+                print(f"failed: {r.status_code} {r.text}")
+        print(f"generations {ok}/{generations} ok in {elapsed:.2f}s")
+
+    await generate_image.close_async_resources()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--generations", type=int, default=8)
+    parser.add_argument("--model-seconds", type=float, default=2.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        _install_fakes(Path(tmp), args.model_seconds, args.failure_rate)
+        asyncio.run(main(args.generations, args.model_seconds))
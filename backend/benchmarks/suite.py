@@ -0,0 +1,411 @@
+"""
+Benchmark suite: micro-benchmarks and an HTTP load test with JSON output.
+
+Runs on an offline Linux box: images are generated by the local provider
+in place of Replicate. Every case runs in a fresh process, so its peak RSS
+is its own, and reports p50/p95/p99 latency and operations per second.
+
+  gallery_scan   get_image_filenames() over a synthetic gallery
+  metadata_load  load_metadata() of a JSON metadata file
+  metadata_save  save_metadata() of the same
+  image_store    decoding a downloaded page and storing it in each
+                 converting IMAGE_STORAGE_MODE
+  renditions     rendering the thumbnails of a page
+  http           uvicorn with the local provider, driven by an httpx load
+                 generator: /health, a gallery page, a thumbnail and
+                 uncached generations; peak RSS is the server's
+
+Results are printed as a table and, with --output, written as JSON with
+the version, git commit and machine they came from. --compare prints the
+change of every metric between two such files.
+
+Usage:
+    python benchmarks/suite.py --sizes 1000 10000 100000 --output after.json
+    python benchmarks/suite.py --only http --http-images 10000 --requests 500
+    python benchmarks/suite.py --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from benchmarks.bench_metadata import synthetic_entries  # noqa: E402
+from benchmarks.bench_workers import (  # noqa: E402
+    _copy_backend,
+    _free_port,
+    _start,
+    _wait_ready,
+)
+from src.version import __version__  # noqa: E402
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "ops_per_s", "peak_rss_mb")
+STORAGE_MODES = ("png", "lossless", "lineart")
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50, p95 and p99 of latencies in milliseconds"""
+    ordered = sorted(samples_ms)
+
+    def rank(p: float) -> float:
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {"p50_ms": rank(50), "p95_ms": rank(95), "p99_ms": rank(99)}
+
+
+def _summarise(samples_ms: List[float], elapsed: float) -> Dict[str, float]:
+    return {
+        **percentiles(samples_ms),
+        "ops_per_s": len(samples_ms) / elapsed,
+        "samples": len(samples_ms),
+    }
+
+
+def _timed(
+    func: Callable[[], object], repeat: int, setup: Optional[Callable[[], object]] = None
+) -> Dict[str, float]:
+    """Time repeat calls of func, running setup untimed before each"""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return _summarise(samples, sum(samples) / 1000)
+
+
+def _fill_gallery(folder: Path, size: int) -> Dict[str, dict]:
+    """Empty image files plus their metadata entries"""
+    folder.mkdir(parents=True, exist_ok=True)
+    entries = synthetic_entries(size)
+    for name in entries:
+        (folder / name).touch()
+    return entries
+
+
+def case_gallery_scan(tmp: Path, size: int, repeat: int) -> Dict[str, float]:
+    from src.gallery import get_image_filenames
+    from src.metadata_store import SqliteMetadataStore
+
+    entries = _fill_gallery(tmp / "images", size)
+    store = SqliteMetadataStore(str(tmp / "meta.db"))
+    store.upsert_many(entries)
+    return _timed(lambda: get_image_filenames(str(tmp / "images"), store), repeat)
+
+
+def case_metadata_load(tmp: Path, size: int, repeat: int) -> Dict[str, float]:
+    from src.helpers import load_metadata, save_metadata
+
+    path = str(tmp / "image_metadata.json")
+    save_metadata(synthetic_entries(size), path)
+    return _timed(lambda: load_metadata(path), repeat)
+
+
+def case_metadata_save(tmp: Path, size: int, repeat: int) -> Dict[str, float]:
+    from src.helpers import save_metadata
+
+    path = str(tmp / "image_metadata.json")
+    entries = synthetic_entries(size)
+    return _timed(lambda: save_metadata(entries, path), repeat)
+
+
+def case_image_store(tmp: Path, mode: str, repeat: int, image_size: int) -> Dict[str, float]:
+    from src.image_storage import store_downloaded_image
+    from src.providers import LocalProvider
+
+    source = tmp / "download.webp"
+    LocalProvider(size=image_size).draw("suite").save(source, "WEBP")
+    download, output = tmp / ".page.webp.part", tmp / "page.png"
+    return _timed(
+        lambda: store_downloaded_image(download, output, mode=mode),
+        repeat,
+        setup=lambda: shutil.copyfile(source, download),
+    )
+
+
+def case_renditions(tmp: Path, repeat: int, image_size: int) -> Dict[str, float]:
+    from src import renditions
+    from src.providers import LocalProvider
+
+    renditions.RENDITIONS_DIR = tmp / "renditions"
+    source = tmp / "page.webp"
+    LocalProvider(size=image_size).draw("suite").save(source, "WEBP")
+    return _timed(lambda: renditions.create_renditions(source), repeat)
+
+
+def _server_peak_rss_mb(pid: int) -> float:
+    """High-water mark of a process's resident set, from /proc"""
+    status = Path(f"/proc/{pid}/status").read_text()
+    return int(re.search(r"VmHWM:\s+(\d+) kB", status).group(1)) / 1024
+
+
+async def _drive(
+    client: httpx.AsyncClient, make_request: Callable, requests: int, concurrency: int
+) -> Dict[str, float]:
+    remaining = iter(range(requests))
+    samples: List[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            samples.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {**_summarise(samples, time.perf_counter() - started), "errors": errors}
+
+
+async def _gallery_loaded(client: httpx.AsyncClient, size: int, timeout: float = 300) -> None:
+    """Wait for the background warm-up to load the gallery cache"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        metrics = (await client.get("/metrics")).text
+        match = re.search(r"^colouring_gallery_images (\d+)", metrics, re.M)
+        if match and int(match.group(1)) >= size:
+            return
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Gallery cache was not loaded")
+
+
+async def _load_test(
+    base_url: str, size: int, requests: int, concurrency: int
+) -> Dict[str, Dict[str, float]]:
+    generations = max(concurrency, requests // 10)
+    pages: List[str] = []
+
+    async def health(client, i):
+        return await client.get("/health")
+
+    async def gallery(client, i):
+        return await client.get("/api/images", params={"limit": 50})
+
+    async def generate(client, i):
+        response = await client.post(
+            "/api/generate", data={"prompt": f"suite page {i}", "force_fresh": "true"}
+        )
+        if response.status_code == 200:
+            pages.append(response.json()["image_path"])
+        return response
+
+    async def thumbnail(client, i):
+        return await client.get(f"/api/images/{pages[i % len(pages)]}", params={"size": 256})
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await _gallery_loaded(client, size)
+        results = {"generate": await _drive(client, generate, generations, concurrency)}
+        if not pages:
+            raise RuntimeError("No page was generated")
+        for name, make_request in (
+            ("health", health),
+            ("gallery", gallery),
+            ("thumbnail", thumbnail),
+        ):
+            # Warm up caches and connections before measuring
+            await _drive(client, make_request, concurrency, concurrency)
+            results[name] = await _drive(client, make_request, requests, concurrency)
+    return results
+
+
+def case_http(
+    tmp: Path, size: int, requests: int, concurrency: int, latency: float, image_size: int
+) -> Dict[str, Dict[str, float]]:
+    from src.metadata_store import SqliteMetadataStore
+
+    _copy_backend(tmp)
+    entries = _fill_gallery(tmp / "images", size)
+    SqliteMetadataStore(str(tmp / "image_metadata.db")).upsert_many(entries)
+    env = dict(
+        os.environ,
+        IMAGE_PROVIDER="local",
+        LOCAL_PROVIDER_LATENCY=str(latency),
+        LOCAL_PROVIDER_SIZE=str(image_size),
+        LOG_LEVEL="WARNING",
+        RESULT_CACHE_POLICY="off",
+    )
+    port = _free_port()
+    server = _start(tmp, 1, port, env)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(_wait_ready(base_url))
+        results = asyncio.run(_load_test(base_url, size, requests, concurrency))
+        peak_rss_mb = _server_peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    for result in results.values():
+        result["peak_rss_mb"] = peak_rss_mb
+    return results
+
+
+CASES = {
+    "gallery_scan": case_gallery_scan,
+    "metadata_load": case_metadata_load,
+    "metadata_save": case_metadata_save,
+    "image_store": case_image_store,
+    "renditions": case_renditions,
+    "http": case_http,
+}
+
+
+def _run_case(name: str, params: dict, queue) -> None:
+    """Run one case in this fresh process and report its results"""
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        result = CASES[name](Path(tmp), **params)
+    if "p50_ms" in result:
+        # ru_maxrss is in KiB on Linux
+        result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        result = {"": result}
+    queue.put(result)
+
+
+def _in_process(name: str, params: dict) -> Dict[str, Dict[str, float]]:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_case, args=(name, params, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _plan(args: argparse.Namespace) -> List[tuple]:
+    """(case, parameters) for every selected run, in order"""
+    repeat = args.repeat
+    runs = []
+    for size in args.sizes:
+        runs.append(("gallery_scan", {"size": size, "repeat": repeat}))
+        runs.append(("metadata_load", {"size": size, "repeat": repeat}))
+        runs.append(("metadata_save", {"size": size, "repeat": repeat}))
+    for mode in STORAGE_MODES:
+        runs.append(
+            ("image_store", {"mode": mode, "repeat": repeat, "image_size": args.image_size})
+        )
+    runs.append(("renditions", {"repeat": repeat, "image_size": args.image_size}))
+    runs.append(
+        (
+            "http",
+            {
+                "size": args.http_images,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "latency": args.latency,
+                "image_size": args.image_size,
+            },
+        )
+    )
+    return [(name, params) for name, params in runs if not args.only or name in args.only]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _label(result: dict) -> str:
+    """Identity of a result row, used to match rows between two runs"""
+    params = ", ".join(
+        f"{key}={result['params'][key]}"
+        for key in ("size", "mode")
+        if key in result["params"]
+    )
+    scenario = result.get("scenario") or ""
+    return " ".join(part for part in (result["benchmark"], scenario, params) if part)
+
+
+def run(args: argparse.Namespace) -> dict:
+    print(f"{'benchmark':<36} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'RSS MB':>7}")
+    results = []
+    for name, params in _plan(args):
+        for scenario, metrics in _in_process(name, params).items():
+            row = {"benchmark": name, "scenario": scenario, "params": params, **metrics}
+            results.append(row)
+            print(
+                f"{_label(row):<36} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+                f"{row['p99_ms']:>9.2f} {row['ops_per_s']:>9.1f} {row['peak_rss_mb']:>7.0f}"
+            )
+    return {
+        "version": __version__,
+        "commit": _git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+
+def compare(before_file: str, after_file: str) -> None:
+    """Print the relative change of every metric between two result files"""
+    before, after = (json.loads(Path(f).read_text()) for f in (before_file, after_file))
+    old = {_label(row): row for row in before["results"]}
+    print(
+        f"{before['version']} ({before['commit'] or '?'}) -> "
+        f"{after['version']} ({after['commit'] or '?'})"
+    )
+    print(f"{'benchmark':<36} " + " ".join(f"{metric:>13}" for metric in METRICS))
+    for row in after["results"]:
+        label = _label(row)
+        if label not in old:
+            print(f"{label:<36} (new)")
+            continue
+        changes = []
+        for metric in METRICS:
+            was, now = old[label].get(metric), row.get(metric)
+            changes.append(f"{(now - was) / was:>+13.1%}" if was and now is not None else f"{'-':>13}")
+        print(f"{label:<36} " + " ".join(changes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--http-images", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0, help="Simulated model seconds")
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES))
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    logger.remove()
+    if args.compare:
+        compare(*args.compare)
+    else:
+        report = run(args)
+        if args.output:
+            Path(args.output).write_text(json.dumps(report, indent=2))
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from loguru import logger
+from .generate_image import create_colouring_page_async, record_metadata_batch
+
+# Pages of one batch generated at once (the global
+# MAX_CONCURRENT_GENERATIONS limit still applies on top)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Generations started per second across all batches, 0 disables the limit
+BATCH_RATE_LIMIT = float(os.getenv("BATCH_RATE_LIMIT", "0"))
+BATCH_RATE_BURST = int(os.getenv("BATCH_RATE_BURST", "1"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "30"))
+# Seconds pages already at the provider may take to finish after the
+# client disconnects, so the images that were paid for are kept
+BATCH_DRAIN_TIMEOUT = float(os.getenv("BATCH_DRAIN_TIMEOUT", "300"))
+
+_rate_limiter: Optional["RateLimiter"] = None
+
+
+class RateLimiter:
+    """Token bucket that spaces out the start of generations"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a generation may start"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide batch rate limiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(BATCH_RATE_LIMIT, BATCH_RATE_BURST)
+    return _rate_limiter
+
+
+def batch_items(
+    prompts: Optional[List[str]] = None,
+    prompt: Optional[str] = None,
+    variants: int = 1,
+    language: str = "en",
+    complexity: str = "medium",
+    theme: str = "none",
+    force_fresh: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Expand a batch request into one set of generation parameters per page.
+
+    Either `prompts` lists every page, or `prompt` is repeated `variants`
+    times. Variants always generate fresh images so they differ.
+
+    Raises:
+        ValueError: If the request is empty, mixes both forms or is too large
+    """
+    prompts = [p.strip() for p in prompts or [] if p and p.strip()]
+    if prompts and prompt:
+        raise ValueError("Send either prompts or prompt with variants, not both")
+    if prompt:
+        if variants < 1:
+            raise ValueError("variants must be at least 1")
+        prompts = [prompt.strip()] * variants
+        force_fresh = force_fresh or variants > 1
+    if not prompts:
+        raise ValueError("No prompts provided")
+    if len(prompts) > MAX_BATCH_SIZE:
+        raise ValueError(f"A batch can have at most {MAX_BATCH_SIZE} pages")
+    return [
+        {
+            "prompt": p,
+            "language": language,
+            "complexity": complexity,
+            "theme": theme,
+            "force_fresh": force_fresh,
+        }
+        for p in prompts
+    ]
+
+
+async def generate_batch(
+    items: List[Dict[str, Any]],
+    concurrency: Optional[int] = None,
+    on_commit: Optional[Callable[[Dict[str, Dict[str, Any]]], None]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Generate several pages in parallel, yielding each result as it finishes.
+
+    Metadata of the new images is collected and written in a single
+    transaction once every page has finished (or the caller goes away),
+    followed by a summary.
+
+    Args:
+        items: Generation parameters per page, from batch_items
+        concurrency: Pages generated at once (default: BATCH_CONCURRENCY)
+        on_commit: Called in a worker thread with the committed entries,
+            e.g. to update the gallery cache (default: None)
+
+    Yields:
+        One result per page with its index, prompt, status and image_path,
+        then a summary with "done" set to True
+    """
+    concurrency = concurrency or BATCH_CONCURRENCY
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    limiter = get_rate_limiter()
+    entries: Dict[str, Dict[str, Any]] = {}
+    committed = False
+    # Pages past the semaphore and rate limiter, calling the provider
+    calling: set = set()
+
+    async def run(index: int, params: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            await limiter.acquire()
+            calling.add(index)
+            try:
+                filename = await create_colouring_page_async(
+                    **params, metadata_sink=entries
+                )
+            except Exception as e:
+                logger.exception(f"❌ Batch page {index} failed: {e}")
+                filename = None
+        return {
+            "index": index,
+            "prompt": params["prompt"],
+            "status": "done" if filename else "failed",
+            "image_path": filename,
+            "cached": bool(filename) and filename not in entries,
+        }
+
+    def commit() -> None:
+        if entries:
+            record_metadata_batch(entries)
+            if on_commit is not None:
+                on_commit(entries)
+
+    async def finish_abandoned() -> None:
+        """Let pages already at the provider finish, then keep them"""
+        waiting, started_pages = [], []
+        for index, task in enumerate(tasks):
+            if not task.done():
+                (started_pages if index in calling else waiting).append(task)
+        for task in waiting:
+            task.cancel()
+        if started_pages:
+            logger.info(
+                f"📦 Client left; finishing {len(started_pages)} pages already in progress"
+            )
+            _, unfinished = await asyncio.wait(started_pages, timeout=BATCH_DRAIN_TIMEOUT)
+            for task in unfinished:
+                task.cancel()
+        await asyncio.to_thread(commit)
+
+    logger.info(f"📦 Starting batch of {len(items)} pages (concurrency {concurrency})")
+    tasks = [asyncio.create_task(run(i, params)) for i, params in enumerate(items)]
+    succeeded = 0
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            succeeded += result["status"] == "done"
+            yield result
+        await asyncio.to_thread(commit)
+        committed = True
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"📦 Batch finished: {succeeded}/{len(items)} pages in {elapsed:.2f}s"
+        )
+        yield {
+            "done": True,
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "seconds": round(elapsed, 3),
+        }
+    finally:
+        if not committed:
+            # Shielded, so a second cancellation of the response cannot
+            # drop the metadata of pages that were generated
+            await asyncio.shield(finish_abandoned())
@@ -0,0 +1,269 @@
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+from loguru import logger
+from src.image_layout import image_path, is_image_name, iter_image_files, locate_image
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+IMAGES_DIR = PROJECT_ROOT / "images"
+
+# Where the bytes of generated pages live:
+#   local - IMAGES_DIR is the store (one host, any number of workers)
+#   s3    - an S3-compatible bucket (AWS, MinIO, ...) shared by every
+#           node; IMAGES_DIR becomes a read-through cache
+BLOB_BACKENDS = ("local", "s3")
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "local").lower()
+
+# S3 settings; credentials come from the usual AWS environment variables
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "images/")
+# Endpoint of an S3-compatible service such as MinIO, empty for AWS
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "")
+S3_REGION = os.getenv("S3_REGION", "")
+
+
+def scan_image_files(images_folder: Path) -> Set[str]:
+    """Names of the image files in a folder, in either storage layout"""
+    return {entry.name for entry in iter_image_files(images_folder)}
+
+
+class BlobStore:
+    """
+    Interface for where image files are kept, keyed by filename.
+
+    Every process works on files in its local IMAGES_DIR; a blob store makes
+    those files visible to the other processes and nodes.
+    """
+
+    name = "base"
+    # Whether the blobs live somewhere other than the local images folder
+    remote = False
+
+    def list(self) -> Set[str]:
+        """Names of every stored image"""
+        raise NotImplementedError
+
+    def put(self, name: str, path: Path) -> None:
+        """Publish a finished local file under a name"""
+        raise NotImplementedError
+
+    def fetch(self, name: str, destination: Path) -> bool:
+        """Copy a blob to a local file, returning False if it does not exist"""
+        raise NotImplementedError
+
+    def delete(self, name: str) -> bool:
+        """Remove a blob, returning whether it existed"""
+        raise NotImplementedError
+
+    def status(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Files in a directory, shared by every worker on the host.
+
+    Images are written straight into the images folder, which is the store
+    itself, so publishing them is a no-op.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Path = IMAGES_DIR):
+        self.root = Path(root)
+
+    def list(self) -> Set[str]:
+        return scan_image_files(self.root)
+
+    def put(self, name: str, path: Path) -> None:
+        pass
+
+    def fetch(self, name: str, destination: Path) -> bool:
+        source = locate_image(self.root, name)
+        if source is None:
+            return False
+        try:
+            shutil.copyfile(source, destination)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete(self, name: str) -> bool:
+        path = locate_image(self.root, name)
+        if path is None:
+            return False
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+
+class S3BlobStore(BlobStore):
+    """
+    Objects in an S3-compatible bucket, shared by every node.
+
+    boto3 is only imported when this backend is used.
+    """
+
+    name = "s3"
+    remote = True
+
+    def __init__(
+        self,
+        bucket: str = S3_BUCKET,
+        prefix: str = S3_PREFIX,
+        endpoint_url: str = S3_ENDPOINT_URL,
+        region: str = S3_REGION,
+    ):
+        if not bucket:
+            raise ValueError("S3_BUCKET must be set for the s3 blob backend")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url or None
+        self.region = region or None
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    try:
+                        import boto3
+                    except ImportError:
+                        raise RuntimeError(
+                            "The s3 blob backend needs boto3: pip install boto3"
+                        )
+                    self._client = boto3.client(
+                        "s3", endpoint_url=self.endpoint_url, region_name=self.region
+                    )
+        return self._client
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+    def list(self) -> Set[str]:
+        names = set()
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                name = item["Key"][len(self.prefix) :]
+                if "/" not in name and is_image_name(name):
+                    names.add(name)
+        return names
+
+    def put(self, name: str, path: Path) -> None:
+        self.client.upload_file(str(path), self.bucket, self._key(name))
+
+    def fetch(self, name: str, destination: Path) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.download_file(self.bucket, self._key(name), str(destination))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def delete(self, name: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError:
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return {"backend": self.name, "bucket": self.bucket, "endpoint": self.endpoint_url}
+
+
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def create_blob_store(backend: str = BLOB_BACKEND) -> BlobStore:
+    """
+    Build the blob store for the configured backend.
+
+    Args:
+        backend: "local" or "s3" (default: BLOB_BACKEND)
+
+    Returns:
+        The blob store
+    """
+    if backend == "local":
+        return LocalBlobStore()
+    if backend == "s3":
+        logger.info(f"🪣 Using S3 blob store s3://{S3_BUCKET}/{S3_PREFIX}")
+        return S3BlobStore()
+    raise ValueError(f"Unknown blob backend {backend}, choose one of {BLOB_BACKENDS}")
+
+
+def get_blob_store() -> BlobStore:
+    """Return the process-wide blob store, creating it on first use"""
+    global _blob_store
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = create_blob_store()
+    return _blob_store
+
+
+def set_blob_store(store: Optional[BlobStore]) -> None:
+    """Replace the process-wide blob store (None resets to the default)"""
+    global _blob_store
+    _blob_store = store
+
+
+def list_image_names(images_folder: Path) -> Set[str]:
+    """
+    Names of every image in the gallery.
+
+    With a remote blob store that is the bucket listing, so images created
+    on other nodes are included; otherwise the folder is scanned.
+    """
+    store = get_blob_store()
+    if store.remote:
+        return store.list()
+    return scan_image_files(Path(images_folder))
+
+
+def ensure_local(name: str, images_folder: Path) -> Optional[Path]:
+    """
+    Make sure an image is in the local images folder, fetching it from the
+    blob store if another node created it.
+
+    Args:
+        name: Image filename
+        images_folder: Local images directory
+
+    Returns:
+        The local path, or None if the image exists nowhere
+    """
+    local = locate_image(images_folder, name)
+    if local is not None:
+        return local
+    store = get_blob_store()
+    if not store.remote:
+        return None
+    path = image_path(images_folder, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Fetched under a unique name so concurrent fetches don't interleave
+    partial = path.with_name(f".{name}.{uuid.uuid4().hex[:8]}.fetch")
+    try:
+        if not store.fetch(name, partial):
+            return None
+        os.replace(partial, path)
+    finally:
+        partial.unlink(missing_ok=True)
+    logger.debug(f"📥 Fetched {name} from the {store.name} blob store")
+    return path
@@ -0,0 +1,200 @@
+import os
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from loguru import logger
+from src.blob_storage import ensure_local, get_blob_store
+from src.gallery import get_image_filenames, list_images
+from src.gallery_cache import gallery_cache
+from src.helpers import IMAGE_EXTENSIONS
+from src.http_cache import content_etags
+from src.image_layout import image_path
+from src.metadata_store import MetadataStore, get_metadata_store
+from src.renditions import delete_renditions
+from src.result_cache import result_cache
+
+# Most images one bulk delete may name
+MAX_BULK_DELETE = int(os.getenv("MAX_BULK_DELETE", "1000"))
+# Read size when copying images into an archive
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+def validate_names(filenames: Sequence[str]) -> None:
+    """
+    Check that names refer to gallery images and not to other paths.
+
+    Raises:
+        ValueError: If a name is not a plain image filename
+    """
+    for name in filenames:
+        if (
+            not name
+            or "/" in name
+            or "\\" in name
+            or name.startswith(".")
+            or Path(name).suffix.lower() not in IMAGE_EXTENSIONS
+        ):
+            raise ValueError(f"Invalid image name {name}")
+
+
+def delete_images(
+    filenames: Sequence[str], images_folder: str, store: Optional[MetadataStore] = None
+) -> Dict[str, Any]:
+    """
+    Delete a set of images, their renditions and their metadata.
+
+    Files are removed one by one, but the metadata of all of them goes in a
+    single store transaction, and the gallery cache is updated once.
+
+    Args:
+        filenames: Images to delete
+        images_folder: Path to the images directory
+        store: Metadata store to update (default: the process-wide store)
+
+    Returns:
+        Dictionary with the names deleted and the names that did not exist
+
+    Raises:
+        ValueError: If a name is invalid or there are too many
+    """
+    if len(filenames) > MAX_BULK_DELETE:
+        raise ValueError(f"At most {MAX_BULK_DELETE} images can be deleted at once")
+    validate_names(filenames)
+
+    blob_store = get_blob_store()
+    deleted: List[str] = []
+    missing: List[str] = []
+    for name in dict.fromkeys(filenames):
+        path = image_path(images_folder, name)
+        existed = False
+        # The flat path too, in case the layout migration has not reached it
+        for candidate in (path, Path(images_folder) / name):
+            try:
+                candidate.unlink()
+                existed = True
+                content_etags.forget(candidate)
+            except FileNotFoundError:
+                pass
+        # A remote store may hold images this node never fetched
+        if blob_store.remote:
+            existed = blob_store.delete(name) or existed
+        if not existed:
+            missing.append(name)
+            continue
+        result_cache.forget(name)
+        delete_renditions(name)
+        deleted.append(name)
+
+    if deleted:
+        gallery_cache.remove_many(deleted)
+        removed = (store or get_metadata_store()).delete_many(deleted)
+        logger.info(f"🗑️ Deleted {len(deleted)} images, {removed} metadata entries")
+    if missing:
+        logger.warning(f"⚠️ {len(missing)} images to delete were not found")
+    return {"deleted": deleted, "missing": missing}
+
+
+def select_images(
+    images_folder: str,
+    filenames: Optional[Sequence[str]] = None,
+    theme: Optional[str] = None,
+    complexity: Optional[str] = None,
+    language: Optional[str] = None,
+    search: Optional[str] = None,
+    store: Optional[MetadataStore] = None,
+) -> List[Dict]:
+    """
+    Gallery images matching an explicit list and/or gallery filters.
+
+    Args:
+        images_folder: Path to the images directory
+        filenames: Only include these images (default: all)
+        theme: Only include images with this theme (default: None)
+        complexity: Only include images with this complexity (default: None)
+        language: Only include images in this language (default: None)
+        search: Case-insensitive prompt substring (default: None)
+        store: Metadata store to read from (default: the process-wide store)
+
+    Returns:
+        Image objects from get_image_filenames, sorted by filename
+    """
+    images = get_image_filenames(images_folder, store)
+    if filenames is not None:
+        validate_names(filenames)
+        wanted = set(filenames)
+        images = [image for image in images if image["filename"] in wanted]
+    if theme or complexity or language or search:
+        matching = list_images(
+            theme=theme,
+            complexity=complexity,
+            language=language,
+            search=search,
+            store=store,
+        )
+        wanted = {image["filename"] for image in matching["images"]}
+        images = [image for image in images if image["filename"] in wanted]
+    return sorted(images, key=lambda image: image["filename"])
+
+
+class _ChunkSink:
+    """Write-only file object handing ZipFile output back in chunks"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(images_folder: str, filenames: Sequence[str]) -> Iterator[bytes]:
+    """
+    Build a ZIP archive of images piece by piece.
+
+    The archive is written to an unseekable sink, so ZipFile records sizes
+    and checksums in data descriptors after each file, and every chunk is
+    handed out as soon as it is written. Nothing is staged in memory or on
+    disk beyond one read buffer; images are stored without recompression
+    since they are already compressed. Files deleted while the archive is
+    being built are skipped.
+
+    Args:
+        images_folder: Path to the images directory
+        filenames: Images to include
+
+    Yields:
+        Consecutive pieces of the ZIP file
+    """
+    sink = _ChunkSink()
+    written = 0
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for name in filenames:
+            path = ensure_local(name, Path(images_folder))
+            try:
+                if path is None:
+                    raise FileNotFoundError(name)
+                info = zipfile.ZipInfo.from_file(path, arcname=name)
+                source = open(path, "rb")
+            except FileNotFoundError:
+                logger.warning(f"⚠️ {name} disappeared before it was archived")
+                continue
+            info.compress_type = zipfile.ZIP_STORED
+            with source, archive.open(info, "w") as target:
+                while chunk := source.read(ZIP_CHUNK_SIZE):
+                    target.write(chunk)
+                    if data := sink.drain():
+                        yield data
+            written += 1
+            if data := sink.drain():
+                yield data
+    # Central directory
+    yield sink.drain()
+    logger.info(f"🗜️ Archived {written} images")
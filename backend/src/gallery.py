@@ -1,48 +1,230 @@
+import time
 from loguru import logger
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pathlib import Path
-from src.helpers import load_metadata
+from src.blob_storage import list_image_names
+from src.helpers import untracked_entry
+from src.image_layout import iter_image_files, locate_image
+from src.gallery_cache import gallery_cache
+from src.metadata_store import MetadataStore, get_metadata_store
+from src.metrics import CACHE_LOOKUPS, GALLERY_SECONDS
+from src.renditions import RENDITION_SIZES, rendition_srcset, rendition_url
+from src.similarity import (
+    DUPLICATE_DISTANCE,
+    SIMILAR_MAX_DISTANCE,
+    HashIndex,
+    image_hash,
+    parse_hashes,
+)
 
 
-def get_image_filenames(images_folder: str) -> List[Dict]:
+def get_image_filenames(
+    images_folder: str, store: Optional[MetadataStore] = None
+) -> List[Dict]:
     """
     Get a list of image objects with metadata from the specified directory.
     
     Args:
         images_folder: Path to the images directory
+        store: Metadata store to read from (default: the process-wide store)
         
     Returns:
         List of image objects with metadata
     """
     logger.info(f"📂 Getting image filenames from {images_folder}")
+    started = time.perf_counter()
     
-    # Get project root directory and paths
     image_path = Path(images_folder)
-    metadata_path = image_path.parent / "image_metadata.json"
     
     if not image_path.exists():
         logger.warning(f"⚠️ Image directory {image_path} does not exist")
         return []
     
     # Get metadata
-    metadata = load_metadata(str(metadata_path))
+    metadata = (store or get_metadata_store()).all()
     
     # Get only image files that exist
-    valid_extensions = {'.png', '.jpg', '.jpeg', '.webp'}
     image_files = []
     
-    for f in image_path.iterdir():
-        if f.is_file() and f.suffix.lower() in valid_extensions:
-            # Only include if the file exists
-            if f.exists():
-                image_files.append({
-                    "filename": f.name,
-                    "url": f"/images/{f.name}",
-                    "prompt": metadata.get(f.name, {}).get("prompt", ""),
-                    "date": metadata.get(f.name, {}).get("created_at", str(f.stat().st_mtime))
-                })
-            else:
-                logger.warning(f"⚠️ Metadata exists for {f.name} but file is missing")
+    # Includes images that are only in the blob store
+    for name in list_image_names(image_path):
+        entry = metadata.get(name, {})
+        created_at = entry.get("created_at")
+        if created_at is None:
+            f = locate_image(image_path, name)
+            created_at = str(f.stat().st_mtime) if f is not None else ""
+        image_files.append({
+            "filename": name,
+            "url": f"/images/{name}",
+            "thumbnail_url": rendition_url(name, RENDITION_SIZES[0]),
+            "prompt": entry.get("prompt", ""),
+            "date": created_at
+        })
     
     logger.info(f"✅ Found {len(image_files)} images in gallery")
+    GALLERY_SECONDS.observe(time.perf_counter() - started, operation="scan")
     return image_files
+
+
+def _to_image_item(filename: str, entry: Dict) -> Dict:
+    """Build the gallery item returned to the frontend"""
+    return {
+        "filename": filename,
+        "url": f"/images/{filename}",
+        "thumbnail_url": rendition_url(filename, RENDITION_SIZES[0]),
+        "thumbnail_srcset": rendition_srcset(filename),
+        "prompt": entry.get("prompt", ""),
+        "date": entry.get("created_at", ""),
+        "theme": entry.get("theme"),
+        "complexity": entry.get("complexity"),
+        "language": entry.get("language"),
+    }
+
+
+def list_images(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    theme: Optional[str] = None,
+    complexity: Optional[str] = None,
+    language: Optional[str] = None,
+    search: Optional[str] = None,
+    store: Optional[MetadataStore] = None,
+    collapse: bool = False,
+) -> Dict:
+    """
+    Get one page of gallery images from the metadata index.
+
+    Unlike get_image_filenames this never scans the images directory. Pages
+    come from the in-memory gallery cache once it is built, and from the
+    metadata store before that or when a store is passed explicitly.
+    Near-duplicates are only collapsed when served from the cache.
+
+    Args:
+        limit: Maximum number of images (default: None, all images)
+        cursor: next_cursor from the previous page (default: None)
+        sort: "newest" or "oldest" first (default: "newest")
+        theme: Only include images with this theme (default: None)
+        complexity: Only include images with this complexity (default: None)
+        language: Only include images in this language (default: None)
+        search: Case-insensitive prompt substring (default: None)
+        store: Metadata store to read from (default: the process-wide store)
+        collapse: Show each group of near-duplicate pages once, as its
+            first page in the sort order (default: False)
+
+    Returns:
+        Dictionary with the page of images and the cursor for the next page
+    """
+    filters = {
+        field: value
+        for field, value in (
+            ("theme", theme),
+            ("complexity", complexity),
+            ("language", language),
+        )
+        if value
+    }
+    started = time.perf_counter()
+    query = dict(limit=limit, cursor=cursor, sort=sort, filters=filters, search=search)
+    if store is None and gallery_cache.ready:
+        CACHE_LOOKUPS.inc(cache="gallery", result="hit")
+        entries, next_cursor = gallery_cache.query(
+            **query, collapse=DUPLICATE_DISTANCE if collapse else 0
+        )
+    else:
+        CACHE_LOOKUPS.inc(cache="gallery", result="miss")
+        entries, next_cursor = (store or get_metadata_store()).query(**query)
+    images = [_to_image_item(filename, entry) for filename, entry in entries]
+    GALLERY_SECONDS.observe(time.perf_counter() - started, operation="page")
+    logger.debug(f"✅ Listed {len(images)} images from index")
+    return {"images": images, "next_cursor": next_cursor}
+
+
+def similar_images(
+    filename: str,
+    images_folder: str,
+    max_distance: int = SIMILAR_MAX_DISTANCE,
+    limit: int = 20,
+    store: Optional[MetadataStore] = None,
+) -> Optional[Dict]:
+    """
+    Find the gallery pages that look most like one page.
+
+    Served from the gallery cache's hash index once it is built; before
+    that, or when a store is passed, an index is built from the store.
+    Pages not hashed yet are hashed on the spot.
+
+    Args:
+        filename: Page to compare against
+        images_folder: Path to the images directory
+        max_distance: Most hash bits, out of 64, a match may differ in
+            (default: SIMILAR_MAX_DISTANCE)
+        limit: Maximum number of matches (default: 20)
+        store: Metadata store to read from (default: the process-wide store)
+
+    Returns:
+        Dictionary with the matches, closest first, or None if the page
+        does not exist
+
+    Raises:
+        ValueError: If max_distance is out of range
+    """
+    if not 0 <= max_distance <= SIMILAR_MAX_DISTANCE:
+        raise ValueError(f"max_distance must be between 0 and {SIMILAR_MAX_DISTANCE}")
+    started = time.perf_counter()
+    if store is None and gallery_cache.ready:
+        CACHE_LOOKUPS.inc(cache="gallery", result="hit")
+        index, entries = gallery_cache.hashes, gallery_cache
+    else:
+        CACHE_LOOKUPS.inc(cache="gallery", result="miss")
+        all_entries = (store or get_metadata_store()).all()
+        index, entries = HashIndex(), all_entries
+        index.add_many(parse_hashes(all_entries))
+
+    value = index.get(filename)
+    if value is None:
+        path = locate_image(Path(images_folder), filename)
+        if path is None:
+            return None
+        value = image_hash(path)
+
+    images = []
+    for distance, name in index.within(value, max_distance):
+        entry = entries.get(name)
+        if name == filename or entry is None:
+            continue
+        images.append({**_to_image_item(name, entry), "distance": distance})
+        if len(images) == limit:
+            break
+    GALLERY_SECONDS.observe(time.perf_counter() - started, operation="similar")
+    return {"filename": filename, "images": images}
+
+
+def sync_index(images_folder: str, store: Optional[MetadataStore] = None) -> int:
+    """
+    Add index entries for image files that have no metadata yet.
+
+    Images created before the metadata index existed, or copied into the
+    folder by hand, would otherwise never appear in list_images.
+
+    Args:
+        images_folder: Path to the images directory
+        store: Metadata store to update (default: the process-wide store)
+
+    Returns:
+        The number of images added to the index
+    """
+    image_path = Path(images_folder)
+    if not image_path.exists():
+        return 0
+
+    store = store or get_metadata_store()
+    files = {entry.name: Path(entry.path) for entry in iter_image_files(image_path)}
+    known = store.get_many(files)
+    missing = {
+        name: untracked_entry(f) for name, f in files.items() if name not in known
+    }
+    if missing:
+        store.add_missing(missing)
+        logger.info(f"🗂️ Indexed {len(missing)} images that had no metadata")
+    return len(missing)
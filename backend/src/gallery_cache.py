@@ -0,0 +1,318 @@
+import bisect
+import os
+import threading
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from loguru import logger
+from src.blob_storage import get_blob_store, list_image_names
+from src.helpers import untracked_entry
+from src.image_layout import locate_image
+from src.similarity import HashIndex, parse_hash, parse_hashes
+from src.metadata_store import (
+    MetadataStore,
+    QueryPage,
+    decode_cursor,
+    encode_cursor,
+    validate_query,
+)
+
+# Seconds between directory polls when watching for external changes
+WATCH_INTERVAL = float(os.getenv("GALLERY_WATCH_INTERVAL", "5"))
+
+SortKey = Tuple[str, str]
+
+
+class GalleryCache:
+    """
+    Process-wide in-memory copy of the gallery index.
+
+    Entries are kept in a list sorted by (created_at, filename), so an
+    unfiltered page is a bisect plus a slice and never touches the disk.
+    Every change bumps a version number that feeds the listing ETag. The
+    pages' perceptual hashes are indexed alongside for similarity search.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._keys: List[SortKey] = []
+        self.hashes = HashIndex()
+        self._instance = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(filename: str, entry: Dict[str, Any]) -> SortKey:
+        return (entry.get("created_at") or "", filename)
+
+    def build(self, images_folder: str, store: MetadataStore) -> None:
+        """Load every indexed image whose file exists"""
+        files = list_image_names(Path(images_folder))
+        entries = store.get_many(files)
+        hashes = HashIndex()
+        hashes.add_many(parse_hashes(entries))
+        with self._lock:
+            self._entries = entries
+            self._keys = sorted(self._key(name, entry) for name, entry in entries.items())
+            self.hashes = hashes
+            self.version += 1
+            self.ready = True
+        logger.info(f"🗃️ Gallery cache built with {len(entries)} images")
+
+    def add(self, filename: str, entry: Dict[str, Any]) -> None:
+        """Insert or replace one image"""
+        with self._lock:
+            self._discard(filename)
+            self._entries[filename] = entry
+            bisect.insort(self._keys, self._key(filename, entry))
+            self.hashes.add(filename, parse_hash(entry))
+            self.version += 1
+
+    def refresh(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Update the entries of cached images, such as newly computed hashes"""
+        with self._lock:
+            for filename, entry in entries.items():
+                current = self._entries.get(filename)
+                if current is None:
+                    continue
+                if self._key(filename, current) == self._key(filename, entry):
+                    self._entries[filename] = entry
+                    self.hashes.add(filename, parse_hash(entry))
+                else:
+                    self.add(filename, entry)
+            self.version += 1
+
+    def remove(self, filename: str) -> bool:
+        """Drop one image, returning whether it was cached"""
+        with self._lock:
+            removed = self._discard(filename)
+            if removed:
+                self.version += 1
+            return removed
+
+    def remove_many(self, filenames: Iterable[str]) -> int:
+        """Drop several images with one rebuild of the sort order"""
+        with self._lock:
+            removed = 0
+            for filename in filenames:
+                removed += self._entries.pop(filename, None) is not None
+                self.hashes.remove(filename)
+            if removed:
+                self._keys = [key for key in self._keys if key[1] in self._entries]
+                self.version += 1
+            return removed
+
+    def _discard(self, filename: str) -> bool:
+        entry = self._entries.pop(filename, None)
+        if entry is None:
+            return False
+        key = self._key(filename, entry)
+        index = bisect.bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            del self._keys[index]
+        self.hashes.remove(filename)
+        return True
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(filename)
+
+    def filenames(self) -> Set[str]:
+        with self._lock:
+            return set(self._entries)
+
+    def etag(self, variant: str = "") -> str:
+        """Strong ETag for the current gallery state and a query variant"""
+        with self._lock:
+            version = self.version
+        return f'"{self._instance}-{version}-{zlib.crc32(variant.encode()):08x}"'
+
+    def query(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        sort: str = "newest",
+        filters: Optional[Dict[str, str]] = None,
+        search: Optional[str] = None,
+        collapse: int = 0,
+    ) -> QueryPage:
+        """
+        Same contract as MetadataStore.query, served from memory.
+
+        With collapse > 0, a page is left out when another matching page
+        whose hash is at most that many bits away comes before it in the
+        sort order, so each group of near-duplicates is shown once.
+        """
+        filters = filters or {}
+        validate_query(sort, filters)
+        newest = sort == "newest"
+        needle = search.lower() if search else None
+        position = decode_cursor(cursor) if cursor else None
+
+        def matches(entry: Dict[str, Any]) -> bool:
+            if any(entry.get(field) != value for field, value in filters.items()):
+                return False
+            return needle is None or needle in (entry.get("prompt") or "").lower()
+
+        def shadowed(filename: str, entry: Dict[str, Any]) -> bool:
+            value = self.hashes.get(filename)
+            if value is None:
+                return False
+            key = self._key(filename, entry)
+            for _, other in self.hashes.within(value, collapse):
+                other_entry = self._entries.get(other)
+                if other == filename or other_entry is None or not matches(other_entry):
+                    continue
+                other_key = self._key(other, other_entry)
+                if (other_key > key) if newest else (other_key < key):
+                    return True
+            return False
+
+        with self._lock:
+            # Walk the sorted keys from the cursor onwards
+            if newest:
+                end = (
+                    bisect.bisect_left(self._keys, position)
+                    if position
+                    else len(self._keys)
+                )
+                keys = (self._keys[i] for i in range(end - 1, -1, -1))
+            else:
+                start = bisect.bisect_right(self._keys, position) if position else 0
+                keys = (self._keys[i] for i in range(start, len(self._keys)))
+
+            page = []
+            for _, filename in keys:
+                entry = self._entries[filename]
+                if not matches(entry):
+                    continue
+                if collapse and shadowed(filename, entry):
+                    continue
+                if limit is not None and len(page) == limit:
+                    last_name, last_entry = page[-1]
+                    return page, encode_cursor(*self._key(last_name, last_entry))
+                page.append((filename, entry))
+        return page, None
+
+
+class DirectoryWatcher:
+    """
+    Reconcile the gallery cache with files added or removed outside the API.
+
+    Uses the optional watchfiles package (inotify on Linux) when installed,
+    and otherwise polls the directory, or the remote blob store, every
+    WATCH_INTERVAL seconds.
+    """
+
+    def __init__(
+        self,
+        images_folder: str,
+        cache: GalleryCache,
+        store: MetadataStore,
+        interval: float = WATCH_INTERVAL,
+    ):
+        self.images_folder = Path(images_folder)
+        self.cache = cache
+        self.store = store
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="gallery-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            import watchfiles
+        except ImportError:
+            watchfiles = None
+
+        # A remote blob store changes without touching the local folder
+        if watchfiles is not None and not get_blob_store().remote:
+            logger.info(f"👀 Watching {self.images_folder} with watchfiles")
+            try:
+                for _ in watchfiles.watch(
+                    self.images_folder, stop_event=self._stop, recursive=True
+                ):
+                    self.reconcile()
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ watchfiles failed, falling back to polling: {e}")
+
+        logger.info(f"👀 Polling {self.images_folder} every {self.interval}s")
+        while not self._stop.wait(self.interval):
+            self.reconcile()
+
+    def reconcile(self) -> Tuple[Set[str], Set[str]]:
+        """
+        Bring the cache and metadata index in line with the directory.
+
+        Metadata of removed images is left for the retention pass to drop;
+        the watcher only takes them out of the cache.
+
+        Returns:
+            The sets of added and removed filenames
+        """
+        try:
+            # Read the cache before listing, so a page the API adds while
+            # the listing runs is not mistaken for a deleted one
+            cached = self.cache.filenames()
+            on_disk = list_image_names(self.images_folder)
+            added = on_disk - cached
+            # A page can reach the cache before it shows up in a bucket
+            # listing; it is only gone if the local copy is gone too
+            removed = {
+                name
+                for name in cached - on_disk
+                if locate_image(self.images_folder, name) is None
+            }
+            if not added and not removed:
+                return added, removed
+
+            if added:
+                # Never overwrite metadata written concurrently by the API
+                known = self.store.get_many(added)
+                # Images from other nodes are indexed by the node that made
+                # them, so only local files can be untracked
+                local = {
+                    name: locate_image(self.images_folder, name)
+                    for name in added
+                    if name not in known
+                }
+                untracked = {
+                    name: untracked_entry(path)
+                    for name, path in local.items()
+                    if path is not None
+                }
+                if untracked:
+                    self.store.add_missing(untracked)
+                for name, entry in self.store.get_many(added).items():
+                    self.cache.add(name, entry)
+
+            if removed:
+                self.cache.remove_many(removed)
+
+            logger.info(
+                f"🔄 Gallery reconciled: {len(added)} added, {len(removed)} removed"
+            )
+            return added, removed
+        except Exception as e:
+            logger.error(f"❌ Gallery reconciliation failed: {str(e)}")
+            return set(), set()
+
+
+# Process-wide cache shared by the API handlers
+gallery_cache = GalleryCache()
@@ -1,72 +1,126 @@
 import os
-import sys
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from io import BytesIO
-from dotenv import load_dotenv
 from loguru import logger
-from .helpers import save_metadata, load_metadata
-import requests
-from PIL import Image
-import replicate
-from typing import Optional
+from .blob_storage import get_blob_store
+from .image_layout import image_path
+from .metadata_store import get_metadata_store
+from .image_storage import (
+    output_extension,
+    partial_path,
+    store_downloaded_image,
+)
+from .renditions import create_renditions
+from .metrics import (
+    CACHE_LOOKUPS,
+    GENERATION_FAILURES,
+    GENERATION_PHASE_SECONDS,
+    GENERATIONS,
+)
+from .providers import current_provider, get_provider
+from .resilience import (
+    DOWNLOAD_TIMEOUT,
+    GENERATE_TIMEOUT,
+    CircuitOpenError,
+    call_with_timeout,
+    provider_breaker,
+    retry,
+    retry_async,
+    wait_with_timeout,
+)
+from .result_cache import cache_key, result_cache
+from .similarity import HASH_FIELD, format_hash, image_hash
+from typing import Optional, Dict, Any, Callable, Iterator
 from pathlib import Path
 import time
+import uuid
 
 # Get the project root directory
 PROJECT_ROOT = Path(__file__).parent.parent
-LOG_DIR = PROJECT_ROOT / "logs"
 IMAGES_DIR = PROJECT_ROOT / "images"
-METADATA_FILE = PROJECT_ROOT / "image_metadata.json"
-
-# Configure logger with both file and console output
-logger.remove()  # Remove default handler
-logger.add(sys.stderr, level="INFO", colorize=True)  # Console output
-logger.add(
-    LOG_DIR / "debug.log",
-    level="DEBUG",
-    rotation="10 MB",
-    compression="zip",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
-)
 
+# Async generation settings
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "4"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
 
-# Ensure directories exist
-LOG_DIR.mkdir(exist_ok=True)
-IMAGES_DIR.mkdir(exist_ok=True)
+# Shared async state, created lazily on first use so it binds to the running loop
+_generation_semaphore: Optional[asyncio.Semaphore] = None
+_image_executor: Optional[ThreadPoolExecutor] = None
 
 
-def setup_replicate() -> Optional[bool]:
-    """Initialize Replicate with API token from environment"""
-    logger.info("🔑 Setting up Replicate API...")
+def setup_provider() -> Optional[bool]:
+    """
+    Make sure the configured image provider is ready.
+
+    For Replicate the token is only checked over the network the first time,
+    and again every few seconds while it is not ready; otherwise the
+    background refresh keeps the result current, so this is cheap to call on
+    every request.
+    """
     try:
-        load_dotenv()
-        api_token = os.getenv("REPLICATE_API_TOKEN")
-        if not api_token:
-            logger.error("❌ REPLICATE_API_TOKEN environment variable is not set")
-            return None
+        return get_provider().ensure_ready() or None
+    except Exception as e:
+        logger.error(f"❌ Error setting up image provider: {e}")
+        return None
 
-        # Set the token in the environment
-        os.environ["REPLICATE_API_TOKEN"] = api_token
 
-        # Test the token by making a simple API call to list models
-        try:
-            replicate.models.get("black-forest-labs/flux-1.1-pro")
-            logger.info("✅ Replicate API token validated")
-            return True
-        except Exception as e:
-            logger.error(f"❌ Failed to validate Replicate API token: {e}")
-            return None
+@contextmanager
+def _timed(timings: Dict[str, float], phase: str) -> Iterator[None]:
+    """Record how long a generation phase took, in seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = time.perf_counter() - start
+        GENERATION_PHASE_SECONDS.observe(timings[phase], phase=phase)
 
-    except Exception as e:
-        logger.error(f"❌ Error setting up Replicate: {e}")
-        return None
+
+def _failed(cause: str) -> None:
+    """Count a failed generation; returns None for the caller to pass on"""
+    GENERATION_FAILURES.inc(cause=cause)
+    GENERATIONS.inc(outcome="failed")
+    return None
 
 
-def generate_replicate_image(
+def _allow_provider() -> None:
+    """Fail fast while the provider is degraded"""
+    try:
+        provider_breaker.allow()
+    except CircuitOpenError:
+        _failed("circuit_open")
+        raise
+
+
+def _log_timings(label: str, timings: Dict[str, float]) -> None:
+    """Log the per-phase timings of one generation"""
+    phases = ", ".join(
+        f"{phase}={seconds * 1000:.0f}ms" for phase, seconds in timings.items()
+    )
+    logger.info(f"⏱️ {label}: {phases} (total {sum(timings.values()) * 1000:.0f}ms)")
+
+
+# Art style definitions
+ART_STYLE_PROMPTS = {
+    "cartoon": "Use playful, exaggerated features with rounded lines in a cartoon style.",
+    "cute": "Create in kawaii style with simple, chubby shapes and soft lines. Add cute, big eyes where appropriate.",
+    "realistic": "Draw with more accurate proportions and fine details, while keeping it suitable for coloring.",
+    "whimsical": "Use flowing, imaginative lines in a storybook-like style.",
+    "doodle": "Create a fun, hand-drawn sketchy style with engaging patterns.",
+    "geometric": "Emphasize sharp, clean geometric shapes with focus on symmetry.",
+    "mandala-inspired": "Include kid-friendly repetitive, decorative patterns inspired by mandalas.",
+    "storybook": "Draw in classic fairytale illustration style.",
+    "minimalist": "Keep it clean and simple with minimal details and clear outlines.",
+    "comic": "Use bold lines and dynamic expressions in comic book style, avoiding heavy shading.",
+}
+
+
+def build_system_prompt(
     prompt: str, language: str = "en", complexity: str = "medium", theme: str = "none"
-) -> Optional[str]:
+) -> str:
     """
-    Generate image using Replicate's Flux model
+    Construct the system prompt sent to the model for coloring page generation
 
     Args:
         prompt: The user's prompt describing what to draw
@@ -75,31 +129,12 @@ def generate_replicate_image(
         theme: The art style theme to apply (default: "none")
 
     Returns:
-        The URL of the generated image, or None if generation failed
+        The full prompt text for the model
     """
-    logger.info(
-        f"🎨 Generating image with prompt: {prompt} in language: {language}, complexity: {complexity}, art style: {theme}"
-    )
-
-    # Art style definitions
-    art_style_prompts = {
-        "cartoon": "Use playful, exaggerated features with rounded lines in a cartoon style.",
-        "cute": "Create in kawaii style with simple, chubby shapes and soft lines. Add cute, big eyes where appropriate.",
-        "realistic": "Draw with more accurate proportions and fine details, while keeping it suitable for coloring.",
-        "whimsical": "Use flowing, imaginative lines in a storybook-like style.",
-        "doodle": "Create a fun, hand-drawn sketchy style with engaging patterns.",
-        "geometric": "Emphasize sharp, clean geometric shapes with focus on symmetry.",
-        "mandala-inspired": "Include kid-friendly repetitive, decorative patterns inspired by mandalas.",
-        "storybook": "Draw in classic fairytale illustration style.",
-        "minimalist": "Keep it clean and simple with minimal details and clear outlines.",
-        "comic": "Use bold lines and dynamic expressions in comic book style, avoiding heavy shading.",
-    }
-
     # Get the art style prompt addition
-    style_prompt = art_style_prompts.get(theme.lower(), "")
+    style_prompt = ART_STYLE_PROMPTS.get(theme.lower(), "")
 
-    # Construct the system prompt for coloring page generation
-    system_prompt = f"""
+    return f"""
         Generate a detailed black-and-white coloring page for children based on the following description ({language}): {prompt}
 
         Art Style: {style_prompt}
@@ -120,75 +155,252 @@ def generate_replicate_image(
             •	Keep the overall design suitable for young children, adapting complexity as needed.
     """
 
-    try:
-        logger.debug("Calling Replicate API...")
-        output = replicate.run(
-            "black-forest-labs/flux-1.1-pro",
-            input={
-                "prompt": system_prompt,
-                "aspect_ratio": "1:1",
-                "output_format": "webp",
-                "output_quality": 100,
-                "safety_tolerance": 2,
-                "prompt_upsampling": True,
-            },
-        )
-        logger.debug(f"Raw Replicate API response: {output}")
 
-        # Validate the URL
-        if not output:
-            logger.error("❌ Empty response from Replicate")
-            return None
+def build_model_input(system_prompt: str) -> Dict[str, Any]:
+    """Build the model input for a system prompt"""
+    return {
+        "prompt": system_prompt,
+        "aspect_ratio": "1:1",
+        "output_format": "webp",
+        "output_quality": 100,
+        "safety_tolerance": 2,
+        "prompt_upsampling": True,
+    }
 
-        url = str(output).strip()
-        if not url.startswith("http"):
-            logger.error(f"❌ Invalid URL format: {url}")
-            return None
 
-        # Test if URL is accessible
-        try:
-            response = requests.head(url, timeout=5)
-            if response.status_code != 200:
-                logger.error(f"❌ URL returned status code {response.status_code}")
-                return None
-        except Exception as e:
-            logger.error(f"❌ URL validation failed: {e}")
+def _validate_output_url(output) -> Optional[str]:
+    """Turn a raw provider output into a URL, or None if it is unusable"""
+    if not output:
+        logger.error("❌ Empty response from image provider")
+        return None
+
+    url = str(output).strip()
+    if not url.startswith(get_provider().url_prefixes):
+        logger.error(f"❌ Invalid URL format: {url}")
+        return None
+
+    return url
+
+
+def generate_image_url(
+    prompt: str, language: str = "en", complexity: str = "medium", theme: str = "none"
+) -> Optional[str]:
+    """
+    Generate image using the configured provider, within GENERATE_TIMEOUT.
+    Generation is paid for, so it is never retried.
+
+    Args:
+        prompt: The user's prompt describing what to draw
+        language: The language of the prompt (default: "en")
+        complexity: The complexity level of the image (default: "medium")
+        theme: The art style theme to apply (default: "none")
+
+    Returns:
+        The URL of the generated image, or None if generation failed
+    """
+    logger.info(
+        f"🎨 Generating image with prompt: {prompt} in language: {language}, complexity: {complexity}, art style: {theme}"
+    )
+
+    # Construct the system prompt for coloring page generation
+    system_prompt = build_system_prompt(prompt, language, complexity, theme)
+
+    try:
+        provider = get_provider()
+        logger.debug(f"Calling {provider.name} provider...")
+        output = call_with_timeout(
+            provider.generate, GENERATE_TIMEOUT, build_model_input(system_prompt)
+        )
+        logger.debug(f"Raw provider response: {output}")
+
+        # Validate the URL; an unreachable URL surfaces in the download
+        url = _validate_output_url(output)
+        if not url:
+            provider_breaker.record_failure()
             return None
 
-        logger.info(f"✅ Valid image URL received from Replicate: {url}")
+        logger.info(f"✅ Valid image URL received from provider: {url}")
         return url
 
     except Exception as e:
-        logger.exception(f"❌ Failed to generate Replicate image: {e}")
+        logger.exception(f"❌ Failed to generate image: {e}")
+        provider_breaker.record_failure()
         return None
 
 
-def download_and_process_image(image_url: str):
-    """Download and process image from URL"""
+def download_image(image_url: str, destination: Path) -> bool:
+    """
+    Stream an image from a URL to a file without holding it in memory.
+    Each attempt is limited to DOWNLOAD_TIMEOUT; transient failures are
+    retried with exponential backoff.
+
+    Args:
+        image_url: URL of the image
+        destination: File to write the downloaded bytes to
+
+    Returns:
+        True if the download completed, False otherwise
+    """
     logger.info(f"📥 Downloading image from URL: {image_url}")
+    provider = get_provider()
     try:
-        response = requests.get(image_url)
-        if response.status_code != 200:
-            logger.error(
-                f"❌ Failed to download image. Status code: {response.status_code}"
-            )
-            return None
+        retry(lambda: provider.fetch(image_url, destination, DOWNLOAD_TIMEOUT))
+        logger.info("✅ Image successfully downloaded")
+        provider_breaker.record_success()
+        return True
+    except Exception as e:
+        logger.exception(f"❌ Error downloading image: {e}")
+        provider_breaker.record_failure()
+        destination.unlink(missing_ok=True)
+        return False
+
+
+def _make_filename(original_prompt: str, extension: str = ".png") -> str:
+    """
+    Generate a safe, unique filename from the original prompt.
+
+    The random suffix keeps names unique across worker processes and nodes
+    without any coordination between them.
+    """
+    safe_filename = "".join(
+        c for c in original_prompt if c.isalnum() or c in (" ", "-", "_")
+    ).rstrip()
+    return f"{safe_filename}_{int(time.time())}_{uuid.uuid4().hex[:8]}{extension}"
+
 
-        logger.debug("Processing downloaded image...")
-        img = Image.open(BytesIO(response.content))
-        logger.info("✅ Image successfully downloaded and processed")
-        return img
+def _store_image(download_path: Path, output_path: Path, complexity: str) -> bool:
+    """Store the downloaded image in the configured mode, then render its thumbnails"""
+    try:
+        store_downloaded_image(download_path, output_path, complexity=complexity)
     except Exception as e:
-        logger.exception(f"❌ Error downloading/processing image: {e}")
+        logger.exception(f"❌ Failed to store image {output_path}: {e}")
+        return False
+
+    # Publish to the blob store so other workers and nodes can serve it
+    try:
+        get_blob_store().put(output_path.name, output_path)
+    except Exception as e:
+        logger.exception(f"❌ Failed to publish image {output_path.name}: {e}")
+        output_path.unlink(missing_ok=True)
+        return False
+
+    # Thumbnails are backfilled on request, so a failure here is not fatal
+    try:
+        with GENERATION_PHASE_SECONDS.time(phase="renditions"):
+            create_renditions(output_path)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to create renditions for {output_path}: {e}")
+    return True
+
+
+def _page_hash(output_path: Path) -> Optional[str]:
+    """Perceptual hash of a stored page, None if it cannot be computed"""
+    try:
+        with GENERATION_PHASE_SECONDS.time(phase="hash"):
+            return format_hash(image_hash(output_path))
+    except Exception as e:
+        # The backfill hashes it on the next start
+        logger.warning(f"⚠️ Failed to hash {output_path.name}: {e}")
         return None
 
 
+def _metadata_entry(
+    original_prompt: str,
+    prompt: str,
+    language: str,
+    complexity: str,
+    theme: str,
+    request_key: str,
+    dhash: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Metadata entry for a newly created image"""
+    entry = {
+        "prompt": original_prompt,
+        "language": language,
+        "complexity": complexity,
+        "theme": theme,
+        "created_at": datetime.now().isoformat(),
+        "model_prompt": prompt,
+        "cache_key": request_key,
+    }
+    if dhash is not None:
+        entry[HASH_FIELD] = dhash
+    return entry
+
+
+def _record_metadata(
+    filename: str,
+    original_prompt: str,
+    prompt: str,
+    language: str,
+    complexity: str,
+    theme: str,
+    request_key: str,
+    dhash: Optional[str] = None,
+) -> None:
+    """Store the metadata entry for a newly created image and cache it"""
+    get_metadata_store().upsert(
+        filename,
+        _metadata_entry(
+            original_prompt, prompt, language, complexity, theme, request_key, dhash
+        ),
+    )
+    result_cache.record(request_key, filename)
+    logger.info(f"✅ Updated metadata for {filename}")
+
+
+def record_metadata_batch(entries: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Store the metadata of several new images in one write and cache them.
+
+    Args:
+        entries: Mapping of filename to metadata entry, as collected through
+            the metadata_sink of create_colouring_page_async
+    """
+    get_metadata_store().upsert_many(entries)
+    for filename, entry in entries.items():
+        result_cache.record(entry["cache_key"], filename)
+    logger.info(f"✅ Updated metadata for {len(entries)} images")
+
+
+def _report_progress(
+    progress_callback: Optional[Callable[[str], None]], phase: str
+) -> None:
+    """Notify the progress callback, never letting it break generation"""
+    if progress_callback is None:
+        return
+    try:
+        progress_callback(phase)
+    except Exception as e:
+        logger.warning(f"⚠️ Progress callback failed for phase {phase}: {e}")
+
+
+def _request_key(prompt: str, language: str, complexity: str, theme: str) -> str:
+    """Result cache key for a generation request"""
+    system_prompt = build_system_prompt(prompt, language, complexity, theme)
+    return cache_key(get_provider().model, build_model_input(system_prompt))
+
+
+def _cached_result(request_key: str, force_fresh: bool) -> Optional[str]:
+    """Filename of a reusable earlier result, unless a fresh image was requested"""
+    if force_fresh:
+        return None
+    cached = result_cache.lookup(request_key, IMAGES_DIR)
+    CACHE_LOOKUPS.inc(cache="result", result="hit" if cached else "miss")
+    if cached:
+        logger.info(f"⚡ Result cache hit, reusing {cached}")
+        GENERATIONS.inc(outcome="cached")
+    return cached
+
+
 def create_colouring_page(
     prompt: str,
     language: str = "en",
     complexity: str = "medium",
     theme: str = "none",
     original_prompt: str = None,
+    progress_callback: Optional[Callable[[str], None]] = None,
+    force_fresh: bool = False,
 ) -> Optional[str]:
     """
     Create a colouring page from a prompt.
@@ -199,9 +411,16 @@ def create_colouring_page(
         complexity: The complexity level of the image (default: "medium")
         theme: The theme of the image (default: "none")
         original_prompt: The original prompt for filename creation (default: None)
+        progress_callback: Called with the name of each phase as it starts
+            (default: None)
+        force_fresh: Generate a new image even if the result cache has one
+            (default: False)
 
     Returns:
         The filename of the created image, or None if creation failed
+
+    Raises:
+        CircuitOpenError: If the provider is failing and calls are refused
     """
     if not prompt:
         logger.error("❌ No prompt provided")
@@ -214,48 +433,287 @@ def create_colouring_page(
         f"🎨 Creating colouring page for prompt: {prompt} in language: {language}, complexity: {complexity}, theme: {theme}"
     )
 
-    # Initialize Replicate first
-    if not setup_replicate():
-        logger.error("❌ Failed to initialize Replicate")
-        return None
+    request_key = _request_key(prompt, language, complexity, theme)
+    cached = _cached_result(request_key, force_fresh)
+    if cached:
+        return cached
 
-    # Create images directory if it doesn't exist
-    IMAGES_DIR.mkdir(exist_ok=True)
+    timings: Dict[str, float] = {}
 
-    # Generate a safe filename from the original prompt
-    safe_filename = "".join(
-        c for c in original_prompt if c.isalnum() or c in (" ", "-", "_")
-    ).rstrip()
-    safe_filename = f"{safe_filename}_{int(time.time())}.png"
+    # Initialize the image provider first
+    _report_progress(progress_callback, "setup")
+    with _timed(timings, "setup"):
+        ready = setup_provider()
+    if not ready:
+        logger.error("❌ Failed to initialize image provider")
+        return _failed("setup")
+
+    # Fail fast while the provider is degraded
+    _allow_provider()
 
     # First generate the image URL
-    image_url = generate_replicate_image(prompt, language, complexity, theme)
+    _report_progress(progress_callback, "generating")
+    with _timed(timings, "generate"):
+        image_url = generate_image_url(prompt, language, complexity, theme)
     if not image_url:
         logger.error("❌ Failed to generate image URL")
-        return None
+        return _failed("generate")
 
-    # Download and process the image
-    img = download_and_process_image(image_url)
-    if img is None:
-        logger.error("❌ Failed to download and process image")
-        return None
+    safe_filename = _make_filename(original_prompt, output_extension(image_url))
+    output_path = image_path(IMAGES_DIR, safe_filename)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Download the image straight to disk
+    _report_progress(progress_callback, "downloading")
+    with _timed(timings, "download"):
+        downloaded = download_image(image_url, partial_path(output_path))
+    if not downloaded:
+        logger.error("❌ Failed to download image")
+        return _failed("download")
 
     # Save the image
-    output_path = IMAGES_DIR / safe_filename
-    img.save(output_path, "PNG", quality=95)
-    logger.info(f"✅ Saved image to {output_path}")
+    _report_progress(progress_callback, "saving")
+    with _timed(timings, "store"):
+        stored = _store_image(partial_path(output_path), output_path, complexity)
+    if not stored:
+        return _failed("store")
+    dhash = _page_hash(output_path)
 
     # Update metadata
-    metadata = load_metadata(str(METADATA_FILE))
-    metadata[safe_filename] = {
-        "prompt": original_prompt,
-        "language": language,
-        "complexity": complexity,
-        "theme": theme,
-        "created_at": datetime.now().isoformat(),
-        "model_prompt": prompt,
-    }
-    save_metadata(metadata, str(METADATA_FILE))
-    logger.info(f"✅ Updated metadata for {safe_filename}")
+    with _timed(timings, "metadata"):
+        _record_metadata(
+            safe_filename,
+            original_prompt,
+            prompt,
+            language,
+            complexity,
+            theme,
+            request_key,
+            dhash,
+        )
+
+    _log_timings(safe_filename, timings)
+    GENERATIONS.inc(outcome="created")
+    return safe_filename
+
+
+# ---------------------------------------------------------------------------
+# Async generation path
+# ---------------------------------------------------------------------------
+
+
+def get_generation_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore limiting concurrent generations"""
+    global _generation_semaphore
+    if _generation_semaphore is None:
+        _generation_semaphore = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+    return _generation_semaphore
+
+
+def get_image_executor() -> ThreadPoolExecutor:
+    """Return the worker pool used for CPU-bound image work"""
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ThreadPoolExecutor(
+            max_workers=IMAGE_WORKERS, thread_name_prefix="image-worker"
+        )
+    return _image_executor
+
+
+async def _run_in_image_pool(func, *args):
+    """Run a blocking function on the image worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_image_executor(), func, *args)
+
+
+async def close_async_resources() -> None:
+    """Close the provider's async clients and the image worker pool"""
+    global _image_executor, _generation_semaphore
+    provider = current_provider()
+    if provider is not None:
+        await provider.aclose()
+    if _image_executor is not None:
+        _image_executor.shutdown(wait=False)
+        _image_executor = None
+    _generation_semaphore = None
+    logger.info("🧹 Async generation resources closed")
+
+
+async def generate_image_url_async(
+    prompt: str, language: str = "en", complexity: str = "medium", theme: str = "none"
+) -> Optional[str]:
+    """
+    Async version of generate_image_url
+
+    Args:
+        prompt: The user's prompt describing what to draw
+        language: The language of the prompt (default: "en")
+        complexity: The complexity level of the image (default: "medium")
+        theme: The art style theme to apply (default: "none")
+
+    Returns:
+        The URL of the generated image, or None if generation failed
+    """
+    logger.info(
+        f"🎨 Generating image (async) with prompt: {prompt} in language: {language}, complexity: {complexity}, art style: {theme}"
+    )
+
+    system_prompt = build_system_prompt(prompt, language, complexity, theme)
+
+    try:
+        provider = get_provider()
+        logger.debug(f"Calling {provider.name} provider (async)...")
+        output = await wait_with_timeout(
+            provider.generate_async(build_model_input(system_prompt)), GENERATE_TIMEOUT
+        )
+        logger.debug(f"Raw provider response: {output}")
+
+        url = _validate_output_url(output)
+        if not url:
+            provider_breaker.record_failure()
+            return None
+
+        logger.info(f"✅ Valid image URL received from provider: {url}")
+        return url
+
+    except Exception as e:
+        logger.exception(f"❌ Failed to generate image: {e}")
+        provider_breaker.record_failure()
+        return None
+
+
+async def download_image_async(image_url: str, destination: Path) -> bool:
+    """Async version of download_image"""
+    logger.info(f"📥 Downloading image from URL: {image_url}")
+    provider = get_provider()
+    try:
+        await retry_async(
+            lambda: wait_with_timeout(
+                provider.fetch_async(image_url, destination), DOWNLOAD_TIMEOUT
+            )
+        )
+        logger.info("✅ Image successfully downloaded")
+        provider_breaker.record_success()
+        return True
+    except Exception as e:
+        logger.exception(f"❌ Error downloading image: {e}")
+        provider_breaker.record_failure()
+        destination.unlink(missing_ok=True)
+        return False
+
+
+async def create_colouring_page_async(
+    prompt: str,
+    language: str = "en",
+    complexity: str = "medium",
+    theme: str = "none",
+    original_prompt: str = None,
+    force_fresh: bool = False,
+    metadata_sink: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Optional[str]:
+    """
+    Create a colouring page without blocking the event loop.
+
+    Network calls go through the provider's shared async client, the download is
+    streamed to disk, storage conversion and thumbnails run on the image
+    worker pool, and at most
+    MAX_CONCURRENT_GENERATIONS generations run at once.
+
+    Args:
+        prompt: The prompt to generate the image from
+        language: The language of the prompt (default: "en")
+        complexity: The complexity level of the image (default: "medium")
+        theme: The theme of the image (default: "none")
+        original_prompt: The original prompt for filename creation (default: None)
+        force_fresh: Generate a new image even if the result cache has one
+            (default: False)
+        metadata_sink: If given, the metadata entry is added to this mapping
+            instead of being written, so a caller can store many at once
+            with record_metadata_batch (default: None)
+
+    Returns:
+        The filename of the created image, or None if creation failed
+
+    Raises:
+        CircuitOpenError: If the provider is failing and calls are refused
+    """
+    if not prompt:
+        logger.error("❌ No prompt provided")
+        return None
+
+    if original_prompt is None:
+        original_prompt = prompt
+
+    logger.info(
+        f"🎨 Creating colouring page (async) for prompt: {prompt} in language: {language}, complexity: {complexity}, theme: {theme}"
+    )
+
+    # The first call builds the provider, which imports its client libraries
+    request_key = await asyncio.to_thread(
+        _request_key, prompt, language, complexity, theme
+    )
+    cached = await asyncio.to_thread(_cached_result, request_key, force_fresh)
+    if cached:
+        return cached
+
+    timings: Dict[str, float] = {}
+
+    async with get_generation_semaphore():
+        # Only the first call validates over the network
+        with _timed(timings, "setup"):
+            ready = await asyncio.to_thread(setup_provider)
+        if not ready:
+            logger.error("❌ Failed to initialize image provider")
+            return _failed("setup")
+
+        # Fail fast while the provider is degraded
+        _allow_provider()
+
+        with _timed(timings, "generate"):
+            image_url = await generate_image_url_async(
+                prompt, language, complexity, theme
+            )
+        if not image_url:
+            logger.error("❌ Failed to generate image URL")
+            return _failed("generate")
+
+        safe_filename = _make_filename(original_prompt, output_extension(image_url))
+        output_path = image_path(IMAGES_DIR, safe_filename)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with _timed(timings, "download"):
+            downloaded = await download_image_async(
+                image_url, partial_path(output_path)
+            )
+        if not downloaded:
+            logger.error("❌ Failed to download image")
+            return _failed("download")
+
+    with _timed(timings, "store"):
+        stored = await _run_in_image_pool(
+            _store_image, partial_path(output_path), output_path, complexity
+        )
+    if not stored:
+        return _failed("store")
+    dhash = await _run_in_image_pool(_page_hash, output_path)
+    with _timed(timings, "metadata"):
+        if metadata_sink is not None:
+            metadata_sink[safe_filename] = _metadata_entry(
+                original_prompt, prompt, language, complexity, theme, request_key, dhash
+            )
+        else:
+            await asyncio.to_thread(
+                _record_metadata,
+                safe_filename,
+                original_prompt,
+                prompt,
+                language,
+                complexity,
+                theme,
+                request_key,
+                dhash,
+            )
 
+    _log_timings(safe_filename, timings)
+    GENERATIONS.inc(outcome="created")
     return safe_filename
@@ -1,10 +1,24 @@
+from contextlib import contextmanager
 from datetime import datetime
 from loguru import logger
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional
 import json
+import os
+import threading
 from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 now = datetime.now()
 
+# File extensions treated as gallery images
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+# Seconds between attempts to take a lock that can be given up on
+LOCK_POLL_INTERVAL = 0.1
+
 
 def log_generated_images(file, prompt):
     imagestr = f"{now},{file},{prompt}\n"
@@ -14,22 +28,78 @@ def log_generated_images(file, prompt):
 def save_metadata(metadata: Dict[str, Any], metadata_file: str) -> None:
     """
     Save metadata to a JSON file.
+
+    The file is written to a temporary sibling and renamed into place, so
+    readers never see a half-written file.
     
     Args:
         metadata: Dictionary containing metadata to save
         metadata_file: Path to the metadata file
     """
-    logger.info(f"💾 Saving metadata to {metadata_file}")
+    logger.debug(f"💾 Saving metadata to {metadata_file}")
     
     try:
-        with open(metadata_file, 'w') as f:
+        tmp_file = f"{metadata_file}.tmp"
+        with open(tmp_file, 'w') as f:
             json.dump(metadata, f, indent=2)
-        logger.info("✅ Metadata saved successfully")
+        os.replace(tmp_file, metadata_file)
+        logger.debug("✅ Metadata saved successfully")
     except Exception as e:
         logger.error(f"❌ Failed to save metadata: {str(e)}")
         raise
 
 
+@contextmanager
+def interprocess_lock(path: str, stop: Optional[threading.Event] = None) -> Iterator[bool]:
+    """
+    Hold an exclusive lock shared by every process on the host.
+
+    The lock is an flock on a sibling "<path>.lock" file, so worker
+    processes serialize their read-modify-write cycles on the same file.
+    Where flock is unavailable the lock only holds within the process.
+
+    Args:
+        path: File to guard
+        stop: Give up waiting for the lock once this is set, as on shutdown
+
+    Yields:
+        Whether the lock is held; only False if `stop` was set first
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        if stop is None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if stop.wait(LOCK_POLL_INTERVAL):
+                        yield False
+                        return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def untracked_entry(image_file: Path) -> Dict[str, Any]:
+    """
+    Build a placeholder metadata entry for an image that has none.
+
+    Args:
+        image_file: Path to the image file
+
+    Returns:
+        Metadata dated by the file's modification time
+    """
+    created_at = datetime.fromtimestamp(image_file.stat().st_mtime).isoformat()
+    return {"prompt": "", "created_at": created_at}
+
+
 def load_metadata(metadata_file: str) -> Dict[str, Any]:
     """
     Load metadata from a JSON file.
@@ -40,12 +110,12 @@ def load_metadata(metadata_file: str) -> Dict[str, Any]:
     Returns:
         Dictionary containing the metadata
     """
-    logger.info(f"📖 Loading metadata from {metadata_file}")
+    logger.debug(f"📖 Loading metadata from {metadata_file}")
     
     try:
         with open(metadata_file, 'r') as f:
             metadata = json.load(f)
-        logger.info("✅ Metadata loaded successfully")
+        logger.debug("✅ Metadata loaded successfully")
         return metadata
     except FileNotFoundError:
         logger.warning(f"⚠️ Metadata file {metadata_file} not found, creating new")
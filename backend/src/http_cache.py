@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from stat import S_ISREG
+from typing import Optional, Tuple
+from urllib.parse import quote
+from loguru import logger
+from starlette.responses import FileResponse, Response
+
+# Cache-Control for responses whose URL never serves different bytes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Location prefix handed to nginx in X-Accel-Redirect, e.g. "/internal/";
+# empty serves image bytes from Python
+IMAGE_ACCEL_REDIRECT = os.getenv("IMAGE_ACCEL_REDIRECT", "")
+# Content hashes remembered, one per image or rendition file
+ETAG_CACHE_SIZE = int(os.getenv("ETAG_CACHE_SIZE", "10000"))
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def etag_matches(if_none_match: Optional[str], *etags: str) -> bool:
+    """Check an If-None-Match header against one or more ETags"""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or any(etag in candidates for etag in etags)
+
+
+class ContentETags:
+    """
+    Strong ETags from file contents, hashed once per file version.
+
+    Entries are keyed by path and checked against the file's size and
+    modification time, so a rewritten file is hashed again while an
+    unchanged one costs a single stat.
+    """
+
+    def __init__(self, max_entries: int = ETAG_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: Path, stat: os.stat_result) -> str:
+        """
+        Return the ETag for a file, hashing it if it changed.
+
+        Args:
+            path: File to identify
+            stat: Its current stat result
+
+        Returns:
+            A quoted strong ETag
+        """
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(key)
+                return entry[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(_HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()[:32]}"'
+
+        with self._lock:
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def forget(self, path: Path) -> None:
+        with self._lock:
+            self._entries.pop(str(path), None)
+
+
+content_etags = ContentETags()
+
+
+def immutable_file_response(
+    path: Path,
+    if_none_match: Optional[str] = None,
+    media_type: Optional[str] = None,
+    accel_path: Optional[str] = None,
+) -> Optional[Response]:
+    """
+    Serve a file whose bytes never change under its URL.
+
+    Sends a content-hash ETag with immutable caching, answers a matching
+    If-None-Match with 304, and otherwise streams the file with Range
+    support. With IMAGE_ACCEL_REDIRECT set, the body is left to nginx via
+    X-Accel-Redirect so the bytes go out with sendfile.
+
+    Args:
+        path: File to serve
+        if_none_match: The request's If-None-Match header
+        media_type: Content type (default: guessed from the name)
+        accel_path: Path of the file under the nginx internal location
+
+    Returns:
+        The response, or None if the file does not exist
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    if not S_ISREG(stat.st_mode):
+        return None
+    etag = content_etags.get(path, stat)
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if IMAGE_ACCEL_REDIRECT and accel_path:
+        location = IMAGE_ACCEL_REDIRECT.rstrip("/") + "/" + quote(accel_path)
+        logger.debug(f"🚀 Handing {path.name} to nginx at {location}")
+        headers["X-Accel-Redirect"] = location
+        return Response(media_type=media_type, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
@@ -0,0 +1,130 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Iterator, Optional
+from loguru import logger
+from src.helpers import IMAGE_EXTENSIONS
+
+# Images are spread over 16 ** SHARD_DIGITS subdirectories named by the
+# first hex digits of a hash of the filename, so no single directory grows
+# with the gallery. URLs stay /images/{filename}: the shard is derived from
+# the name and never appears outside this module.
+SHARD_DIGITS = 2
+
+
+def is_image_name(name: str) -> bool:
+    """Whether a directory entry is a finished image, not a temporary file"""
+    return not name.startswith(".") and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _is_shard(name: str) -> bool:
+    return len(name) == SHARD_DIGITS and all(c in "0123456789abcdef" for c in name)
+
+
+def shard_of(filename: str) -> str:
+    """Name of the subdirectory an image belongs in"""
+    return hashlib.sha256(filename.encode()).hexdigest()[:SHARD_DIGITS]
+
+
+def image_path(images_folder: Path, filename: str) -> Path:
+    """Where an image is written in the sharded layout"""
+    return Path(images_folder) / shard_of(filename) / filename
+
+
+def locate_image(images_folder: Path, filename: str) -> Optional[Path]:
+    """
+    Find an image in either layout.
+
+    Images that the migration has not moved yet are still found at their
+    old flat path, so they keep working while it runs.
+
+    Args:
+        images_folder: Images directory
+        filename: Image filename
+
+    Returns:
+        The path of the file, or None if it does not exist
+    """
+    path = image_path(images_folder, filename)
+    if path.is_file():
+        return path
+    legacy = Path(images_folder) / filename
+    if legacy.is_file():
+        return legacy
+    return None
+
+
+def iter_shards(images_folder: Path) -> Iterator[Path]:
+    """The shard directories that exist"""
+    try:
+        with os.scandir(images_folder) as entries:
+            shards = [entry.path for entry in entries if entry.is_dir() and _is_shard(entry.name)]
+    except FileNotFoundError:
+        return
+    for shard in shards:
+        yield Path(shard)
+
+
+def iter_entries(images_folder: Path) -> Iterator[os.DirEntry]:
+    """
+    Every file in the images folder, sharded or still flat.
+
+    Temporary files are included so cleanup can find them; filter with
+    is_image_name to get only finished images.
+    """
+    for directory in (Path(images_folder), *iter_shards(images_folder)):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def iter_image_files(images_folder: Path) -> Iterator[os.DirEntry]:
+    """Every finished image in the images folder, in either layout"""
+    return (entry for entry in iter_entries(images_folder) if is_image_name(entry.name))
+
+
+def migrate_flat_layout(images_folder: Path) -> int:
+    """
+    Move images from the old flat layout into their shards.
+
+    Safe to run while the app serves requests and from several workers at
+    once: each move is an atomic rename, and lookups fall back to the flat
+    path until it has happened.
+
+    Args:
+        images_folder: Images directory
+
+    Returns:
+        The number of images moved
+    """
+    images_folder = Path(images_folder)
+    try:
+        with os.scandir(images_folder) as entries:
+            flat = [entry.name for entry in entries if entry.is_file() and is_image_name(entry.name)]
+    except FileNotFoundError:
+        return 0
+    if not flat:
+        return 0
+
+    logger.info(f"📦 Moving {len(flat)} images into sharded subdirectories")
+    moved = 0
+    for name in flat:
+        source = images_folder / name
+        target = image_path(images_folder, name)
+        target.parent.mkdir(exist_ok=True)
+        try:
+            if target.exists():
+                # Already moved (or written again) under the new layout
+                source.unlink()
+            else:
+                os.replace(source, target)
+                moved += 1
+        except FileNotFoundError:
+            # Another worker got there first
+            continue
+    logger.info(f"✅ Moved {moved} images into the sharded layout")
+    return moved
@@ -0,0 +1,103 @@
+import os
+from pathlib import Path
+from urllib.parse import urlparse
+from loguru import logger
+from src.metrics import GENERATION_PHASE_SECONDS
+
+# How downloaded model output is written to IMAGES_DIR:
+#   original - keep the provider's bytes as-is (no decode, no re-encode)
+#   png      - decode and re-encode as RGB PNG (the historical behaviour)
+#   lossless - decode and re-encode as an optimised greyscale PNG, which
+#              suits black-on-white line art
+#   lineart  - binarize and despeckle (see src/lineart.py), then store a
+#              1-bit or small-palette PNG
+STORAGE_MODES = ("original", "png", "lossless", "lineart")
+IMAGE_STORAGE_MODE = os.getenv("IMAGE_STORAGE_MODE", "original").lower()
+
+# Chunk size for streaming downloads to disk
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+_ORIGINAL_EXTENSIONS = {".webp", ".png", ".jpg", ".jpeg"}
+
+
+def validate_storage_mode(mode: str) -> None:
+    """
+    Check that a storage mode is known.
+
+    Raises:
+        ValueError: If the mode is not one of STORAGE_MODES
+    """
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode {mode}, choose one of {STORAGE_MODES}")
+
+
+def output_extension(image_url: str, mode: str = IMAGE_STORAGE_MODE) -> str:
+    """
+    File extension for an image stored in the given mode.
+
+    Args:
+        image_url: URL the image is downloaded from
+        mode: Storage mode (default: IMAGE_STORAGE_MODE)
+
+    Returns:
+        The extension including the dot
+    """
+    validate_storage_mode(mode)
+    if mode != "original":
+        return ".png"
+    suffix = Path(urlparse(image_url).path).suffix.lower()
+    return suffix if suffix in _ORIGINAL_EXTENSIONS else ".webp"
+
+
+def partial_path(output_path: Path) -> Path:
+    """Hidden temporary path a download is streamed to before it is stored"""
+    return output_path.with_name(f".{output_path.name}.part")
+
+
+def store_downloaded_image(
+    download_path: Path,
+    output_path: Path,
+    mode: str = IMAGE_STORAGE_MODE,
+    complexity: str = "medium",
+) -> None:
+    """
+    Move a fully downloaded image into place, converting it if the mode asks.
+
+    Args:
+        download_path: Where the raw download was streamed to
+        output_path: Final location in IMAGES_DIR
+        mode: Storage mode (default: IMAGE_STORAGE_MODE)
+        complexity: Complexity level, selects the "lineart" profile
+            (default: "medium")
+    """
+    validate_storage_mode(mode)
+    timed = GENERATION_PHASE_SECONDS.time
+    try:
+        if mode == "original":
+            # Same filesystem, so this is an atomic rename with no copying
+            with timed(phase="save"):
+                os.replace(download_path, output_path)
+        else:
+            tmp_output = partial_path(output_path).with_suffix(".tmp")
+            # Only the converting modes need Pillow and numpy
+            if mode == "lineart":
+                from src.lineart import process_file
+
+                with timed(phase="lineart"):
+                    process_file(download_path, tmp_output, complexity)
+            else:
+                from PIL import Image
+
+                with Image.open(download_path) as img:
+                    with timed(phase="decode"):
+                        converted = img.convert("RGB" if mode == "png" else "L")
+                    with timed(phase="encode"):
+                        if mode == "png":
+                            converted.save(tmp_output, "PNG")
+                        else:
+                            converted.save(tmp_output, "PNG", optimize=True)
+            with timed(phase="save"):
+                os.replace(tmp_output, output_path)
+    finally:
+        download_path.unlink(missing_ok=True)
+    logger.info(f"✅ Stored image to {output_path} ({mode})")
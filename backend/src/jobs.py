@@ -0,0 +1,413 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from loguru import logger
+from src.metrics import JOBS_IN_FLIGHT
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+TERMINAL_STATES = {DONE, FAILED}
+
+# How long a process owns the jobs it runs without renewing them; jobs of a
+# process that died are picked up by another one after this
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+# How often event streams check on jobs run by another process
+JOB_POLL_INTERVAL = 1.0
+
+# A unit of work takes the job parameters plus a progress callback and
+# returns the created image filename, or None on failure
+JobWorker = Callable[..., Optional[str]]
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs so queued work survives a restart.
+
+    Several worker processes can share the database: each unfinished job is
+    leased to one owner, and only unowned jobs or jobs whose lease expired
+    can be claimed by another.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def setup(self) -> None:
+        """Create or upgrade the jobs table"""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    owner TEXT,
+                    lease_until REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+            # Databases created before leases existed
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    try:
+                        conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+                    except sqlite3.OperationalError as e:
+                        # Added by another worker starting at the same time
+                        if "duplicate column" not in str(e):
+                            raise
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job.pop("owner", None)
+        job.pop("lease_until", None)
+        return job
+
+    def insert(
+        self, job: Dict[str, Any], owner: Optional[str] = None, lease_until: float = 0
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, progress, result, error, created_at, updated_at, "
+                "owner, lease_until) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job["id"],
+                    job["status"],
+                    json.dumps(job["params"]),
+                    job["progress"],
+                    job["result"],
+                    job["error"],
+                    job["created_at"],
+                    job["updated_at"],
+                    owner,
+                    lease_until,
+                ),
+            )
+
+    def update(self, job: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, result = ?, error = ?, updated_at = ? "
+                "WHERE id = ?",
+                (
+                    job["status"],
+                    job["progress"],
+                    job["result"],
+                    job["error"],
+                    job["updated_at"],
+                    job["id"],
+                ),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING),
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def claimable(self, now: float) -> List[Dict[str, Any]]:
+        """Unfinished jobs that no live process owns"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) "
+                "AND (owner IS NULL OR lease_until < ?) ORDER BY created_at",
+                (QUEUED, RUNNING, now),
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def claim(self, job_id: str, owner: str, lease_until: float) -> bool:
+        """
+        Take ownership of an unfinished job.
+
+        The check and the update are one statement, so when several processes
+        race for the same job exactly one of them gets it.
+
+        Returns:
+            Whether the job is now leased to owner
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET owner = ?, lease_until = ? "
+                "WHERE id = ? AND status IN (?, ?) "
+                "AND (owner IS NULL OR owner = ? OR lease_until < ?)",
+                (owner, lease_until, job_id, QUEUED, RUNNING, owner, time.time()),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, owner: str, lease_until: float) -> None:
+        """Extend the lease on every unfinished job of an owner"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN (?, ?)",
+                (lease_until, owner, QUEUED, RUNNING),
+            )
+
+    def release(self, owner: str) -> None:
+        """Hand an owner's unfinished jobs back so another process can run them"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET owner = NULL, lease_until = NULL "
+                "WHERE owner = ? AND status IN (?, ?)",
+                (owner, QUEUED, RUNNING),
+            )
+
+
+class JobQueue:
+    """
+    Bounded worker pool running generation jobs in the background.
+
+    Jobs are persisted on every state change and leased to this process
+    while it holds them. On start, and then every third of a lease, jobs
+    left behind by a process that stopped or died are claimed and queued
+    again, so any number of worker processes can share one job database.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        worker: JobWorker,
+        max_workers: int = 2,
+        max_queued: int = 20,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+    ):
+        self.store = store
+        self.worker = worker
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        # Unique across processes and hosts sharing the database
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._lease_task: Optional[asyncio.Task] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        """Recover unfinished jobs and start the workers"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+        await asyncio.to_thread(self.store.setup)
+        await self._recover()
+        self._tasks = [
+            asyncio.create_task(self._run_worker(i)) for i in range(self.max_workers)
+        ]
+        self._lease_task = asyncio.create_task(self._maintain_leases())
+        logger.info(f"👷 Started {self.max_workers} job workers as {self.owner}")
+
+    async def stop(self) -> None:
+        """
+        Cancel the workers and release their jobs; unfinished jobs stay
+        persisted for another process or the next start.
+        """
+        tasks = self._tasks + ([self._lease_task] if self._lease_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._lease_task = None
+        await asyncio.to_thread(self.store.release, self.owner)
+        logger.info("🛑 Job workers stopped")
+
+    def _lease_until(self) -> float:
+        return time.time() + self.lease_seconds
+
+    async def _recover(self) -> None:
+        """Claim and queue unfinished jobs that no live process owns"""
+        claimable = await asyncio.to_thread(self.store.claimable, time.time())
+        recovered = 0
+        for job in claimable:
+            if job["id"] in self._jobs:
+                continue
+            claimed = await asyncio.to_thread(
+                self.store.claim, job["id"], self.owner, self._lease_until()
+            )
+            if not claimed:
+                continue
+            job["status"] = QUEUED
+            job["progress"] = None
+            self._jobs[job["id"]] = job
+            self._queue.put_nowait(job["id"])
+            recovered += 1
+        if recovered:
+            logger.info(f"♻️ Re-queued {recovered} unfinished jobs")
+
+    async def _maintain_leases(self) -> None:
+        """Keep this process's leases alive and pick up abandoned jobs"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.store.renew, self.owner, self._lease_until())
+                await self._recover()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to maintain job leases: {e}")
+
+    async def submit(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a new job.
+
+        Args:
+            params: Keyword arguments for the worker function
+
+        Returns:
+            The job record
+
+        Raises:
+            JobQueueFullError: If max_queued jobs are already waiting
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue has not been started")
+        if self.pending >= self.max_queued:
+            raise JobQueueFullError(f"{self.pending} jobs already queued")
+
+        now = datetime.now().isoformat()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "params": params,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await asyncio.to_thread(self.store.insert, job, self.owner, self._lease_until())
+        self._jobs[job["id"]] = job
+        self._queue.put_nowait(job["id"])
+        logger.info(f"📥 Job {job['id']} queued ({self.pending} pending)")
+        return dict(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job from memory, falling back to the store"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return dict(job)
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the job's current state, then every change until it finishes.
+
+        Changes to jobs run by this process are pushed to the subscriber;
+        jobs run by another process are followed by polling the store.
+        """
+        # Subscribe before reading the state so no change can slip in between
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        try:
+            job = await self.get(job_id)
+            while job is not None:
+                yield job
+                if job["status"] in TERMINAL_STATES:
+                    return
+                if job_id in self._jobs:
+                    job = await queue.get()
+                else:
+                    job = await self._next_from_store(job)
+        finally:
+            self._subscribers[job_id].remove(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    async def _next_from_store(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Wait until a job run by another process changes in the store"""
+        while True:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            latest = await asyncio.to_thread(self.store.get, job["id"])
+            if latest is None or latest["updated_at"] != job["updated_at"]:
+                return latest
+
+    async def _update(self, job: Dict[str, Any], **changes) -> None:
+        job.update(changes, updated_at=datetime.now().isoformat())
+        await asyncio.to_thread(self.store.update, job)
+        for queue in self._subscribers.get(job["id"], []):
+            queue.put_nowait(dict(job))
+
+    def _progress_callback(self, job: Dict[str, Any]) -> Callable[[str], None]:
+        """Build a thread-safe callback forwarding phases to subscribers"""
+
+        def report(phase: str) -> None:
+            asyncio.run_coroutine_threadsafe(
+                self._update(job, progress=phase), self._loop
+            )
+
+        return report
+
+    async def _run_worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs[job_id]
+            JOBS_IN_FLIGHT.inc()
+            try:
+                logger.info(f"🏃 Worker {index} running job {job_id}")
+                await self._update(job, status=RUNNING)
+                result = await asyncio.to_thread(
+                    self.worker,
+                    **job["params"],
+                    progress_callback=self._progress_callback(job),
+                )
+                if result:
+                    await self._update(job, status=DONE, progress=None, result=result)
+                    logger.info(f"✅ Job {job_id} done: {result}")
+                else:
+                    await self._update(
+                        job, status=FAILED, progress=None, error="Failed to generate image"
+                    )
+                    logger.error(f"❌ Job {job_id} failed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"❌ Job {job_id} crashed: {e}")
+                await self._update(job, status=FAILED, progress=None, error=str(e))
+            finally:
+                JOBS_IN_FLIGHT.dec()
+                self._queue.task_done()
+                if job["status"] in TERMINAL_STATES:
+                    self._jobs.pop(job_id, None)
+
+
+def format_sse(job: Dict[str, Any]) -> str:
+    """Format a job record as a server-sent event"""
+    return f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
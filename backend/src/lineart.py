@@ -0,0 +1,195 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+# Rows processed per strip; bounds the working memory of the float and
+# integer intermediates regardless of the image resolution
+TILE_ROWS = int(os.getenv("LINEART_TILE_ROWS", "256"))
+
+# Post-processing settings per complexity level:
+#   method          - "global" threshold or "adaptive" (local mean) binarization
+#   threshold       - grey level below which a pixel is ink ("global")
+#   radius / offset - local window radius and how far below the local mean a
+#                     pixel must be to count as ink ("adaptive")
+#   max_threshold   - pixels lighter than this are never ink ("adaptive")
+#   min_neighbours  - ink pixels with fewer inked 8-neighbours are speckle
+#   passes          - despeckle passes
+#   levels          - 2 for 1-bit output, 4 to keep three grey edge levels
+DEFAULT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "simple": {
+        "method": "global",
+        "threshold": 150,
+        "min_neighbours": 2,
+        "passes": 2,
+        "levels": 2,
+    },
+    "medium": {
+        "method": "adaptive",
+        "radius": 15,
+        "offset": 12,
+        "max_threshold": 200,
+        "min_neighbours": 2,
+        "passes": 1,
+        "levels": 2,
+    },
+    "detailed": {
+        "method": "adaptive",
+        "radius": 10,
+        "offset": 8,
+        "max_threshold": 215,
+        "min_neighbours": 1,
+        "passes": 1,
+        "levels": 4,
+    },
+}
+
+
+def _load_profiles() -> Dict[str, Dict[str, Any]]:
+    """Default profiles with per-complexity overrides from LINEART_PROFILES (JSON)"""
+    profiles = {name: dict(profile) for name, profile in DEFAULT_PROFILES.items()}
+    overrides = os.getenv("LINEART_PROFILES")
+    if overrides:
+        for name, changes in json.loads(overrides).items():
+            profiles.setdefault(name, dict(DEFAULT_PROFILES["medium"])).update(changes)
+    return profiles
+
+
+PROFILES = _load_profiles()
+
+
+def get_profile(complexity: str) -> Dict[str, Any]:
+    """Settings for a complexity level, falling back to the medium profile"""
+    return PROFILES.get(complexity, PROFILES["medium"])
+
+
+def _box_mean(gray: np.ndarray, radius: int) -> np.ndarray:
+    """Mean over a (2r+1)^2 window using an integral image"""
+    size = 2 * radius + 1
+    padded = np.pad(gray, ((radius + 1, radius), (radius + 1, radius)), mode="edge")
+    integral = padded.astype(np.int64).cumsum(axis=0).cumsum(axis=1)
+    sums = (
+        integral[size:, size:]
+        - integral[:-size, size:]
+        - integral[size:, :-size]
+        + integral[:-size, :-size]
+    )
+    return sums / (size * size)
+
+
+def binarize(gray: np.ndarray, profile: Dict[str, Any]) -> np.ndarray:
+    """
+    Classify pixels as ink or paper.
+
+    Args:
+        gray: 2-D uint8 greyscale array
+        profile: Post-processing settings
+
+    Returns:
+        Boolean array, True where the pixel is ink
+    """
+    if profile["method"] == "global":
+        return gray < profile["threshold"]
+    local_mean = _box_mean(gray, profile["radius"])
+    return (gray < local_mean - profile["offset"]) & (gray < profile["max_threshold"])
+
+
+def despeckle(ink: np.ndarray, min_neighbours: int, passes: int = 1) -> np.ndarray:
+    """
+    Remove ink pixels with too few inked 8-neighbours.
+
+    Args:
+        ink: Boolean ink mask
+        min_neighbours: Minimum inked neighbours for a pixel to survive
+        passes: Number of passes
+
+    Returns:
+        The cleaned mask
+    """
+    height, width = ink.shape
+    for _ in range(passes):
+        padded = np.pad(ink, 1).astype(np.uint8)
+        neighbours = sum(
+            padded[1 + dy : 1 + dy + height, 1 + dx : 1 + dx + width]
+            for dy in (-1, 0, 1)
+            for dx in (-1, 0, 1)
+            if dy or dx
+        )
+        ink = ink & (neighbours >= min_neighbours)
+    return ink
+
+
+def _render_strip(gray: np.ndarray, ink: np.ndarray, levels: int) -> np.ndarray:
+    """Turn a strip into output pixel values"""
+    if levels == 2:
+        # Mode "1": 0 is black, 255 is white
+        return np.where(ink, 0, 255).astype(np.uint8)
+    # Palette indices: ink keeps one of three dark levels, paper is white (3)
+    dark = np.minimum(gray // 86, 2).astype(np.uint8)
+    return np.where(ink, dark, 3).astype(np.uint8)
+
+
+def process_image(img: Image.Image, complexity: str = "medium") -> Image.Image:
+    """
+    Binarize and clean a line-art image strip by strip.
+
+    Args:
+        img: Source image in any mode
+        complexity: Complexity level selecting the profile (default: "medium")
+
+    Returns:
+        A mode "1" image, or a 4-colour greyscale "P" image when the
+        profile keeps grey levels
+    """
+    profile = get_profile(complexity)
+    levels = profile.get("levels", 2)
+    gray_img = img.convert("L")
+    width, height = gray_img.size
+
+    # Rows of context needed above and below each strip
+    halo = profile.get("radius", 0) + profile["passes"]
+
+    if levels == 2:
+        output = Image.new("1", (width, height), 1)
+    else:
+        output = Image.new("P", (width, height), 3)
+        output.putpalette([0, 0, 0, 85, 85, 85, 170, 170, 170, 255, 255, 255])
+
+    for top in range(0, height, TILE_ROWS):
+        bottom = min(top + TILE_ROWS, height)
+        read_top, read_bottom = max(0, top - halo), min(height, bottom + halo)
+        gray = np.asarray(gray_img.crop((0, read_top, width, read_bottom)))
+
+        ink = despeckle(
+            binarize(gray, profile), profile["min_neighbours"], profile["passes"]
+        )
+        rows = slice(top - read_top, top - read_top + (bottom - top))
+        strip = _render_strip(gray[rows], ink[rows], levels)
+
+        if levels == 2:
+            strip_img = Image.fromarray(strip).convert("1", dither=Image.Dither.NONE)
+        else:
+            # Same mode as the output, so paste copies the palette indices as-is
+            strip_img = Image.frombytes("P", (width, bottom - top), strip.tobytes())
+        output.paste(strip_img, (0, top))
+
+    return output
+
+
+def process_file(source: Path, destination: Path, complexity: str = "medium") -> None:
+    """
+    Post-process an image file into a 1-bit or small-palette PNG.
+
+    Args:
+        source: Image to read
+        destination: PNG file to write
+        complexity: Complexity level selecting the profile (default: "medium")
+    """
+    with Image.open(source) as img:
+        result = process_image(img, complexity)
+    bits = 1 if result.mode == "1" else 2
+    result.save(destination, "PNG", optimize=True, bits=bits)
+    logger.debug(f"🖍️ Line-art post-processed {source.name} ({complexity}, {bits}-bit)")
@@ -0,0 +1,126 @@
+import json
+import os
+import random
+import sys
+import traceback
+from pathlib import Path
+from typing import Any, Dict, Optional, TextIO
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).parent.parent
+LOG_DIR = PROJECT_ROOT / "logs"
+LOG_FILE = LOG_DIR / "debug.log"
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE_LEVEL = os.getenv("LOG_FILE_LEVEL", LOG_LEVEL).upper()
+# "text" for human-readable lines, "json" for one JSON object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Fraction of high-frequency events (health checks, static files, image
+# serving) that are written
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+# Variable values in tracebacks; useful when debugging, slow and verbose
+# otherwise
+LOG_DIAGNOSE = os.getenv("LOG_DIAGNOSE", "false").lower() == "true"
+
+CONSOLE_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+FILE_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+)
+
+# Use for high-frequency events; only LOG_SAMPLE_RATE of them are written
+sampled_logger = logger.bind(sampled=True)
+
+
+def _sampling_filter(sample_rate: float):
+    """
+    Filter that drops all but sample_rate of the sampled events.
+
+    The decision is stored on the record, so every sink keeps or drops the
+    same events.
+    """
+
+    def keep(record: Dict[str, Any]) -> bool:
+        extra = record["extra"]
+        if not extra.get("sampled"):
+            return True
+        if "_keep" not in extra:
+            extra["_keep"] = random.random() < sample_rate
+        return extra["_keep"]
+
+    return keep
+
+
+def _json_format(record: Dict[str, Any]) -> str:
+    """Format a record as one JSON line"""
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    extra = {k: v for k, v in record["extra"].items() if not k.startswith("_")}
+    if extra:
+        entry["extra"] = extra
+    if record["exception"] is not None:
+        entry["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    record["extra"]["_json"] = json.dumps(entry, default=str, ensure_ascii=False)
+    return "{extra[_json]}\n"
+
+
+def configure_logging(
+    level: str = LOG_LEVEL,
+    file_level: str = LOG_FILE_LEVEL,
+    log_format: str = LOG_FORMAT,
+    sample_rate: float = LOG_SAMPLE_RATE,
+    console: Optional[TextIO] = None,
+    log_file: Optional[Path] = LOG_FILE,
+) -> None:
+    """
+    Set up the application's log sinks, replacing any existing ones.
+
+    Both sinks are enqueued: callers format the record and put it on a
+    queue, and a background thread does the writing, so a slow disk or
+    terminal never blocks a request.
+
+    Args:
+        level: Minimum console level (default: LOG_LEVEL)
+        file_level: Minimum level for the log file (default: LOG_FILE_LEVEL)
+        log_format: "text" or "json" (default: LOG_FORMAT)
+        sample_rate: Fraction of sampled events written (default: LOG_SAMPLE_RATE)
+        console: Stream for console output (default: sys.stderr)
+        log_file: Rotating log file, or None for console only (default: LOG_FILE)
+    """
+    if log_format not in ("text", "json"):
+        raise ValueError(f"Unknown log format {log_format}, choose text or json")
+    as_json = log_format == "json"
+    keep = _sampling_filter(sample_rate)
+
+    logger.remove()
+    logger.add(
+        console or sys.stderr,
+        level=level,
+        format=_json_format if as_json else CONSOLE_FORMAT,
+        colorize=None if not as_json else False,
+        filter=keep,
+        enqueue=True,
+        backtrace=LOG_DIAGNOSE,
+        diagnose=LOG_DIAGNOSE,
+    )
+    if log_file is not None:
+        logger.add(
+            log_file,
+            level=file_level,
+            format=_json_format if as_json else FILE_FORMAT,
+            filter=keep,
+            enqueue=True,
+            rotation="1 day",
+            retention="7 days",
+            backtrace=LOG_DIAGNOSE,
+            diagnose=LOG_DIAGNOSE,
+        )
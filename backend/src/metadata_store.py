@@ -0,0 +1,451 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+from src.helpers import interprocess_lock, load_metadata, save_metadata
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+METADATA_FILE = PROJECT_ROOT / "image_metadata.json"
+METADATA_DB = PROJECT_ROOT / "image_metadata.db"
+
+# "sqlite" (default) or "json"
+METADATA_BACKEND = os.getenv("METADATA_BACKEND", "sqlite")
+
+# Metadata fields stored in their own indexed columns
+INDEXED_FIELDS = ("prompt", "language", "complexity", "theme", "created_at")
+
+# Fields that can be filtered on with an exact match
+FILTER_FIELDS = ("theme", "complexity", "language")
+
+SORT_ORDERS = ("newest", "oldest")
+
+# One page of query results plus the cursor for the next page
+QueryPage = Tuple[List[Tuple[str, Dict[str, Any]]], Optional[str]]
+
+
+def encode_cursor(created_at: str, filename: str) -> str:
+    """Encode a page position as an opaque URL-safe cursor"""
+    raw = json.dumps([created_at, filename]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, filename = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), str(filename)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _lower(value: Optional[str]) -> Optional[str]:
+    return value.lower() if value is not None else None
+
+
+def _sort_key(item: Tuple[str, Dict[str, Any]]) -> Tuple[str, str]:
+    filename, entry = item
+    return (entry.get("created_at") or "", filename)
+
+
+class MetadataStore:
+    """Interface for image metadata backends, keyed by image filename"""
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_many(self, filenames: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def upsert(self, filename: str, entry: Dict[str, Any]) -> None:
+        self.upsert_many({filename: entry})
+
+    def upsert_many(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def add_missing(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Insert entries only for filenames that have no metadata yet"""
+        raise NotImplementedError
+
+    def delete(self, filename: str) -> bool:
+        return self.delete_many([filename]) > 0
+
+    def delete_many(self, filenames: Iterable[str]) -> int:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def query(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        sort: str = "newest",
+        filters: Optional[Dict[str, str]] = None,
+        search: Optional[str] = None,
+    ) -> QueryPage:
+        """
+        Return one page of entries ordered by creation date.
+
+        Args:
+            limit: Maximum number of entries (default: None, no limit)
+            cursor: Cursor returned with the previous page (default: None)
+            sort: "newest" or "oldest" first (default: "newest")
+            filters: Exact-match filters on theme, complexity and language
+            search: Case-insensitive substring to find in the prompt
+
+        Returns:
+            The (filename, entry) pairs and the cursor for the next page,
+            which is None on the last page
+        """
+        raise NotImplementedError
+
+
+class JsonMetadataStore(MetadataStore):
+    """
+    The original whole-file JSON backend.
+
+    Every write still rewrites the file, but writes are serialized within the
+    process and, through a lock file, across worker processes, so concurrent
+    requests no longer lose updates.
+    """
+
+    def __init__(self, metadata_file: str):
+        self.metadata_file = metadata_file
+        self._lock = threading.Lock()
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        return load_metadata(self.metadata_file).get(filename)
+
+    def get_many(self, filenames: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        metadata = load_metadata(self.metadata_file)
+        return {name: metadata[name] for name in filenames if name in metadata}
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        return load_metadata(self.metadata_file)
+
+    def upsert_many(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock, interprocess_lock(self.metadata_file):
+            metadata = load_metadata(self.metadata_file)
+            metadata.update(entries)
+            save_metadata(metadata, self.metadata_file)
+
+    def add_missing(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock, interprocess_lock(self.metadata_file):
+            metadata = load_metadata(self.metadata_file)
+            for name, entry in entries.items():
+                metadata.setdefault(name, entry)
+            save_metadata(metadata, self.metadata_file)
+
+    def delete_many(self, filenames: Iterable[str]) -> int:
+        with self._lock, interprocess_lock(self.metadata_file):
+            metadata = load_metadata(self.metadata_file)
+            removed = [name for name in filenames if metadata.pop(name, None) is not None]
+            if removed:
+                save_metadata(metadata, self.metadata_file)
+            return len(removed)
+
+    def count(self) -> int:
+        return len(load_metadata(self.metadata_file))
+
+    def query(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        sort: str = "newest",
+        filters: Optional[Dict[str, str]] = None,
+        search: Optional[str] = None,
+    ) -> QueryPage:
+        filters = filters or {}
+        validate_query(sort, filters)
+        newest = sort == "newest"
+        needle = search.lower() if search else None
+
+        items = [
+            item
+            for item in load_metadata(self.metadata_file).items()
+            if all(item[1].get(field) == value for field, value in filters.items())
+            and (needle is None or needle in (item[1].get("prompt") or "").lower())
+        ]
+        items.sort(key=_sort_key, reverse=newest)
+
+        if cursor:
+            position = decode_cursor(cursor)
+            items = [
+                item
+                for item in items
+                if (_sort_key(item) < position if newest else _sort_key(item) > position)
+            ]
+
+        if limit is None or len(items) <= limit:
+            return items, None
+        page = items[:limit]
+        return page, encode_cursor(*_sort_key(page[-1]))
+
+
+class SqliteMetadataStore(MetadataStore):
+    """
+    SQLite backend in WAL mode with one row per image.
+
+    Inserts and deletes touch a single row, so their cost does not grow with
+    the gallery, and SQLite's locking keeps concurrent writers consistent.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS images (
+                    filename TEXT PRIMARY KEY,
+                    prompt TEXT,
+                    language TEXT,
+                    complexity TEXT,
+                    theme TEXT,
+                    created_at TEXT,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_images_created_at_filename "
+                "ON images(created_at, filename)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_images_theme ON images(theme)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_images_language ON images(language)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_images_complexity ON images(complexity)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS store_info (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # SQLite's lower() only folds ASCII; use Python's, like the
+            # other backends, so non-English searches match the same way
+            conn.create_function("py_lower", 1, _lower, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(filename: str, entry: Dict[str, Any]) -> tuple:
+        indexed = {field: entry.get(field) for field in INDEXED_FIELDS}
+        # Keep the sort key non-null so keyset pagination can use the index
+        indexed["created_at"] = indexed["created_at"] or ""
+        return (filename, *indexed.values(), json.dumps(entry))
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        row = (
+            self._connect()
+            .execute("SELECT data FROM images WHERE filename = ?", (filename,))
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, filenames: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        names = list(filenames)
+        result = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(names), 500):
+            chunk = names[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._connect().execute(
+                f"SELECT filename, data FROM images WHERE filename IN ({placeholders})",
+                chunk,
+            )
+            result.update({name: json.loads(data) for name, data in rows})
+        return result
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        rows = self._connect().execute("SELECT filename, data FROM images")
+        return {name: json.loads(data) for name, data in rows}
+
+    def upsert_many(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO images "
+                "(filename, prompt, language, complexity, theme, created_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(name, entry) for name, entry in entries.items()],
+            )
+
+    def add_missing(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO images "
+                "(filename, prompt, language, complexity, theme, created_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(name, entry) for name, entry in entries.items()],
+            )
+
+    def delete_many(self, filenames: Iterable[str]) -> int:
+        conn = self._connect()
+        with conn:
+            cursor = conn.executemany(
+                "DELETE FROM images WHERE filename = ?",
+                [(name,) for name in filenames],
+            )
+        return cursor.rowcount
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def query(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        sort: str = "newest",
+        filters: Optional[Dict[str, str]] = None,
+        search: Optional[str] = None,
+    ) -> QueryPage:
+        filters = filters or {}
+        validate_query(sort, filters)
+        newest = sort == "newest"
+        clauses, params = [], []
+
+        for field, value in filters.items():
+            clauses.append(f"{field} = ?")
+            params.append(value)
+
+        if search:
+            clauses.append("instr(py_lower(prompt), ?) > 0")
+            params.append(search.lower())
+
+        if cursor:
+            clauses.append(f"(created_at, filename) {'<' if newest else '>'} (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        sql = "SELECT filename, created_at, data FROM images"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        direction = "DESC" if newest else "ASC"
+        sql += f" ORDER BY created_at {direction}, filename {direction}"
+        if limit is not None:
+            # Fetch one extra row to know whether another page exists
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        rows = self._connect().execute(sql, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        return [(name, json.loads(data)) for name, _, data in rows], next_cursor
+
+    def migrate_from_json(self, metadata_file: str) -> int:
+        """
+        Import an existing JSON metadata file, once.
+
+        Args:
+            metadata_file: Path to the legacy image_metadata.json
+
+        Returns:
+            The number of entries imported (0 if already migrated)
+        """
+        if not Path(metadata_file).exists():
+            return 0
+
+        conn = self._connect()
+        with conn:
+            # Take the write lock before checking, so when several workers
+            # start at once only one of them imports the file
+            conn.execute("BEGIN IMMEDIATE")
+            done = conn.execute(
+                "SELECT value FROM store_info WHERE key = 'json_migrated'"
+            ).fetchone()
+            if done:
+                return 0
+
+            metadata = load_metadata(metadata_file)
+            conn.executemany(
+                "INSERT OR IGNORE INTO images "
+                "(filename, prompt, language, complexity, theme, created_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(name, entry) for name, entry in metadata.items()],
+            )
+            conn.execute(
+                "INSERT INTO store_info (key, value) VALUES ('json_migrated', ?)",
+                (str(metadata_file),),
+            )
+        logger.info(f"📦 Migrated {len(metadata)} metadata entries from {metadata_file}")
+        return len(metadata)
+
+
+def validate_query(sort: str, filters: Dict[str, str]) -> None:
+    """
+    Check query arguments shared by every backend.
+
+    Raises:
+        ValueError: On an unknown sort order or filter field
+    """
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"Unknown sort order: {sort}")
+    for field in filters:
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Cannot filter on {field}")
+
+
+_store: Optional[MetadataStore] = None
+_store_lock = threading.Lock()
+
+
+def create_metadata_store(backend: str = METADATA_BACKEND) -> MetadataStore:
+    """
+    Build the metadata store for the configured backend.
+
+    Args:
+        backend: "sqlite" or "json" (default: METADATA_BACKEND)
+
+    Returns:
+        A ready-to-use metadata store
+    """
+    if backend == "json":
+        logger.info(f"📄 Using JSON metadata store at {METADATA_FILE}")
+        return JsonMetadataStore(str(METADATA_FILE))
+    if backend == "sqlite":
+        logger.info(f"🗄️ Using SQLite metadata store at {METADATA_DB}")
+        store = SqliteMetadataStore(str(METADATA_DB))
+        store.migrate_from_json(str(METADATA_FILE))
+        return store
+    raise ValueError(f"Unknown metadata backend: {backend}")
+
+
+def get_metadata_store() -> MetadataStore:
+    """Return the process-wide metadata store, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_metadata_store()
+    return _store
+
+
+def set_metadata_store(store: Optional[MetadataStore]) -> None:
+    """Replace the process-wide metadata store (None resets to the default)"""
+    global _store
+    _store = store
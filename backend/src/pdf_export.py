@@ -0,0 +1,392 @@
+import hashlib
+import json
+import math
+import os
+import uuid
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
+from loguru import logger
+from src.blob_storage import ensure_local
+from src.image_layout import locate_image
+from src.metadata_store import get_metadata_store
+from src.metrics import CACHE_LOOKUPS
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+IMAGES_DIR = PROJECT_ROOT / "images"
+EXPORTS_DIR = PROJECT_ROOT / "exports"
+
+# Paper sizes in PDF points (1/72 inch), portrait
+PAPER_SIZES = {"a4": (595.28, 841.89), "letter": (612.0, 792.0)}
+# Pages per sheet -> (columns, rows) on a portrait sheet
+LAYOUTS = {1: (1, 1), 2: (1, 2), 4: (2, 2), 6: (2, 3), 9: (3, 3)}
+
+# Print resolution images are downscaled to; smaller sources are embedded
+# as they are
+EXPORT_DPI = int(os.getenv("EXPORT_DPI", "300"))
+MAX_EXPORT_PAGES = int(os.getenv("MAX_EXPORT_PAGES", "200"))
+# Finished PDFs kept on disk, oldest removed first
+EXPORT_CACHE_ENTRIES = int(os.getenv("EXPORT_CACHE_ENTRIES", "50"))
+
+_MM = 72 / 25.4
+
+
+class ImagesNotFoundError(FileNotFoundError):
+    """Raised when images in an export selection do not exist"""
+
+    def __init__(self, filenames: Sequence[str]):
+        super().__init__(f"Images not found: {', '.join(filenames)}")
+        self.filenames = list(filenames)
+
+
+def validate_export(
+    filenames: Sequence[str], paper: str, per_page: int, margin_mm: float
+) -> None:
+    """
+    Check an export request before any work starts.
+
+    Raises:
+        ValueError: If the selection or layout is invalid
+    """
+    if not filenames:
+        raise ValueError("Select at least one image")
+    if len(filenames) > MAX_EXPORT_PAGES:
+        raise ValueError(f"At most {MAX_EXPORT_PAGES} images can be exported at once")
+    if paper not in PAPER_SIZES:
+        raise ValueError(f"Unknown paper size {paper}, choose one of {tuple(PAPER_SIZES)}")
+    if per_page not in LAYOUTS:
+        raise ValueError(f"Unknown layout {per_page}, choose one of {tuple(LAYOUTS)}")
+    if not 0 <= margin_mm <= 50:
+        raise ValueError("Margin must be between 0 and 50 mm")
+    for name in filenames:
+        if "/" in name or "\\" in name or name.startswith("."):
+            raise ValueError(f"Invalid image name {name}")
+
+
+def missing_images(filenames: Sequence[str]) -> List[str]:
+    """
+    Names in the selection that do not exist, fetching the others into
+    IMAGES_DIR if they are only in the blob store.
+    """
+    return [name for name in filenames if ensure_local(name, IMAGES_DIR) is None]
+
+
+def _source(name: str) -> Path:
+    """
+    Path of an image in the selection.
+
+    Raises:
+        ImagesNotFoundError: If it was deleted since the selection was checked
+    """
+    path = locate_image(IMAGES_DIR, name)
+    if path is None:
+        raise ImagesNotFoundError([name])
+    return path
+
+
+def export_key(
+    filenames: Sequence[str], paper: str, per_page: int, margin_mm: float
+) -> str:
+    """
+    Cache key for an export: the selection, the layout and the version of
+    every source file, so replacing an image invalidates its exports.
+
+    Raises:
+        ImagesNotFoundError: If images were deleted since the selection
+            was checked
+    """
+    files = []
+    missing = []
+    for name in filenames:
+        try:
+            stat = _source(name).stat()
+        except FileNotFoundError:
+            missing.append(name)
+            continue
+        files.append([name, stat.st_size, stat.st_mtime_ns])
+    if missing:
+        raise ImagesNotFoundError(missing)
+    payload = json.dumps(
+        {
+            "files": files,
+            "paper": paper,
+            "per_page": per_page,
+            "margin": round(margin_mm, 2),
+            "dpi": EXPORT_DPI,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _text(value: str) -> bytes:
+    """A PDF text string, UTF-16 so prompts in any language survive"""
+    return b"<FEFF" + value.encode("utf-16-be").hex().upper().encode() + b">"
+
+
+def _document_title(filenames: Sequence[str]) -> str:
+    """Title from the prompts in the metadata, falling back to file names"""
+    entries = get_metadata_store().get_many(filenames)
+    prompts = []
+    for name in filenames:
+        prompt = (entries.get(name) or {}).get("prompt") or Path(name).stem
+        if prompt not in prompts:
+            prompts.append(prompt)
+    title = ", ".join(prompts[:5])
+    if len(prompts) > 5:
+        title += f" and {len(prompts) - 5} more"
+    return f"Colouring pages: {title}"
+
+
+class PdfWriter:
+    """
+    Minimal PDF writer that emits the file as it goes.
+
+    Objects are written as soon as they are complete and only their byte
+    offsets are kept, so memory does not grow with the number of pages.
+    The page tree is written last; its object number is reserved up front
+    so pages can point to it.
+    """
+
+    CATALOG = 1
+    PAGES = 2
+    INFO = 3
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self._next_id = 4
+
+    def reserve(self) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    def header(self) -> bytes:
+        # The binary comment marks the file as binary for transfer tools
+        return self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def object(self, object_id: int, body: bytes, stream: Optional[bytes] = None) -> bytes:
+        self.offsets[object_id] = self.offset
+        data = b"%d 0 obj\n" % object_id + body
+        if stream is not None:
+            data += b"\nstream\n" + stream + b"\nendstream"
+        return self._emit(data + b"\nendobj\n")
+
+    def image(self, img: "Image.Image") -> Tuple[int, bytes]:
+        """Embed a greyscale image, returning its object id and bytes"""
+        object_id = self.reserve()
+        data = zlib.compress(img.tobytes(), 6)
+        body = (
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+            b"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode "
+            b"/Length %d >>" % (img.width, img.height, len(data))
+        )
+        return object_id, self.object(object_id, body, data)
+
+    def page(
+        self, width: float, height: float, placements: List[Tuple[int, float, float, float, float]]
+    ) -> bytes:
+        """
+        Write one sheet.
+
+        Args:
+            width: Sheet width in points
+            height: Sheet height in points
+            placements: (image id, x, y, width, height) in points
+        """
+        content = b"".join(
+            b"q %.2f 0 0 %.2f %.2f %.2f cm /Im%d Do Q\n" % (w, h, x, y, image_id)
+            for image_id, x, y, w, h in placements
+        )
+        resources = b" ".join(b"/Im%d %d 0 R" % (i, i) for i, *_ in placements)
+        content_id, page_id = self.reserve(), self.reserve()
+        self.page_ids.append(page_id)
+        content = zlib.compress(content)
+        data = self.object(
+            content_id, b"<< /Length %d /Filter /FlateDecode >>" % len(content), content
+        )
+        data += self.object(
+            page_id,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /XObject << %s >> >> /Contents %d 0 R >>"
+            % (self.PAGES, width, height, resources, content_id),
+        )
+        return data
+
+    def trailer(self, title: str) -> bytes:
+        """Page tree, catalog, info and cross-reference table"""
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        data = self.object(
+            self.PAGES,
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids)),
+        )
+        data += self.object(self.CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES)
+        created = datetime.now().strftime("D:%Y%m%d%H%M%S").encode()
+        data += self.object(
+            self.INFO,
+            b"<< /Title %s /Producer %s /CreationDate (%s) >>"
+            % (_text(title), _text("Colouring Book Generator"), created),
+        )
+        xref_offset = self.offset
+        size = self._next_id
+        xref = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for object_id in range(1, size):
+            # Reserved ids that were never written are marked free
+            if object_id in self.offsets:
+                xref.append(b"%010d 00000 n \n" % self.offsets[object_id])
+            else:
+                xref.append(b"0000000000 65535 f \n")
+        xref.append(
+            b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, self.CATALOG, self.INFO, xref_offset)
+        )
+        return data + self._emit(b"".join(xref))
+
+
+def _cells(
+    paper: str, per_page: int, margin_mm: float
+) -> Tuple[float, float, List[Tuple[float, float, float, float]]]:
+    """Sheet size and the (x, y, width, height) box of every cell, top first"""
+    width, height = PAPER_SIZES[paper]
+    columns, rows = LAYOUTS[per_page]
+    margin = margin_mm * _MM
+    # Half a margin between neighbouring cells
+    gutter = margin / 2
+    cell_w = (width - 2 * margin - (columns - 1) * gutter) / columns
+    cell_h = (height - 2 * margin - (rows - 1) * gutter) / rows
+    cells = []
+    for row in range(rows):
+        for column in range(columns):
+            x = margin + column * (cell_w + gutter)
+            y = height - margin - (row + 1) * cell_h - row * gutter
+            cells.append((x, y, cell_w, cell_h))
+    return width, height, cells
+
+
+def _load_page(
+    path: Path, cell: Tuple[float, float, float, float]
+) -> Tuple["Image.Image", Tuple[float, float, float, float]]:
+    """
+    Open an image as greyscale, fitted into a cell.
+
+    Returns:
+        The image at no more than EXPORT_DPI for its printed size, and its
+        (x, y, width, height) box in points, centred in the cell
+    """
+    from PIL import Image
+
+    x, y, cell_w, cell_h = cell
+    with Image.open(path) as img:
+        scale = min(cell_w / img.width, cell_h / img.height)
+        w, h = img.width * scale, img.height * scale
+        target = (
+            min(img.width, math.ceil(w / 72 * EXPORT_DPI)),
+            min(img.height, math.ceil(h / 72 * EXPORT_DPI)),
+        )
+        img.draft("L", target)
+        if img.mode in ("RGBA", "LA", "P"):
+            # Transparent areas print as paper, not black
+            rgba = img.convert("RGBA")
+            background = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+            grey = Image.alpha_composite(background, rgba).convert("L")
+        else:
+            grey = img.convert("L")
+    if grey.size != target:
+        grey = grey.resize(target, Image.LANCZOS)
+    return grey, (x + (cell_w - w) / 2, y + (cell_h - h) / 2, w, h)
+
+
+def render_pdf(
+    filenames: Sequence[str],
+    paper: str = "a4",
+    per_page: int = 1,
+    margin_mm: float = 10,
+) -> Iterator[bytes]:
+    """
+    Compose colouring pages into a print-ready PDF, chunk by chunk.
+
+    Each image is opened, downscaled to print resolution, compressed and
+    written before the next one is read, so memory stays flat however many
+    pages are exported.
+
+    Args:
+        filenames: Images in IMAGES_DIR, in print order
+        paper: "a4" or "letter"
+        per_page: Images per sheet, one of LAYOUTS
+        margin_mm: Sheet margin in millimetres
+
+    Yields:
+        Consecutive pieces of the PDF file
+
+    Raises:
+        ImagesNotFoundError: If an image is deleted before it is read; the
+            response is already under way, so the download is cut short
+    """
+    validate_export(filenames, paper, per_page, margin_mm)
+    width, height, cells = _cells(paper, per_page, margin_mm)
+    writer = PdfWriter()
+    yield writer.header()
+    for start in range(0, len(filenames), per_page):
+        placements = []
+        for name, cell in zip(filenames[start : start + per_page], cells):
+            try:
+                img, box = _load_page(_source(name), cell)
+            except FileNotFoundError:
+                logger.warning(f"⚠️ {name} disappeared before it was exported")
+                raise ImagesNotFoundError([name])
+            image_id, data = writer.image(img)
+            img.close()
+            placements.append((image_id, *box))
+            yield data
+        yield writer.page(width, height, placements)
+    yield writer.trailer(_document_title(filenames))
+
+
+def cached_export(key: str) -> Optional[Path]:
+    """Path of a finished export, or None"""
+    path = EXPORTS_DIR / f"{key}.pdf"
+    hit = path.is_file()
+    CACHE_LOOKUPS.inc(cache="export", result="hit" if hit else "miss")
+    return path if hit else None
+
+
+def _prune_exports() -> None:
+    exports = sorted(EXPORTS_DIR.glob("*.pdf"), key=lambda p: p.stat().st_mtime)
+    for path in exports[: max(0, len(exports) - EXPORT_CACHE_ENTRIES)]:
+        path.unlink(missing_ok=True)
+        logger.debug(f"🧹 Removed cached export {path.name}")
+
+
+def stream_and_cache(key: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Pass an export through to the client while saving it for next time.
+
+    The file only enters the cache once it is complete; an export that fails
+    or is abandoned by the client leaves nothing behind.
+    """
+    EXPORTS_DIR.mkdir(exist_ok=True)
+    partial = EXPORTS_DIR / f".{key}.{uuid.uuid4().hex[:8]}.part"
+    complete = False
+    try:
+        with open(partial, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(partial, EXPORTS_DIR / f"{key}.pdf")
+        complete = True
+        logger.info(f"📄 Cached export {key}")
+        _prune_exports()
+    finally:
+        if not complete:
+            partial.unlink(missing_ok=True)
@@ -0,0 +1,156 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+from loguru import logger
+
+PROJECT_ROOT = Path(__file__).parent.parent
+PROFILES_DIR = PROJECT_ROOT / "logs" / "profiles"
+
+# Serve the /api/profiler endpoints; they expose code paths and write files,
+# so they stay off unless turned on for a profiling session
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+# Fraction of requests profiled, 0 turns the profiler off; can be changed at
+# runtime through /api/profiler when PROFILER_ENABLED is set
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+# Seconds between stack samples while a profiled request is in flight
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.005"))
+# Frames kept per stack, innermost last
+PROFILER_MAX_DEPTH = 64
+# (module, function) of the innermost frame of a thread parked waiting for
+# work: lock, queue and selector waits, idle executor workers, the loguru
+# writers and the gallery watcher. Their stacks are left out of the profile.
+IDLE_FRAMES = {
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("queue", "get"),
+    ("selectors", "select"),
+    ("concurrent.futures.thread", "_worker"),
+    ("multiprocessing.connection", "_recv"),
+    ("multiprocessing.connection", "wait"),
+    ("watchfiles.main", "watch"),
+}
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{Path(code.co_filename).stem}:{code.co_name}"
+
+
+def _is_idle(frame) -> bool:
+    """Whether a thread's innermost frame is a wait for work"""
+    return (frame.f_globals.get("__name__"), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class StackProfiler:
+    """
+    Sampling profiler producing folded stacks.
+
+    While at least one sampled request is in flight, a background thread
+    records the Python stack of every busy thread every `interval` seconds.
+    Threads parked in a lock, queue or selector wait are skipped, so idle
+    workers and background services do not bury where request time goes.
+    Stacks are aggregated in the "frame;frame;frame count" format read by
+    flamegraph.pl, speedscope and similar tools. Unsampled requests only pay
+    for one random draw.
+    """
+
+    def __init__(
+        self, sample_rate: float = PROFILER_SAMPLE_RATE, interval: float = PROFILER_INTERVAL
+    ):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.samples = 0
+        self.requests = 0
+        self._stacks: Counter = Counter()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def configure(self, sample_rate: float) -> None:
+        """Turn sampling on (rate > 0) or off"""
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        logger.info(f"🔬 Profiler sample rate set to {self.sample_rate}")
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def begin(self) -> None:
+        """Mark the start of a profiled request"""
+        with self._lock:
+            self._active += 1
+            self.requests += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="stack-profiler", daemon=True
+                )
+                self._thread.start()
+        self._wake.set()
+
+    def end(self) -> None:
+        """Mark the end of a profiled request"""
+        with self._lock:
+            self._active = max(0, self._active - 1)
+            if not self._active:
+                self._wake.clear()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            self._wake.wait()
+            frames = sys._current_frames()
+            stacks = []
+            for thread_id, frame in frames.items():
+                if thread_id == own_id or _is_idle(frame):
+                    continue
+                names = []
+                while frame is not None and len(names) < PROFILER_MAX_DEPTH:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(names)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def folded(self) -> str:
+        """The profile so far as folded stacks, heaviest first"""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def dump(self) -> Path:
+        """Write the folded profile under PROFILES_DIR and return its path"""
+        PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILES_DIR / f"profile_{int(time.time())}.folded"
+        path.write_text(self.folded())
+        logger.info(f"🔬 Wrote profile with {self.samples} samples to {path}")
+        return path
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+            self.requests = 0
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "interval": self.interval,
+                "profiled_requests": self.requests,
+                "samples": self.samples,
+                "stacks": len(self._stacks),
+            }
+
+
+profiler = StackProfiler()
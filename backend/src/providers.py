@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from loguru import logger
+from .image_storage import DOWNLOAD_CHUNK_SIZE
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from .replicate_client import ReplicateClient
+
+# Which backend generates images:
+#   replicate - the hosted Flux model (needs REPLICATE_API_TOKEN)
+#   local     - deterministic synthetic line art, for offline load tests,
+#               benchmarks and CI
+IMAGE_PROVIDERS = ("replicate", "local")
+IMAGE_PROVIDER = os.getenv("IMAGE_PROVIDER", "replicate").lower()
+
+# Local provider settings
+LOCAL_PROVIDER_LATENCY = float(os.getenv("LOCAL_PROVIDER_LATENCY", "0"))
+LOCAL_PROVIDER_FAILURE_RATE = float(os.getenv("LOCAL_PROVIDER_FAILURE_RATE", "0"))
+LOCAL_PROVIDER_SIZE = int(os.getenv("LOCAL_PROVIDER_SIZE", "1024"))
+LOCAL_PROVIDER_SEED = int(os.getenv("LOCAL_PROVIDER_SEED", "0"))
+
+LOCAL_MODEL = "local/lineart"
+_LOCAL_FORMATS = {"webp": "WEBP", "png": "PNG", "jpg": "JPEG"}
+
+
+class ProviderError(Exception):
+    """Raised when a provider fails to produce an image"""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def _status_error(status_code: int) -> ProviderError:
+    """Error for a failed download; server errors and throttling are retryable"""
+    retryable = status_code >= 500 or status_code in (408, 429)
+    return ProviderError(f"Download returned status {status_code}", retryable)
+
+
+class ImageProvider:
+    """
+    Interface every image backend implements.
+
+    A generation is two steps: `generate` turns a model input into an output
+    reference (a URL), and `fetch` writes the image behind that reference to
+    a file.
+    """
+
+    name = "base"
+    model = ""
+    # Prefixes a valid output reference starts with
+    url_prefixes: Tuple[str, ...] = ("http",)
+
+    def ensure_ready(self) -> bool:
+        """Check the provider can serve requests"""
+        return True
+
+    def start(self) -> None:
+        """Start any background work the provider needs"""
+
+    def close(self) -> None:
+        """Stop background work and release blocking resources"""
+
+    async def aclose(self) -> None:
+        """Release async resources"""
+
+    def status(self) -> Dict[str, Any]:
+        return {"provider": self.name, "model": self.model}
+
+    def generate(self, model_input: Dict[str, Any]) -> Any:
+        """
+        Run the model.
+
+        Args:
+            model_input: Model input from build_model_input
+
+        Returns:
+            The raw model output, normally the URL of the image
+        """
+        raise NotImplementedError
+
+    async def generate_async(self, model_input: Dict[str, Any]) -> Any:
+        """Async version of generate"""
+        return await asyncio.to_thread(self.generate, model_input)
+
+    def fetch(
+        self, url: str, destination: Path, timeout: Optional[float] = None
+    ) -> None:
+        """
+        Write the image behind an output reference to a file.
+
+        Args:
+            url: Output reference from generate
+            destination: File to write
+            timeout: Seconds the whole fetch may take (default: no limit)
+
+        Raises:
+            ProviderError: If the image could not be retrieved
+        """
+        raise NotImplementedError
+
+    async def fetch_async(self, url: str, destination: Path) -> None:
+        """Async version of fetch; callers bound it with asyncio timeouts"""
+        await asyncio.to_thread(self.fetch, url, destination)
+
+
+class ReplicateProvider(ImageProvider):
+    """
+    Hosted Flux model on Replicate, downloaded from its CDN.
+
+    The Replicate SDK and its HTTP clients are only imported when this
+    provider is created.
+    """
+
+    name = "replicate"
+
+    def __init__(self, client: Optional["ReplicateClient"] = None):
+        from .replicate_client import get_replicate_client
+
+        self.client = client or get_replicate_client()
+        self.model = self.client.model
+
+    def ensure_ready(self) -> bool:
+        return self.client.ensure_ready()
+
+    def start(self) -> None:
+        self.client.start_refresh()
+
+    def close(self) -> None:
+        self.client.close()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def status(self) -> Dict[str, Any]:
+        return {**super().status(), **self.client.status()}
+
+    def generate(self, model_input: Dict[str, Any]) -> Any:
+        return self.client.run(model_input)
+
+    async def generate_async(self, model_input: Dict[str, Any]) -> Any:
+        return await self.client.async_run(model_input)
+
+    def fetch(
+        self, url: str, destination: Path, timeout: Optional[float] = None
+    ) -> None:
+        deadline = time.monotonic() + timeout if timeout else None
+        # Connect and per-read limits; the deadline bounds the whole transfer
+        socket_timeout = (5, min(timeout, 30) if timeout else 30)
+        with self.client.session.get(
+            url, stream=True, timeout=socket_timeout
+        ) as response:
+            if response.status_code != 200:
+                raise _status_error(response.status_code)
+            with open(destination, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    if deadline and time.monotonic() > deadline:
+                        raise ProviderError(
+                            f"Download exceeded {timeout:.0f}s", retryable=True
+                        )
+
+    async def fetch_async(self, url: str, destination: Path) -> None:
+        async with self.client.async_session.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise _status_error(response.status_code)
+            # Opening, writing and closing all block, so none run on the loop
+            f = await asyncio.to_thread(open, destination, "wb")
+            try:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+
+
+class LocalProvider(ImageProvider):
+    """
+    Offline stand-in that draws synthetic line art.
+
+    The drawing is a pure function of the model input, so the same request
+    always yields the same image. Latency and failures are simulated in the
+    generate step; failures come from a seeded generator so a run of
+    requests fails the same way every time.
+    """
+
+    name = "local"
+    model = LOCAL_MODEL
+    url_prefixes = ("local://",)
+
+    def __init__(
+        self,
+        latency: float = LOCAL_PROVIDER_LATENCY,
+        failure_rate: float = LOCAL_PROVIDER_FAILURE_RATE,
+        size: int = LOCAL_PROVIDER_SIZE,
+        seed: int = LOCAL_PROVIDER_SEED,
+    ):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.size = size
+        self._failures = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **super().status(),
+            "latency": self.latency,
+            "failure_rate": self.failure_rate,
+            "size": self.size,
+        }
+
+    def _output_url(self, model_input: Dict[str, Any]) -> str:
+        """Reference encoding the drawing seed and output format"""
+        with self._lock:
+            failed = self._failures.random() < self.failure_rate
+        if failed:
+            raise ProviderError("Simulated local provider failure")
+        payload = json.dumps(model_input, sort_keys=True).encode()
+        digest = hashlib.sha256(payload).hexdigest()[:16]
+        extension = str(model_input.get("output_format", "webp")).lower()
+        if extension not in _LOCAL_FORMATS:
+            extension = "webp"
+        return f"local://output/{digest}.{extension}"
+
+    def generate(self, model_input: Dict[str, Any]) -> Any:
+        time.sleep(self.latency)
+        return self._output_url(model_input)
+
+    async def generate_async(self, model_input: Dict[str, Any]) -> Any:
+        await asyncio.sleep(self.latency)
+        return self._output_url(model_input)
+
+    def fetch(
+        self, url: str, destination: Path, timeout: Optional[float] = None
+    ) -> None:
+        name = Path(urlparse(url).path).name
+        digest, _, extension = name.partition(".")
+        if not digest or extension not in _LOCAL_FORMATS:
+            raise ProviderError(f"Not a local provider output: {url}")
+        self.draw(digest).save(destination, _LOCAL_FORMATS[extension])
+
+    def draw(self, digest: str) -> "Image.Image":
+        """Draw black outlines on white, seeded by a request digest"""
+        from PIL import Image, ImageDraw
+
+        rng = random.Random(digest)
+        size = self.size
+        img = Image.new("L", (size, size), 255)
+        draw = ImageDraw.Draw(img)
+        width = max(2, size // 200)
+        for _ in range(rng.randint(8, 24)):
+            x0, y0 = rng.randrange(size), rng.randrange(size)
+            extent = rng.randint(size // 16, size // 3)
+            box = (x0, y0, min(size - 1, x0 + extent), min(size - 1, y0 + extent))
+            shape = rng.choice(("ellipse", "rectangle", "line", "polygon"))
+            if shape == "ellipse":
+                draw.ellipse(box, outline=0, width=width)
+            elif shape == "rectangle":
+                draw.rectangle(box, outline=0, width=width)
+            elif shape == "line":
+                draw.line(box, fill=0, width=width)
+            else:
+                points = [
+                    (rng.randrange(box[0], box[2] + 1), rng.randrange(box[1], box[3] + 1))
+                    for _ in range(rng.randint(3, 6))
+                ]
+                draw.polygon(points, outline=0, width=width)
+        return img
+
+
+_provider: Optional[ImageProvider] = None
+_provider_lock = threading.Lock()
+
+
+def create_provider(name: str = IMAGE_PROVIDER) -> ImageProvider:
+    """
+    Build the image provider for the configured backend.
+
+    Args:
+        name: "replicate" or "local" (default: IMAGE_PROVIDER)
+
+    Returns:
+        The provider
+    """
+    if name == "replicate":
+        logger.info("☁️ Using Replicate image provider")
+        return ReplicateProvider()
+    if name == "local":
+        logger.info("🧪 Using local offline image provider")
+        return LocalProvider()
+    raise ValueError(f"Unknown image provider {name}, choose one of {IMAGE_PROVIDERS}")
+
+
+def get_provider() -> ImageProvider:
+    """Return the process-wide image provider, creating it on first use"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider()
+    return _provider
+
+
+def current_provider() -> Optional[ImageProvider]:
+    """Return the process-wide image provider if it has been created yet"""
+    return _provider
+
+
+def provider_name() -> str:
+    """Name of the provider in use, without creating it"""
+    return _provider.name if _provider is not None else IMAGE_PROVIDER
+
+
+def set_provider(provider: Optional[ImageProvider]) -> None:
+    """Replace the process-wide image provider (None resets to the default)"""
+    global _provider
+    _provider = provider
@@ -0,0 +1,255 @@
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+from urllib.parse import quote
+from loguru import logger
+from src.image_layout import locate_image, shard_of
+from src.metrics import CACHE_LOOKUPS
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+IMAGES_DIR = PROJECT_ROOT / "images"
+RENDITIONS_DIR = PROJECT_ROOT / "renditions"
+
+# Thumbnail widths in pixels, smallest first
+RENDITION_SIZES = tuple(
+    sorted(int(size) for size in os.getenv("RENDITION_SIZES", "256,512").split(","))
+)
+RENDITION_QUALITY = int(os.getenv("RENDITION_QUALITY", "80"))
+
+_MEDIA_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+
+def _rendition_format() -> str:
+    """Configured rendition format, falling back to WebP if Pillow lacks it"""
+    requested = os.getenv("RENDITION_FORMAT", "webp").lower()
+    if requested not in _MEDIA_TYPES:
+        logger.warning(f"⚠️ Unknown rendition format {requested}, using webp")
+        return "webp"
+    if requested == "webp":
+        return requested
+    # Probing Pillow's plugins is slow, so only done for other formats
+    from PIL import Image
+
+    if f".{requested}" not in Image.registered_extensions():
+        logger.warning(f"⚠️ Pillow cannot encode {requested}, using webp")
+        return "webp"
+    return requested
+
+
+RENDITION_FORMAT = _rendition_format()
+RENDITION_MEDIA_TYPE = _MEDIA_TYPES[RENDITION_FORMAT]
+
+# Concurrent requests for one image wait on the same lock instead of rendering
+# it twice. Images share a fixed pool of locks, so the pool does not grow with
+# the gallery; two images rarely land on one lock and then only take turns.
+LOCK_STRIPES = 64
+_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+def _lock_for(filename: str) -> threading.Lock:
+    return _locks[hash(filename) % LOCK_STRIPES]
+
+
+def validate_size(size: int) -> None:
+    """
+    Check that a rendition size is configured.
+
+    Raises:
+        ValueError: If the size is not one of RENDITION_SIZES
+    """
+    if size not in RENDITION_SIZES:
+        raise ValueError(
+            f"Unsupported size {size}, choose one of {list(RENDITION_SIZES)}"
+        )
+
+
+def rendition_path(filename: str, size: int) -> Path:
+    """Location of one rendition of an image, sharded like the image itself"""
+    return RENDITIONS_DIR / str(size) / shard_of(filename) / f"{filename}.{RENDITION_FORMAT}"
+
+
+def rendition_url(filename: str, size: int) -> str:
+    """API URL serving one rendition of an image"""
+    # Quoted so the URL stays a single token inside a srcset
+    return f"/images/{quote(filename)}?size={size}"
+
+
+def rendition_srcset(filename: str) -> str:
+    """srcset value listing every rendition of an image"""
+    return ", ".join(
+        f"{rendition_url(filename, size)} {size}w" for size in RENDITION_SIZES
+    )
+
+
+def _render(img: "Image.Image", size: int, target: Path) -> "Image.Image":
+    """Write one downscaled copy of an already opened image and return it"""
+    from PIL import Image
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    thumb = img.copy()
+    thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+    # Unique so other worker processes rendering the same image don't write
+    # into one temporary file
+    tmp_target = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        thumb.save(tmp_target, RENDITION_FORMAT.upper(), quality=RENDITION_QUALITY, method=4)
+        os.replace(tmp_target, target)
+    finally:
+        tmp_target.unlink(missing_ok=True)
+    return thumb
+
+
+def create_renditions(
+    source: Path, sizes: Optional[List[int]] = None
+) -> Dict[int, Path]:
+    """
+    Render thumbnails of an image.
+
+    Args:
+        source: Path to the full-size image
+        sizes: Sizes to render (default: all RENDITION_SIZES)
+
+    Returns:
+        Mapping of size to rendition path
+    """
+    from PIL import Image
+
+    sizes = sorted(sizes or RENDITION_SIZES, reverse=True)
+    paths = {}
+    with _lock_for(source.name):
+        with Image.open(source) as img:
+            img.load()
+            if img.mode not in ("RGB", "RGBA", "L", "LA"):
+                img = img.convert("RGB")
+            # Downscale largest first and reuse it for the smaller sizes
+            current = img
+            for size in sizes:
+                target = rendition_path(source.name, size)
+                current = _render(current, size, target)
+                paths[size] = target
+    logger.info(f"🖼️ Created {len(paths)} renditions for {source.name}")
+    return paths
+
+
+def get_rendition(filename: str, size: int) -> Optional[Path]:
+    """
+    Return a rendition, rendering it first if it is missing or stale.
+
+    Args:
+        filename: Name of the full-size image in IMAGES_DIR
+        size: One of RENDITION_SIZES
+
+    Returns:
+        Path to the rendition, or None if the source image does not exist
+
+    Raises:
+        ValueError: If the size is not configured
+    """
+    validate_size(size)
+    source = locate_image(IMAGES_DIR, filename)
+    if source is None:
+        return None
+    target = rendition_path(filename, size)
+    try:
+        source_mtime = source.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+    try:
+        if target.stat().st_mtime >= source_mtime:
+            CACHE_LOOKUPS.inc(cache="rendition", result="hit")
+            return target
+    except FileNotFoundError:
+        pass
+
+    CACHE_LOOKUPS.inc(cache="rendition", result="miss")
+    logger.info(f"🖼️ Backfilling {size}px rendition for {filename}")
+    return create_renditions(source, [size])[size]
+
+
+def delete_renditions(filename: str) -> None:
+    """Remove every rendition of an image"""
+    for size in RENDITION_SIZES:
+        rendition_path(filename, size).unlink(missing_ok=True)
+
+
+def migrate_flat_renditions() -> int:
+    """
+    Move renditions from the old flat layout into their shards, so the
+    layout migration does not have to render every thumbnail again.
+
+    Returns:
+        The number of renditions moved
+    """
+    moved = 0
+    for size in RENDITION_SIZES:
+        size_dir = RENDITIONS_DIR / str(size)
+        try:
+            with os.scandir(size_dir) as entries:
+                flat = [entry.name for entry in entries if entry.is_file()]
+        except FileNotFoundError:
+            continue
+        for name in flat:
+            if name.startswith(".") or not name.endswith(f".{RENDITION_FORMAT}"):
+                continue
+            filename = name[: -len(RENDITION_FORMAT) - 1]
+            target = rendition_path(filename, size)
+            target.parent.mkdir(exist_ok=True)
+            try:
+                os.replace(size_dir / name, target)
+                moved += 1
+            except FileNotFoundError:
+                continue
+    if moved:
+        logger.info(f"📦 Moved {moved} renditions into the sharded layout")
+    return moved
+
+
+def prune_renditions(keep: Set[str], older_than: float) -> int:
+    """
+    Remove renditions whose image is gone, files left in a layout or format
+    no longer used, and abandoned temporary files.
+
+    Args:
+        keep: Names of the images that still exist
+        older_than: Only remove files last modified before this timestamp,
+            so renditions being written right now are left alone
+
+    Returns:
+        The number of files removed
+    """
+    removed = 0
+    try:
+        with os.scandir(RENDITIONS_DIR) as entries:
+            size_dirs = [Path(entry.path) for entry in entries if entry.is_dir()]
+    except FileNotFoundError:
+        return 0
+    for size_dir in size_dirs:
+        for root, _, files in os.walk(size_dir):
+            for name in files:
+                path = Path(root) / name
+                filename = name[: -len(RENDITION_FORMAT) - 1]
+                wanted = (
+                    size_dir.name.isdigit()
+                    and int(size_dir.name) in RENDITION_SIZES
+                    and name.endswith(f".{RENDITION_FORMAT}")
+                    and filename in keep
+                    and path == rendition_path(filename, int(size_dir.name))
+                )
+                if wanted:
+                    continue
+                try:
+                    if path.stat().st_mtime < older_than:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+    if removed:
+        logger.info(f"🧹 Removed {removed} orphaned renditions")
+    return removed
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+import httpx
+import replicate
+import requests
+from dotenv import load_dotenv
+from loguru import logger
+from replicate.exceptions import ReplicateError
+from requests.adapters import HTTPAdapter
+
+REPLICATE_MODEL = "black-forest-labs/flux-1.1-pro"
+
+# Seconds between background token re-validations
+REPLICATE_REFRESH_INTERVAL = float(os.getenv("REPLICATE_REFRESH_INTERVAL", "900"))
+# Least seconds between validations retried by requests while not ready
+REVALIDATE_INTERVAL = 5.0
+# API responses that mean the token itself is bad
+AUTH_REJECTED = (401, 403)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+
+
+class ReplicateClient:
+    """
+    Long-lived Replicate API client.
+
+    The token is read and validated once, then re-validated in a background
+    thread, so requests never pay for a validation round trip. API calls and
+    CDN downloads reuse keep-alive connection pools.
+    """
+
+    def __init__(self, model: str = REPLICATE_MODEL):
+        self.model = model
+        self.ready = False
+        self.last_validated: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._last_attempt: Optional[float] = None
+        self._client: Optional[replicate.Client] = None
+        self._session: Optional[requests.Session] = None
+        self._async_session: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    @property
+    def client(self) -> replicate.Client:
+        """The pooled replicate client, created on first use"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    load_dotenv()
+                    self._client = replicate.Client(
+                        api_token=os.getenv("REPLICATE_API_TOKEN"),
+                        limits=httpx.Limits(
+                            max_connections=HTTP_POOL_SIZE,
+                            max_keepalive_connections=HTTP_POOL_SIZE,
+                        ),
+                    )
+        return self._client
+
+    @property
+    def session(self) -> requests.Session:
+        """Keep-alive session for synchronous CDN requests"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    @property
+    def async_session(self) -> httpx.AsyncClient:
+        """Keep-alive async client for CDN requests, bound to the running loop"""
+        if self._async_session is None or self._async_session.is_closed:
+            logger.debug(f"🌐 Creating shared HTTP client (pool size {HTTP_POOL_SIZE})")
+            self._async_session = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_SIZE,
+                    max_keepalive_connections=HTTP_POOL_SIZE,
+                ),
+                follow_redirects=True,
+            )
+        return self._async_session
+
+    def validate(self) -> bool:
+        """
+        Check the API token with a lightweight model lookup.
+
+        Only a missing token or one the API rejects clears the ready flag;
+        network errors and server errors keep the last known state, so one
+        failed refresh does not stop generation until the next one.
+
+        Returns:
+            True if the token works, as far as is known
+        """
+        logger.info("🔑 Validating Replicate API token...")
+        self._last_attempt = time.monotonic()
+        load_dotenv()
+        if not os.getenv("REPLICATE_API_TOKEN"):
+            self.ready = False
+            self.last_error = "REPLICATE_API_TOKEN environment variable is not set"
+            logger.error(f"❌ {self.last_error}")
+            return False
+        try:
+            self.client.models.get(self.model)
+            self.ready = True
+            self.last_error = None
+            self.last_validated = time.time()
+            logger.info("✅ Replicate API token validated")
+        except ReplicateError as e:
+            self.last_error = str(e)
+            if e.status in AUTH_REJECTED:
+                self.ready = False
+                logger.error(f"❌ Replicate API token rejected: {e}")
+            else:
+                logger.warning(f"⚠️ Could not validate Replicate API token: {e}")
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"⚠️ Could not validate Replicate API token: {e}")
+        return self.ready
+
+    def ensure_ready(self) -> bool:
+        """
+        A flag check once validated; while not ready, validate again, at
+        most once every REVALIDATE_INTERVAL seconds.
+        """
+        if self.ready:
+            return True
+        if (
+            self._last_attempt is None
+            or time.monotonic() - self._last_attempt >= REVALIDATE_INTERVAL
+        ):
+            return self.validate()
+        return False
+
+    def start_refresh(self, interval: float = REPLICATE_REFRESH_INTERVAL) -> None:
+        """
+        Validate the token now, then every `interval` seconds, in a background
+        thread so startup never waits on the network.
+        """
+        if self._refresher is not None:
+            return
+        self._stop.clear()
+
+        def refresh() -> None:
+            self.validate()
+            while not self._stop.wait(interval):
+                self.validate()
+
+        self._refresher = threading.Thread(
+            target=refresh, name="replicate-refresh", daemon=True
+        )
+        self._refresher.start()
+
+    def close(self) -> None:
+        """Stop the background refresh and release the download session"""
+        self._stop.set()
+        self._refresher = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    async def aclose(self) -> None:
+        """Close the async download client"""
+        if self._async_session is not None:
+            await self._async_session.aclose()
+            self._async_session = None
+
+    def run(self, model_input: Dict[str, Any]) -> Any:
+        """Run the model and wait for its output"""
+        return self.client.run(self.model, input=model_input)
+
+    async def async_run(self, model_input: Dict[str, Any]) -> Any:
+        """Async version of run"""
+        return await self.client.async_run(self.model, input=model_input)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "last_validated": self.last_validated,
+            "last_error": self.last_error,
+        }
+
+
+_replicate_client: Optional[ReplicateClient] = None
+
+
+def get_replicate_client() -> ReplicateClient:
+    """Return the process-wide Replicate client"""
+    global _replicate_client
+    if _replicate_client is None:
+        _replicate_client = ReplicateClient()
+    return _replicate_client
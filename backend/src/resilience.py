@@ -0,0 +1,225 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+
+# Per-phase limits for the remote parts of a generation, in seconds
+GENERATE_TIMEOUT = float(os.getenv("GENERATE_TIMEOUT", "180"))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "30"))
+
+# Download retries with exponential backoff; the paid generation is never
+# retried
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+
+# Consecutive provider failures that open the breaker, and how long it stays
+# open before a trial request is let through
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class PhaseTimeoutError(TimeoutError):
+    """Raised when a generation phase runs past its time limit"""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider that is failing"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            f"Image provider is unavailable, retry in {retry_after:.0f} seconds"
+        )
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated provider failures.
+
+    Closed: calls go through and consecutive failures are counted. Open:
+    calls are refused until reset_timeout has passed. Half open: one trial
+    call goes through; success closes the breaker, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """
+        Reserve a call to the provider.
+
+        Raises:
+            CircuitOpenError: If the breaker is refusing calls
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self.opened_at + self.reset_timeout - now
+                if remaining > 0:
+                    raise CircuitOpenError(remaining)
+                self.state = HALF_OPEN
+                logger.info("🔌 Circuit breaker half open, sending a trial request")
+            if self.state == HALF_OPEN:
+                # A trial that never reported back must not block forever
+                trial_running = (
+                    self._trial_started is not None
+                    and now - self._trial_started < self.reset_timeout
+                )
+                if trial_running:
+                    raise CircuitOpenError(self.reset_timeout)
+                self._trial_started = now
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("✅ Circuit breaker closed, provider recovered")
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_started = None
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.trips += 1
+                    logger.warning(
+                        f"⚠️ Circuit breaker open after {self.failures} failures"
+                    )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_after = 0.0
+            if self.state == OPEN:
+                retry_after = max(
+                    0.0, self.opened_at + self.reset_timeout - time.monotonic()
+                )
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "trips": self.trips,
+                "retry_after": round(retry_after, 1),
+            }
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed download is worth another attempt"""
+    # Imported here so loading this module doesn't pull in the HTTP clients
+    import httpx
+    import requests
+
+    if isinstance(error, (TimeoutError, requests.RequestException, httpx.HTTPError)):
+        return True
+    return bool(getattr(error, "retryable", False))
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given attempt (0-based)"""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def retry(func: Callable[[], T], retries: int = DOWNLOAD_RETRIES) -> T:
+    """
+    Call func, retrying retryable errors with exponential backoff.
+
+    Args:
+        func: Callable taking no arguments
+        retries: Attempts after the first one (default: DOWNLOAD_RETRIES)
+
+    Returns:
+        The result of the first successful call
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(
+                f"🔁 Attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s"
+            )
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+async def retry_async(
+    func: Callable[[], Awaitable[T]], retries: int = DOWNLOAD_RETRIES
+) -> T:
+    """Async version of retry"""
+    for attempt in range(retries + 1):
+        try:
+            return await func()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(
+                f"🔁 Attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def call_with_timeout(func: Callable[..., T], timeout: float, *args) -> T:
+    """
+    Run a blocking call with a time limit.
+
+    The call runs on a daemon thread; on timeout the caller gets
+    PhaseTimeoutError straight away and the thread is left to finish on its
+    own.
+    """
+    outcome: Dict[str, Any] = {}
+    finished = threading.Event()
+
+    def target() -> None:
+        try:
+            outcome["value"] = func(*args)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            finished.set()
+
+    threading.Thread(target=target, name="timeout-guard", daemon=True).start()
+    if not finished.wait(timeout):
+        raise PhaseTimeoutError(f"Timed out after {timeout:.0f}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
+
+
+async def wait_with_timeout(awaitable: Awaitable[T], timeout: float) -> T:
+    """Await with a time limit, raising PhaseTimeoutError on expiry"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise PhaseTimeoutError(f"Timed out after {timeout:.0f}s")
+
+
+# Process-wide breaker guarding the image provider
+provider_breaker = CircuitBreaker()
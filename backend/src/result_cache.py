@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from src.image_layout import locate_image
+
+# Reuse policy:
+#   off         - always generate (default: every click makes a new page)
+#   always      - reuse any cached result for the same key
+#   probability - reuse with probability RESULT_CACHE_PROBABILITY
+#   variants    - generate until RESULT_CACHE_VARIANTS results exist for the
+#                 key, then reuse a random one of them
+CACHE_POLICIES = ("off", "always", "probability", "variants")
+RESULT_CACHE_POLICY = os.getenv("RESULT_CACHE_POLICY", "off").lower()
+RESULT_CACHE_PROBABILITY = float(os.getenv("RESULT_CACHE_PROBABILITY", "0.8"))
+RESULT_CACHE_VARIANTS = int(os.getenv("RESULT_CACHE_VARIANTS", "3"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))
+RESULT_CACHE_MAX_AGE = float(os.getenv("RESULT_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def cache_key(model: str, model_input: Dict[str, Any]) -> str:
+    """
+    Content hash of everything that determines a generation.
+
+    The prompt is normalized (case and whitespace) so trivially different
+    requests share a key.
+
+    Args:
+        model: Model identifier
+        model_input: The full model input, including the system prompt
+
+    Returns:
+        Hex digest identifying the request
+    """
+    normalized = dict(model_input)
+    prompt = str(normalized.get("prompt", ""))
+    normalized["prompt"] = _WHITESPACE.sub(" ", prompt).strip().lower()
+    payload = json.dumps({"model": model, "input": normalized}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Maps request keys to images already generated for them.
+
+    Keys are kept in LRU order and expire after max_age seconds; each key
+    holds at most `variants` of its most recent images. Evicting a key only
+    forgets it, the images stay in the gallery.
+    """
+
+    def __init__(
+        self,
+        policy: str = RESULT_CACHE_POLICY,
+        probability: float = RESULT_CACHE_PROBABILITY,
+        variants: int = RESULT_CACHE_VARIANTS,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        max_age: float = RESULT_CACHE_MAX_AGE,
+    ):
+        if policy not in CACHE_POLICIES:
+            raise ValueError(
+                f"Unknown cache policy {policy}, choose one of {CACHE_POLICIES}"
+            )
+        self.policy = policy
+        self.probability = probability
+        self.variants = max(1, variants) if policy == "variants" else 1
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # key -> [(filename, recorded_at)], newest last
+        self._entries: "OrderedDict[str, List[Tuple[str, float]]]" = OrderedDict()
+        self._keys_by_filename: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.policy != "off"
+
+    def lookup(self, key: str, images_dir: Path) -> Optional[str]:
+        """
+        Return a cached image for the key if the policy allows reuse.
+
+        Args:
+            key: Request key from cache_key
+            images_dir: Folder the cached images live in
+
+        Returns:
+            Filename of the image to reuse, or None to generate a new one
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            variants = self._entries.get(key)
+            if variants and time.time() - variants[-1][1] > self.max_age:
+                self._evict(key)
+                variants = None
+            # Drop variants whose file was removed outside the API
+            if variants:
+                variants[:] = [v for v in variants if locate_image(images_dir, v[0])]
+            if not variants or not self._should_reuse(len(variants)):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return random.choice(variants)[0]
+
+    def _should_reuse(self, available: int) -> bool:
+        if self.policy == "always":
+            return True
+        if self.policy == "probability":
+            return random.random() < self.probability
+        return available >= self.variants
+
+    def record(
+        self, key: str, filename: str, recorded_at: Optional[float] = None
+    ) -> None:
+        """Remember an image generated for a key"""
+        if not self.enabled:
+            return
+        with self._lock:
+            variants = self._entries.setdefault(key, [])
+            variants.append((filename, recorded_at or time.time()))
+            self._keys_by_filename[filename] = key
+            for old_filename, _ in variants[: -self.variants]:
+                self._keys_by_filename.pop(old_filename, None)
+            del variants[: -self.variants]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def forget(self, filename: str) -> None:
+        """Stop reusing an image, e.g. because it was deleted"""
+        with self._lock:
+            key = self._keys_by_filename.pop(filename, None)
+            if key is None or key not in self._entries:
+                return
+            variants = [v for v in self._entries[key] if v[0] != filename]
+            if variants:
+                self._entries[key] = variants
+            else:
+                del self._entries[key]
+
+    def _evict(self, key: str) -> None:
+        for filename, _ in self._entries.pop(key, []):
+            self._keys_by_filename.pop(filename, None)
+        self.evictions += 1
+
+    def warm(self, metadata: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Rebuild the cache from image metadata that carries a cache_key.
+
+        Returns:
+            The number of images loaded
+        """
+        entries = []
+        for filename, entry in metadata.items():
+            if entry.get("cache_key"):
+                created_at = entry.get("created_at") or ""
+                try:
+                    recorded_at = datetime.fromisoformat(created_at).timestamp()
+                except ValueError:
+                    recorded_at = time.time()
+                entries.append((recorded_at, entry["cache_key"], filename))
+        for recorded_at, key, filename in sorted(entries):
+            self.record(key, filename, recorded_at)
+        logger.info(f"🧠 Result cache warmed with {len(entries)} images")
+        return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "policy": self.policy,
+                "keys": len(self._entries),
+                "images": len(self._keys_by_filename),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Process-wide cache shared by the sync and async generation paths
+result_cache = ResultCache()
@@ -0,0 +1,313 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from src.blob_storage import get_blob_store, list_image_names
+from src.bulk import MAX_BULK_DELETE, delete_images
+from src.gallery import sync_index
+from src.gallery_cache import gallery_cache
+from src.helpers import interprocess_lock
+from src.image_layout import (
+    iter_entries,
+    iter_image_files,
+    locate_image,
+    migrate_flat_layout,
+)
+from src.metadata_store import MetadataStore, get_metadata_store
+from src.renditions import migrate_flat_renditions, prune_renditions
+
+# Limits on the gallery, 0 turns a limit off. Pages past the age limit are
+# deleted first, then the least recently viewed until both the count and
+# the total size of the full-size files are under their limits.
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))
+RETENTION_MAX_IMAGES = int(os.getenv("RETENTION_MAX_IMAGES", "0"))
+RETENTION_MAX_BYTES = int(os.getenv("RETENTION_MAX_BYTES", "0"))
+# Seconds between retention passes
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+# Seconds between writes of the recorded views to the files' access times
+ACCESS_FLUSH_INTERVAL = 60.0
+# Temporary files untouched for this long were abandoned by a crash
+STALE_TEMP_SECONDS = 3600.0
+TEMP_SUFFIXES = (".part", ".tmp", ".fetch")
+
+# (filename, size in bytes, last access, modified) of one stored page
+ImageFile = Tuple[str, int, float, float]
+
+
+class AccessTracker:
+    """
+    Remembers when images were last served, for LRU eviction.
+
+    Views are kept in memory and written to the files' access times now and
+    then, so serving an image stays a dictionary update and every worker
+    process sees the views of the others. Modification times are left
+    alone; they date the pages and validate the renditions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen: Dict[str, float] = {}
+
+    def touch(self, filename: str) -> None:
+        with self._lock:
+            self._seen[filename] = time.time()
+
+    def flush(self, images_folder: Path) -> int:
+        """
+        Write the recorded views to disk.
+
+        Returns:
+            The number of files updated
+        """
+        with self._lock:
+            seen, self._seen = self._seen, {}
+        updated = 0
+        for filename, accessed in seen.items():
+            path = locate_image(images_folder, filename)
+            if path is None:
+                continue
+            try:
+                stat = path.stat()
+                if accessed > stat.st_atime:
+                    os.utime(path, ns=(int(accessed * 1e9), stat.st_mtime_ns))
+                    updated += 1
+            except OSError:
+                continue
+        return updated
+
+
+class RetentionPolicy:
+    """Decides which pages to delete, oldest tiers first"""
+
+    def __init__(
+        self,
+        max_age_days: float = RETENTION_MAX_AGE_DAYS,
+        max_images: int = RETENTION_MAX_IMAGES,
+        max_bytes: int = RETENTION_MAX_BYTES,
+    ):
+        self.max_age_days = max_age_days
+        self.max_images = max_images
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_age_days or self.max_images or self.max_bytes)
+
+    def select(self, files: List[ImageFile], now: float) -> Dict[str, List[str]]:
+        """
+        Pick the pages to delete.
+
+        Args:
+            files: Every stored page
+            now: Current timestamp
+
+        Returns:
+            Filenames to delete, keyed by the reason: "expired" for pages
+            past the age limit and "evicted" for the least recently used
+            pages over the count or size limit
+        """
+        expired: List[str] = []
+        kept = files
+        if self.max_age_days:
+            cutoff = now - self.max_age_days * 86400
+            expired = [f[0] for f in files if f[3] < cutoff]
+            kept = [f for f in files if f[3] >= cutoff]
+
+        evicted: List[str] = []
+        count = len(kept)
+        total = sum(f[1] for f in kept)
+        if self.max_images or self.max_bytes:
+            # Least recently viewed first; a page never viewed counts from
+            # when it was created
+            by_last_use = sorted(kept, key=lambda f: max(f[2], f[3]))
+            for name, size, _, _ in by_last_use:
+                over_count = self.max_images and count > self.max_images
+                over_bytes = self.max_bytes and total > self.max_bytes
+                if not over_count and not over_bytes:
+                    break
+                evicted.append(name)
+                count -= 1
+                total -= size
+        return {"expired": expired, "evicted": evicted}
+
+
+def remove_stale_temp_files(images_folder: Path, older_than: float) -> int:
+    """
+    Delete partial downloads and fetches abandoned by a crashed process.
+
+    Returns:
+        The number of files removed
+    """
+    removed = 0
+    for entry in iter_entries(images_folder):
+        if not entry.name.startswith(".") or not entry.name.endswith(TEMP_SUFFIXES):
+            continue
+        try:
+            if entry.stat().st_mtime < older_than:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    if removed:
+        logger.info(f"🧹 Removed {removed} abandoned temporary files")
+    return removed
+
+
+def reconcile_orphans(images_folder: Path, store: MetadataStore) -> Dict[str, int]:
+    """
+    Make the metadata index and the image files agree.
+
+    Metadata of images that no longer exist is dropped, images without
+    metadata get a placeholder entry, and renditions of deleted images are
+    removed.
+
+    Args:
+        images_folder: Images directory
+        store: Metadata store to update
+
+    Returns:
+        Counts of the metadata entries removed and added and the
+        renditions removed
+    """
+    # Metadata is written after the file, so reading it first never
+    # mistakes a page that is being created for an orphan
+    indexed = set(store.all())
+    names = list_image_names(images_folder)
+    orphaned = indexed - names
+    if orphaned:
+        gallery_cache.remove_many(orphaned)
+        store.delete_many(orphaned)
+        logger.info(f"🧹 Dropped metadata of {len(orphaned)} missing images")
+    added = sync_index(str(images_folder), store)
+    if added and gallery_cache.ready:
+        for name, entry in store.get_many(names - gallery_cache.filenames()).items():
+            gallery_cache.add(name, entry)
+    renditions = prune_renditions(names, time.time() - STALE_TEMP_SECONDS)
+    return {
+        "metadata_removed": len(orphaned),
+        "metadata_added": added,
+        "renditions_removed": renditions,
+    }
+
+
+def migrate_layout(images_folder: Path) -> int:
+    """
+    Move images and renditions from the flat layout into shards.
+
+    Returns:
+        The number of images moved
+    """
+    moved = migrate_flat_layout(images_folder)
+    migrate_flat_renditions()
+    return moved
+
+
+class RetentionJob:
+    """
+    Background thread that enforces the retention policy and cleans up.
+
+    Each pass, in order: abandoned temporary files, orphaned metadata and
+    renditions, pages past the age limit, then the least recently viewed
+    pages over the count and size limits. Worker processes on one host
+    take turns through a file lock, so a pass never runs twice at once.
+    """
+
+    def __init__(
+        self,
+        images_folder: str,
+        store: Optional[MetadataStore] = None,
+        policy: Optional[RetentionPolicy] = None,
+        tracker: Optional[AccessTracker] = None,
+        interval: float = RETENTION_INTERVAL,
+    ):
+        self.images_folder = Path(images_folder)
+        self.store = store
+        self.policy = policy or RetentionPolicy()
+        self.tracker = tracker or access_tracker
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.tracker.flush(self.images_folder)
+
+    def _run(self) -> None:
+        logger.info(f"⏳ Retention pass every {self.interval}s")
+        next_pass = time.monotonic() + self.interval
+        while not self._stop.wait(min(ACCESS_FLUSH_INTERVAL, self.interval)):
+            self.tracker.flush(self.images_folder)
+            if time.monotonic() >= next_pass:
+                self.run_once()
+                next_pass = time.monotonic() + self.interval
+
+    def _stored_images(self) -> List[ImageFile]:
+        files = []
+        for entry in iter_image_files(self.images_folder):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((entry.name, stat.st_size, stat.st_atime, stat.st_mtime))
+        return files
+
+    def run_once(self) -> Dict[str, Any]:
+        """
+        Run one cleanup pass.
+
+        Returns:
+            Counts of what was removed in each tier
+        """
+        started = time.perf_counter()
+        store = self.store or get_metadata_store()
+        try:
+            with interprocess_lock(f"{self.images_folder}.retention"):
+                self.tracker.flush(self.images_folder)
+                now = time.time()
+                summary: Dict[str, Any] = {
+                    "temp_removed": remove_stale_temp_files(
+                        self.images_folder, now - STALE_TEMP_SECONDS
+                    )
+                }
+                summary.update(reconcile_orphans(self.images_folder, store))
+                summary.update(self._enforce(store, now))
+        except Exception as e:
+            logger.error(f"❌ Retention pass failed: {str(e)}")
+            return {}
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(f"⏳ Retention pass finished: {summary}")
+        return summary
+
+    def _enforce(self, store: MetadataStore, now: float) -> Dict[str, int]:
+        if not self.policy.enabled:
+            return {"expired": 0, "evicted": 0}
+        if get_blob_store().remote:
+            # This node only sees its own cache of the bucket; use the
+            # bucket's lifecycle rules instead
+            logger.warning("⚠️ Retention limits are ignored with a remote blob store")
+            return {"expired": 0, "evicted": 0}
+        selected = self.policy.select(self._stored_images(), now)
+        counts = {}
+        for reason, names in selected.items():
+            deleted = 0
+            for i in range(0, len(names), MAX_BULK_DELETE):
+                chunk = names[i : i + MAX_BULK_DELETE]
+                result = delete_images(chunk, str(self.images_folder), store)
+                deleted += len(result["deleted"])
+            if deleted:
+                logger.info(f"🗑️ Retention {reason} {deleted} images")
+            counts[reason] = deleted
+        return counts
+
+
+# Process-wide record of image views
+access_tracker = AccessTracker()
@@ -0,0 +1,390 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from loguru import logger
+from src.helpers import LOCK_POLL_INTERVAL, interprocess_lock
+from src.image_layout import locate_image
+from src.metadata_store import MetadataStore
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Metadata field holding a page's 64-bit difference hash as 16 hex digits
+HASH_FIELD = "dhash"
+# Pages whose hashes differ in at most this many of the 64 bits are shown
+# once when the gallery collapses near-duplicates
+DUPLICATE_DISTANCE = int(os.getenv("DUPLICATE_DISTANCE", "3"))
+# Largest distance /api/images/{name}/similar accepts
+SIMILAR_MAX_DISTANCE = int(os.getenv("SIMILAR_MAX_DISTANCE", "12"))
+# Hash pages that have none when the app starts
+HASH_BACKFILL = os.getenv("HASH_BACKFILL", "true").lower() == "true"
+# Processes hashing the backfill; 1 hashes in the calling thread
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# Pages per process-pool task, few enough that a stop only waits for the
+# tasks running, and pages per lock and metadata write during the backfill
+HASH_CHUNK = 64
+BACKFILL_CHUNK = 2048
+
+# Side of the hash grid: rows of HASH_SIZE + 1 pixels give HASH_SIZE
+# left/right comparisons each, HASH_SIZE ** 2 = 64 bits in all
+HASH_SIZE = 8
+# The multi-index splits each hash into BANDS tables of BAND_BITS bits,
+# and answers searches for distances below BANDS
+BANDS = 4
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def _pixels(path: Path) -> "np.ndarray":
+    """The greyscale (HASH_SIZE, HASH_SIZE + 1) thumbnail a hash is made from"""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as img:
+        # JPEG decodes straight at a fraction of the size
+        img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+        if img.mode in ("RGBA", "LA", "P"):
+            # Transparent areas are paper, not black
+            img = img.convert("RGBA")
+            background = Image.new("RGBA", img.size, "white")
+            img = Image.alpha_composite(background, img)
+        small = img.convert("L").resize(
+            (HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX, reducing_gap=2.0
+        )
+        return np.asarray(small, dtype=np.int16)
+
+
+def hash_pixels(pixels: "np.ndarray") -> List[int]:
+    """
+    Difference hashes of a stack of hash thumbnails.
+
+    Each bit says whether a pixel is brighter than its left neighbour, so
+    the hash survives rescaling, recompression and small edits. The whole
+    stack is compared and packed in a few numpy operations.
+
+    Args:
+        pixels: Array of shape (N, HASH_SIZE, HASH_SIZE + 1)
+
+    Returns:
+        N 64-bit hashes
+    """
+    import numpy as np
+
+    bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(pixels), -1), axis=1)
+    return [int(value) for value in packed.view(">u8").ravel()]
+
+
+def image_hash(path: Path) -> int:
+    """Difference hash of one image"""
+    return hash_pixels(_pixels(path)[None])[0]
+
+
+def hash_files(paths: Sequence[str]) -> List[Optional[int]]:
+    """
+    Hash a batch of images, None for those that cannot be read.
+
+    Module-level so it can run in a process pool.
+    """
+    import numpy as np
+
+    stack = []
+    readable = []
+    for i, path in enumerate(paths):
+        try:
+            stack.append(_pixels(Path(path)))
+            readable.append(i)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not hash {path}: {e}")
+    hashes: List[Optional[int]] = [None] * len(paths)
+    if stack:
+        for i, value in zip(readable, hash_pixels(np.stack(stack))):
+            hashes[i] = value
+    return hashes
+
+
+def hash_images(
+    paths: Sequence[Path],
+    workers: int = HASH_WORKERS,
+    stop: Optional[threading.Event] = None,
+) -> List[Optional[int]]:
+    """
+    Hash many images, spread over worker processes.
+
+    Decoding is CPU-bound and holds the GIL, so threads would not help.
+
+    Args:
+        paths: Images to hash
+        workers: Worker processes; 1 hashes in the calling thread
+        stop: Set to give up once the HASH_CHUNK pages being hashed are done
+
+    Returns:
+        The hash of each image, or None if it could not be read or was
+        not reached before `stop` was set
+    """
+    chunks = [
+        [str(path) for path in paths[i : i + HASH_CHUNK]]
+        for i in range(0, len(paths), HASH_CHUNK)
+    ]
+    if workers <= 1 or len(chunks) <= 1:
+        return _collect(map(hash_files, chunks), len(paths), stop)
+    # Spawned, not forked: the server process has threads holding locks
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(hash_files, chunk) for chunk in chunks]
+        hashes = _collect(_results(futures, stop), len(paths), stop)
+        # Chunks not started yet when stopped are dropped
+        for future in futures:
+            future.cancel()
+        return hashes
+
+
+def _results(futures: List[Future], stop: Optional[threading.Event]) -> Iterator[List]:
+    """Results of the futures in order, ending early once `stop` is set"""
+    for future in futures:
+        while stop is not None and not future.done():
+            if stop.wait(LOCK_POLL_INTERVAL):
+                return
+        yield future.result()
+
+
+def _collect(
+    results: Iterable[List[Optional[int]]], count: int, stop: Optional[threading.Event]
+) -> List[Optional[int]]:
+    """Concatenate chunk results until done or stopped, padding with None"""
+    hashes: List[Optional[int]] = []
+    for chunk in results:
+        hashes.extend(chunk)
+        if stop is not None and stop.is_set():
+            break
+    return hashes + [None] * (count - len(hashes))
+
+
+def format_hash(value: int) -> str:
+    return f"{value:016x}"
+
+
+def parse_hash(entry: Dict) -> Optional[int]:
+    """The hash stored in a metadata entry, if any"""
+    value = entry.get(HASH_FIELD)
+    return int(value, 16) if value else None
+
+
+def parse_hashes(entries: Dict[str, Dict]) -> Dict[str, int]:
+    """The hashes stored in many metadata entries, skipping unhashed ones"""
+    return {
+        name: value
+        for name, entry in entries.items()
+        if (value := parse_hash(entry)) is not None
+    }
+
+
+class HashIndex:
+    """
+    Index of 64-bit image hashes answering "which pages are within d bits".
+
+    Two structures serve the two kinds of search:
+    - a multi-index hash table, which splits each hash into BANDS bands
+      and files the page under each band's value. Hashes less than BANDS
+      bits apart agree exactly in at least one band, so near-duplicate
+      checks are a few dictionary lookups.
+    - a numpy array of every hash, scanned with a vectorized XOR and
+      popcount for wider searches, where the table would have to visit
+      thousands of buckets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: List[Dict[int, set]] = [{} for _ in range(BANDS)]
+        self._names: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._values: Optional["np.ndarray"] = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @staticmethod
+    def _bands(value: int) -> Iterable[Tuple[int, int]]:
+        return ((band, (value >> (band * BAND_BITS)) & BAND_MASK) for band in range(BANDS))
+
+    def get(self, filename: str) -> Optional[int]:
+        with self._lock:
+            slot = self._slots.get(filename)
+            return None if slot is None else int(self._values[slot])
+
+    def add(self, filename: str, value: Optional[int]) -> None:
+        """File a page under its hash, replacing any earlier one"""
+        with self._lock:
+            self._discard(filename)
+            if value is not None:
+                self._insert(filename, value)
+
+    def add_many(self, hashes: Dict[str, int]) -> None:
+        """File many pages at once, as when the index is built"""
+        import numpy as np
+
+        with self._lock:
+            for filename in hashes:
+                self._discard(filename)
+            self._reserve(len(self._names) + len(hashes))
+            start = len(self._names)
+            self._values[start : start + len(hashes)] = np.fromiter(
+                hashes.values(), dtype=np.uint64, count=len(hashes)
+            )
+            for slot, (filename, value) in enumerate(hashes.items(), start):
+                self._names.append(filename)
+                self._slots[filename] = slot
+                for band, key in self._bands(value):
+                    self._tables[band].setdefault(key, set()).add(filename)
+
+    def remove(self, filename: str) -> None:
+        with self._lock:
+            self._discard(filename)
+
+    def _reserve(self, size: int) -> None:
+        import numpy as np
+
+        if self._values is None:
+            self._values = np.zeros(max(size, 1024), dtype=np.uint64)
+        elif size > len(self._values):
+            grown = np.zeros(max(size, 2 * len(self._values)), dtype=np.uint64)
+            grown[: len(self._names)] = self._values[: len(self._names)]
+            self._values = grown
+
+    def _insert(self, filename: str, value: int) -> None:
+        self._reserve(len(self._names) + 1)
+        self._values[len(self._names)] = value
+        self._slots[filename] = len(self._names)
+        self._names.append(filename)
+        for band, key in self._bands(value):
+            self._tables[band].setdefault(key, set()).add(filename)
+
+    def _discard(self, filename: str) -> None:
+        slot = self._slots.pop(filename, None)
+        if slot is None:
+            return
+        value = int(self._values[slot])
+        for band, key in self._bands(value):
+            bucket = self._tables[band].get(key)
+            if bucket is not None:
+                bucket.discard(filename)
+                if not bucket:
+                    del self._tables[band][key]
+        # Fill the hole with the last hash so the array stays dense
+        last = len(self._names) - 1
+        if slot != last:
+            moved = self._names[last]
+            self._names[slot] = moved
+            self._values[slot] = self._values[last]
+            self._slots[moved] = slot
+        self._names.pop()
+
+    def within(self, value: int, distance: int) -> List[Tuple[int, str]]:
+        """
+        Pages whose hash is at most `distance` bits from a hash.
+
+        Returns:
+            (distance, filename) pairs, closest first
+        """
+        import numpy as np
+
+        with self._lock:
+            if not self._names:
+                return []
+            if distance < BANDS:
+                candidates = set()
+                for band, key in self._bands(value):
+                    candidates.update(self._tables[band].get(key, ()))
+                found = [
+                    (int(self._values[self._slots[name]] ^ np.uint64(value)).bit_count(), name)
+                    for name in candidates
+                ]
+            else:
+                distances = np.bitwise_count(
+                    self._values[: len(self._names)] ^ np.uint64(value)
+                )
+                found = [
+                    (int(distances[slot]), self._names[slot])
+                    for slot in np.flatnonzero(distances <= distance)
+                ]
+        return sorted(pair for pair in found if pair[0] <= distance)
+
+
+def backfill_hashes(
+    images_folder: str,
+    store: MetadataStore,
+    on_update: Callable[[Dict[str, Dict]], None],
+    workers: int = HASH_WORKERS,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Hash every page that has no hash in its metadata yet.
+
+    Each batch is hashed under a file lock shared by the worker processes
+    on one host; a worker that waited for a batch finds it done and only
+    picks up the stored hashes. The lock is never held between batches,
+    and waiting for it and hashing both end soon after `stop` is set, so
+    shutdown is not held up by this worker's backfill or another's.
+
+    Args:
+        images_folder: Images directory
+        store: Metadata store holding the hashes
+        on_update: Called with every batch of entries that gained a hash,
+            including those another process computed
+        workers: Hashing processes
+        stop: Set to give up, as on shutdown
+
+    Returns:
+        The number of pages hashed
+    """
+    entries = store.all()
+    hashed = {name: entry for name, entry in entries.items() if HASH_FIELD in entry}
+    if hashed:
+        on_update(hashed)
+    missing = [name for name, entry in entries.items() if HASH_FIELD not in entry]
+    if not missing:
+        return 0
+
+    logger.info(f"🔍 Hashing {len(missing)} pages for near-duplicate search")
+    done = 0
+    for i in range(0, len(missing), BACKFILL_CHUNK):
+        with interprocess_lock(f"{images_folder}.hashes", stop) as locked:
+            if not locked or (stop is not None and stop.is_set()):
+                break
+            batch = store.get_many(missing[i : i + BACKFILL_CHUNK])
+            # Hashed by another worker while this one waited for the lock
+            ready = {name: entry for name, entry in batch.items() if HASH_FIELD in entry}
+            if ready:
+                on_update(ready)
+            located = {
+                name: path
+                for name in batch
+                if name not in ready
+                and (path := locate_image(Path(images_folder), name)) is not None
+            }
+            hashes = dict(zip(located, hash_images(list(located.values()), workers, stop)))
+            # Re-read so metadata written meanwhile is not overwritten
+            updates = {}
+            for name, entry in store.get_many(located).items():
+                if hashes.get(name) is not None:
+                    entry[HASH_FIELD] = format_hash(hashes[name])
+                    updates[name] = entry
+            if updates:
+                store.upsert_many(updates)
+                on_update(updates)
+                done += len(updates)
+    logger.info(f"✅ Hashed {done} pages")
+    return done
@@ -0,0 +1,277 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from loguru import logger
+from starlette.responses import FileResponse, Response
+from .http_cache import IMMUTABLE_CACHE_CONTROL, etag_matches
+
+# Files smaller than this are not worth compressing
+STATIC_COMPRESS_MIN_SIZE = int(os.getenv("STATIC_COMPRESS_MIN_SIZE", "1024"))
+# Largest file compressed in memory at startup; bigger ones are only served
+# compressed when the build ships a .gz/.br next to them
+STATIC_COMPRESS_MAX_SIZE = int(os.getenv("STATIC_COMPRESS_MAX_SIZE", str(4 * 1024 * 1024)))
+
+# Vite content-hashes everything it emits under assets/, e.g. index-B4x9kQ2a.js
+REVALIDATE_CACHE_CONTROL = "no-cache"
+_HASHED_NAME = re.compile(r"[-.][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/xml",
+    "image/svg+xml",
+)
+# Preferred first when the client accepts several
+ENCODINGS = ("br", "gzip")
+_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+INDEX_FILE = "index.html"
+
+
+def _brotli_compress(data: bytes) -> Optional[bytes]:
+    """Brotli-compress data if the optional brotli package is installed"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def _is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Tuple[str, ...]:
+    """Content codings the client accepts, in our order of preference"""
+    if not accept_encoding:
+        return ()
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        if params and quality in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(coding.strip())
+    if "*" in accepted:
+        return ENCODINGS
+    return tuple(encoding for encoding in ENCODINGS if encoding in accepted)
+
+
+class Variant:
+    """A precompressed copy of an asset, held in memory or in a sibling file"""
+
+    def __init__(
+        self,
+        etag: str,
+        body: Optional[bytes] = None,
+        path: Optional[Path] = None,
+        stat: Optional[os.stat_result] = None,
+    ):
+        self.etag = etag
+        self.body = body
+        self.path = path
+        self.stat = stat
+
+
+class StaticAsset:
+    """Everything needed to answer a request for one file without a syscall"""
+
+    def __init__(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        content_type: str,
+        etag: str,
+        cache_control: str,
+        body: Optional[bytes] = None,
+    ):
+        self.path = path
+        self.stat = stat
+        self.content_type = content_type
+        self.etag = etag
+        self.cache_control = cache_control
+        self.body = body
+        self.variants: Dict[str, Variant] = {}
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Check an If-None-Match header against any representation's ETag"""
+        tags = [variant.etag for variant in self.variants.values()]
+        return etag_matches(if_none_match, self.etag, *tags)
+
+
+class StaticManifest:
+    """
+    In-memory index of the built frontend.
+
+    Built once, in the background at startup or by the first request that
+    needs it: every file is hashed for its ETag, compressible
+    files get gzip (and brotli, when available) copies, and index.html is
+    kept in memory. Requests are then answered from the manifest, so a miss
+    or the SPA fallback never probes the disk and only uncompressed or
+    ranged responses read a file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._assets: Dict[str, StaticAsset] = {}
+        self.root: Optional[Path] = None
+        self.compressed_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._assets
+
+    @property
+    def index(self) -> Optional[StaticAsset]:
+        return self._assets.get(INDEX_FILE)
+
+    @property
+    def built(self) -> bool:
+        return self.root is not None
+
+    def ensure_built(self, static_dir: str) -> None:
+        """Build the manifest unless it already is, once across threads"""
+        with self._build_lock:
+            if not self.built:
+                self.build(static_dir)
+
+    def build(self, static_dir: str) -> None:
+        """
+        Index every file under static_dir, replacing the current manifest.
+
+        Args:
+            static_dir: Directory holding the frontend build
+        """
+        root = Path(static_dir)
+        assets: Dict[str, StaticAsset] = {}
+        compressed_bytes = 0
+        if root.is_dir():
+            for path in sorted(root.rglob("*")):
+                if not path.is_file() or path.suffix in (".gz", ".br"):
+                    continue
+                name = path.relative_to(root).as_posix()
+                asset = self._load(name, path)
+                assets[name] = asset
+                compressed_bytes += sum(
+                    len(variant.body or b"") for variant in asset.variants.values()
+                )
+        else:
+            logger.error(f"❌ Static directory not found: {root}")
+
+        with self._lock:
+            self._assets = assets
+            self.root = root
+            self.compressed_bytes = compressed_bytes
+        logger.info(
+            f"📦 Indexed {len(assets)} static files "
+            f"({compressed_bytes // 1024} KiB compressed in memory)"
+        )
+
+    @staticmethod
+    def _load(name: str, path: Path) -> StaticAsset:
+        data = path.read_bytes()
+        stat = path.stat()
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        hashed = name.startswith("assets/") and _HASHED_NAME.search(name) is not None
+        asset = StaticAsset(
+            path=path,
+            stat=stat,
+            content_type=content_type,
+            etag=f'"{digest}"',
+            cache_control=IMMUTABLE_CACHE_CONTROL if hashed else REVALIDATE_CACHE_CONTROL,
+            # The SPA fallback is served on every client-side route
+            body=data if name == INDEX_FILE else None,
+        )
+        if not _is_compressible(content_type) or len(data) < STATIC_COMPRESS_MIN_SIZE:
+            return asset
+
+        for encoding in ENCODINGS:
+            etag = f'"{digest}-{encoding}"'
+            sibling = path.with_name(path.name + _SUFFIXES[encoding])
+            if sibling.is_file():
+                asset.variants[encoding] = Variant(etag, path=sibling, stat=sibling.stat())
+                continue
+            if len(data) > STATIC_COMPRESS_MAX_SIZE:
+                continue
+            if encoding == "gzip":
+                body = gzip.compress(data, compresslevel=9, mtime=0)
+            else:
+                body = _brotli_compress(data)
+            # Keep a variant only when it actually saves bytes
+            if body is not None and len(body) < len(data):
+                asset.variants[encoding] = Variant(etag, body=body)
+        return asset
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        return self._assets.get(name)
+
+    def response(
+        self,
+        asset: StaticAsset,
+        accept_encoding: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        has_range: bool = False,
+    ) -> Response:
+        """
+        Build the response for an asset.
+
+        Args:
+            asset: Asset from the manifest
+            accept_encoding: The request's Accept-Encoding header
+            if_none_match: The request's If-None-Match header
+            has_range: Whether the request asks for a byte range; ranges are
+                only served from the uncompressed file
+
+        Returns:
+            A 304, an in-memory or file-backed compressed body, or the file
+        """
+        headers = {"Cache-Control": asset.cache_control}
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+
+        encoding = None
+        if not has_range:
+            encoding = next(
+                (e for e in accepted_encodings(accept_encoding) if e in asset.variants),
+                None,
+            )
+        variant = asset.variants[encoding] if encoding else None
+        headers["ETag"] = variant.etag if variant else asset.etag
+
+        if asset.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        if variant is not None:
+            headers["Content-Encoding"] = encoding
+            if variant.body is not None:
+                return Response(variant.body, media_type=asset.content_type, headers=headers)
+            return FileResponse(
+                variant.path,
+                media_type=asset.content_type,
+                headers=headers,
+                stat_result=variant.stat,
+            )
+        if asset.body is not None and not has_range:
+            return Response(asset.body, media_type=asset.content_type, headers=headers)
+        return FileResponse(
+            asset.path,
+            media_type=asset.content_type,
+            headers=headers,
+            stat_result=asset.stat,
+        )
+
+
+static_manifest = StaticManifest()
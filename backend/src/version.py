@@ -1,6 +1,3 @@
 """Version information for the application."""
-from loguru import logger
 
 __version__ = "1.5.1"
-
-logger.info(f"🚀 Starting application version {__version__}") 
\ No newline at end of file
@@ -15,8 +15,14 @@ interface Image {
   date: string
   url: string
   prompt?: string // Optional as it's not in your API response
+  thumbnail_url?: string
+  thumbnail_srcset?: string
 }
 
+// Prefix API-relative image URLs with the API base
+const withApiBase = (url: string) =>
+  url.startsWith('http') ? url : `${import.meta.env.VITE_API_URL || '/api'}${url}`
+
 // Main App component - the root component of our application
 export default function App() {
   // State declarations using React's useState hook
@@ -156,7 +162,14 @@ export default function App() {
       <ImageGallery 
         images={(images || []).map(img => ({
           id: img.filename,
-          url: img.url ? (img.url.startsWith('http') ? img.url : `${import.meta.env.VITE_API_URL || '/api'}${img.url}`) : '',
+          url: img.url ? withApiBase(img.url) : '',
+          thumbnailUrl: img.thumbnail_url ? withApiBase(img.thumbnail_url) : undefined,
+          thumbnailSrcset: img.thumbnail_srcset
+            ? img.thumbnail_srcset
+                .split(', ')
+                .map(candidate => withApiBase(candidate))
+                .join(', ')
+            : undefined,
           prompt: img.prompt || '',
           filename: img.filename,
           date: img.date,
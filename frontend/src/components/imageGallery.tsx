@@ -14,6 +14,8 @@ const translations = {
 export interface ImageItem {
   id: string;
   url: string;
+  thumbnailUrl?: string;
+  thumbnailSrcset?: string;
   prompt: string;
   filename: string;
   timestamp: string;
@@ -62,11 +64,16 @@ export const ImageGallery = ({
                 onClick={() => handleImageClick(image)}
               >
                 <picture>
-                  <source srcSet={image.url} type="image/webp" />
+                  <source
+                    srcSet={image.thumbnailSrcset || image.url}
+                    sizes="(max-width: 600px) 50vw, 256px"
+                    type="image/webp"
+                  />
                   <img 
-                    src={image.url} 
+                    src={image.thumbnailUrl || image.url} 
                     alt={image.prompt} 
                     loading="lazy"
+                    decoding="async"
                   />
                 </picture>
                 <div className="image-details">